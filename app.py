@@ -1,90 +1,258 @@
 # app.py
+import os
 import threading
+import time
 from datetime import datetime
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, render_template, jsonify, request, send_from_directory
 from apscheduler.schedulers.background import BackgroundScheduler
 import atexit
 
 # ---- your code -------------------------------------------------------
-from automation import run_automation
+from coordination import JobStore, Lease, process_id
+import metrics
+import profiling
+import job_watchdog
+from render_buffer import BUFFER_SETTINGS, RenderBuffer, refill_decision
+from upload_on_yt import deferred_due
 
 app = Flask(__name__)
 
-# ---------- prevent overlapping runs ----------------------------------
-run_lock = threading.Lock()
-is_running = False
+# ---------- cross-process coordination --------------------------------
+# Every gunicorn worker serves the API; only the lease holder enqueues the
+# daily run and executes jobs. Job state lives in SQLite so all workers see it.
+jobs = JobStore()
+lease = Lease("scheduler")
+DISPATCH_POLL_SECONDS = 2
 
 # ---------- scheduler -------------------------------------------------
+# Nothing runs until start_background(); see there for why
 scheduler = BackgroundScheduler()
-scheduler.start()
+
+
+def job_status(result):
+    if str(result).startswith("SUCCESS"):
+        return "success"
+    if "FAILED" in str(result):
+        return "failed"
+    if str(result).startswith("REFUSED"):
+        return "refused"
+    return "skipped"
+
+
+def dispatcher():
+    """
+    Leader-only loop: claim queued jobs one at a time and run each in a watched
+    subprocess, so a hung stage is killed instead of blocking the queue.
+    """
+    while True:
+        job = jobs.claim_next(process_id()) if lease.is_leader else None
+        if not job:
+            time.sleep(DISPATCH_POLL_SECONDS)
+            continue
+
+        print(f"[JOB {job['id']}] {job['kind']} run @ {datetime.now()}")
+        try:
+            result, outcome = job_watchdog.run_watched(job, jobs, lease)
+        except Exception as e:
+            result, outcome = f"Automation FAILED: {e}", None
+        status = outcome or job_status(result)
+        # Fenced by owner: if a new leader already closed the job, its verdict stands
+        if not jobs.finish(job["id"], status, result, owner=process_id()):
+            print(f"[JOB {job['id']}] Not recorded – the job was taken over by another leader")
+            continue
+        metrics.inc("jobs_total", status=status)
+        print(f"[JOB {job['id']}] Finished → {result}")
 
 
 def scheduled_job():
-    global is_running
-    with run_lock:
-        if is_running:
-            print("[SCHED] Already running – skipping.")
-            return
-        is_running = True
-
-    print(f"[SCHED] Daily run @ {datetime.now()}")
-    result = run_automation()
-
-    with run_lock:
-        is_running = False
-    print(f"[SCHED] Finished → {result}")
-
-
-# every day at 06:30
-scheduler.add_job(
-    func=scheduled_job,
-    trigger="cron",
-    hour=6,
-    minute=30,
-    id="daily_yt_short",
-    replace_existing=True,
-)
+    if not lease.is_leader:
+        return
+    # With render-ahead on, the daily run only uploads the oldest buffered short
+    options = {"mode": "publish"} if BUFFER_SETTINGS["enabled"] else {}
+    active = jobs.active()
+    if active and active["kind"] == "prerender":
+        # The publish slot wins over filling the buffer: stop it and retry shortly
+        jobs.request_cancel(active["id"])
+        print(f"[SCHED] Cancelling prerender job {active['id']} for the daily run")
+        scheduler.add_job(func=scheduled_job, trigger="date",
+                          run_date=datetime.fromtimestamp(time.time() + 30), id="daily_yt_short_retry",
+                          replace_existing=True)
+        return
+    job = jobs.enqueue_if_idle("scheduled", options)
+    if not job:
+        print("[SCHED] Already running – skipping.")
+        return
+    print(f"[SCHED] Daily run queued as job {job['id']} @ {datetime.now()}")
+
+
+def refill_render_buffer():
+    """Leader-only: queue a CPU-capped prerender job while the buffer is below its depth."""
+    if not lease.is_leader:
+        return
+    should, reason = refill_decision()
+    if not should:
+        return
+    job = jobs.enqueue_if_idle("prerender", {"mode": "prerender"})
+    if job:
+        print(f"[SCHED] Render-ahead job {job['id']} queued ({reason})")
+
+
+def drain_deferred_uploads():
+    """
+    Leader-only: once the quota day of batch uploads deferred for quota has come
+    (midnight Pacific), queue a job that uploads them.
+    """
+    if not lease.is_leader or not deferred_due():
+        return
+    job = jobs.enqueue_if_idle("deferred", {"mode": "deferred"})
+    if job:
+        print(f"[SCHED] Deferred uploads queued as job {job['id']}")
+
+
+def start_background():
+    """
+    Start the lease heartbeat, the dispatcher and the scheduler for this server process.
+    Not done at import time: job processes are spawned, and a spawned child re-imports
+    the main module, so under `python app.py` every job would start its own set.
+    """
+    if scheduler.running:
+        return
+    lease.start()
+    threading.Thread(target=dispatcher, daemon=True, name="dispatcher").start()
+
+    # every day at 06:30
+    scheduler.add_job(
+        func=scheduled_job,
+        trigger="cron",
+        hour=6,
+        minute=30,
+        id="daily_yt_short",
+        replace_existing=True,
+    )
+
+    # render-ahead refill check (does nothing unless RENDER_AHEAD=1)
+    scheduler.add_job(
+        func=refill_render_buffer,
+        trigger="interval",
+        minutes=BUFFER_SETTINGS["refill_minutes"],
+        id="render_ahead_refill",
+        replace_existing=True,
+    )
+
+    # deferred batch uploads; hourly, so a job busy at the quota reset only delays them
+    scheduler.add_job(
+        func=drain_deferred_uploads,
+        trigger="interval",
+        minutes=60,
+        id="deferred_uploads",
+        replace_existing=True,
+    )
+
+    scheduler.start()
+    atexit.register(shutdown)
+
+
+def create_app():
+    """WSGI entry point (Procfile: gunicorn 'app:create_app()'); runs once per worker."""
+    start_background()
+    return app
+
 
 # ---------- web pages -------------------------------------------------
+def next_daily_run():
+    job = scheduler.get_job("daily_yt_short")
+    return job.next_run_time.strftime("%Y-%m-%d %H:%M") if job and job.next_run_time else "—"
+
+
 @app.route("/")
 def index():
-    job = scheduler.get_job("daily_yt_short")
-    next_run = job.next_run_time.strftime("%Y-%m-%d %H:%M") if job.next_run_time else "—"
-    return render_template("index.html", next_run=next_run)
+    return render_template("index.html", next_run=next_daily_run())
+
+
+def _run_options():
+    body = request.get_json(silent=True) or {}
+    profile = body.get("profile") or request.args.get("profile") in ("1", "true")
+    return {"profile": bool(profile)}
 
 
 @app.route("/run-now", methods=["POST"])
 def run_now():
-    global is_running
-    with run_lock:
-        if is_running:
-            return jsonify({"status": "error", "message": "Already running"})
+    job = jobs.enqueue_if_idle("manual", _run_options())
+    if not job:
+        return jsonify({"status": "error", "message": "Already running"})
+    return jsonify({"status": "started", "message": "Automation started", "job_id": job["id"]})
 
-        is_running = True
 
-    def bg():
-        global is_running
-        try:
-            res = run_automation()
-            print("[MANUAL] Done →", res)
-        finally:
-            with run_lock:
-                is_running = False
+@app.route("/status")
+def status():
+    return jsonify({"next_scheduled": next_daily_run(), "running": jobs.active() is not None,
+                    "leader": lease.holder(), "this_worker_leads": lease.is_leader,
+                    "render_buffer": RenderBuffer().stats()})
 
-    threading.Thread(target=bg, daemon=True).start()
-    return jsonify({"status": "started", "message": "Automation started"})
 
+@app.route("/jobs", methods=["POST"])
+def create_job():
+    job = jobs.enqueue_if_idle("manual", _run_options())
+    if not job:
+        return jsonify({"status": "error", "message": "Already running"}), 409
+    return jsonify(job), 201
+
+
+@app.route("/jobs")
+def list_jobs():
+    limit = request.args.get("limit", 20, type=int)
+    return jsonify(jobs.recent(limit))
 
-@app.route("/status")
-def status():
-    job = scheduler.get_job("daily_yt_short")
-    nxt = job.next_run_time.strftime("%Y-%m-%d %H:%M") if job.next_run_time else "—"
-    return jsonify({"next_scheduled": nxt, "running": is_running})
+
+@app.route("/jobs/<int:job_id>")
+def get_job(job_id):
+    job = jobs.get(job_id)
+    if not job:
+        return jsonify({"status": "error", "message": "No such job"}), 404
+    return jsonify(job)
+
+
+@app.route("/jobs/<int:job_id>/cancel", methods=["POST"])
+def cancel_job(job_id):
+    """Cancel a queued job, or ask the leader's watchdog to kill a running one."""
+    job = jobs.get(job_id)
+    if not job:
+        return jsonify({"status": "error", "message": "No such job"}), 404
+    if job["status"] not in ("queued", "running", "cancelling"):
+        return jsonify({"status": "error", "message": f"Job already {job['status']}"}), 409
+    return jsonify(jobs.request_cancel(job_id)), 202
+
+
+@app.route("/metrics")
+def prometheus_metrics():
+    metrics.set_gauge("job_queue_depth", jobs.count("queued"))
+    RenderBuffer().stats()   # refreshes the render_buffer_* gauges
+    return Response(metrics.render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/jobs/<int:job_id>/profile")
+def job_profile(job_id):
+    """Text report of a profiled run (cumulative time + top allocations per stage)."""
+    report = profiling.render_report(f"job-{job_id}")
+    if report is None:
+        return jsonify({"status": "error", "message": "No profile for this job"}), 404
+    return Response(report, mimetype="text/plain")
+
+
+@app.route("/jobs/<int:job_id>/profile/<path:filename>")
+def job_profile_file(job_id, filename):
+    """Raw .prof / .alloc.txt files, e.g. for snakeviz."""
+    directory = os.path.abspath(profiling.profile_dir(f"job-{job_id}"))
+    return send_from_directory(directory, filename, as_attachment=True)
 
 
 # ---------- graceful shutdown -----------------------------------------
-atexit.register(lambda: scheduler.shutdown())
+def shutdown():
+    scheduler.shutdown()
+    lease.release()
+
 
 if __name__ == "__main__":
-    # debug=True is fine for local testing
-    app.run(host="0.0.0.0", port=5000, debug=True)
\ No newline at end of file
+    start_background()
+    # debug=True is fine for local testing; the reloader would run a second server process
+    app.run(host="0.0.0.0", port=5000, debug=True, use_reloader=False)
\ No newline at end of file
@@ -0,0 +1,103 @@
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+import profiling
+
+# ---------------------------
+# ⚙️ Async Settings
+# ---------------------------
+# The job process's coroutines (edge_tts, concurrent translation chunks) run on one
+# event loop instead of an asyncio.run() per call, with an executor for the blocking
+# client calls they fan out. Each service gets its own concurrency limit so a fan-out
+# cannot trip a provider's rate limit. job_watchdog runs every job in a fresh process,
+# so all of this lives for one job. Single blocking calls (yt-dlp metadata, uploads)
+# are made directly: routing them through here would only add a thread hop.
+ASYNC_SETTINGS = {
+    "executor_workers": 4,     # blocking client calls (deep_translator); ≥ the limits below
+    "limits": {
+        "translate": 4,        # Google Translate requests (one per chunk)
+    },
+}
+
+_lock = threading.Lock()
+_loop = None
+_executor = None
+_semaphores = {}
+
+
+def _reset_after_fork():
+    # A forked worker (DAG cpu stage) inherits the loop object but not its thread
+    global _lock, _loop, _executor
+    _lock = threading.Lock()
+    _loop = None
+    _executor = None
+    _semaphores.clear()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_loop():
+    """The process-wide event loop, started on a daemon thread on first use."""
+    global _loop, _executor
+    with _lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            _executor = ThreadPoolExecutor(max_workers=ASYNC_SETTINGS["executor_workers"],
+                                           thread_name_prefix="async-io")
+            loop.set_default_executor(_executor)
+            threading.Thread(target=loop.run_forever, daemon=True, name="async-core").start()
+            _loop = loop
+        return _loop
+
+
+def run(coro, timeout=None):
+    """
+    Run a coroutine on the shared loop and block until it finishes; the replacement
+    for asyncio.run() in synchronous pipeline code.
+    """
+    loop = get_loop()
+    if threading.current_thread().name == "async-core":
+        coro.close()
+        raise RuntimeError("async_core.run() called from the event loop; await the coroutine instead")
+    if profiling.is_active():
+        coro = _profiled(coro)
+    return asyncio.run_coroutine_threadsafe(coro, loop).result(timeout)
+
+
+# A profiled stage only sees its own thread (cProfile is per thread), where these calls
+# are a wait on a future; profiling.attach() adds the loop and executor threads' work.
+
+async def _profiled(coro):
+    with profiling.attach():
+        return await coro
+
+
+def _profiled_call(fn, *args, **kwargs):
+    with profiling.attach():
+        return fn(*args, **kwargs)
+
+
+# ---------------------------
+# 🚦 Per-service limits
+# ---------------------------
+
+@asynccontextmanager
+async def limit(service):
+    """Hold one of the service's concurrency slots (only valid on the shared loop)."""
+    semaphore = _semaphores.get(service)
+    if semaphore is None:
+        semaphore = _semaphores[service] = asyncio.Semaphore(ASYNC_SETTINGS["limits"][service])
+    async with semaphore:
+        yield
+
+
+async def in_executor(service, fn, *args, **kwargs):
+    """Run a blocking client call on the shared executor within the service's limit."""
+    async with limit(service):
+        return await asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(_profiled_call, fn, *args, **kwargs))
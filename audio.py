@@ -1,8 +1,9 @@
 import re
-import asyncio
 import edge_tts
 from openai import OpenAI
 
+import async_core
+
 # ---------------------------
 # Helper functions
 # ---------------------------
@@ -39,7 +40,7 @@ def audio_dub(transcript_text):
     print("\n" + "="*60 + "\n")
 
     print("🎙 Generating Hindi voice audio...")
-    asyncio.run(generate_voice(hindi_text, "ai_dub.mp3", voice="hi-IN-SwaraNeural"))
+    async_core.run(generate_voice(hindi_text, "ai_dub.mp3", voice="hi-IN-SwaraNeural"))
     
     return "ai_dub.mp3"
 
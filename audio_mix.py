@@ -0,0 +1,181 @@
+import os
+import subprocess
+import wave
+
+import numpy as np
+from moviepy.config import get_setting
+
+# ---------------------------
+# ⚙️ Mix Settings
+# ---------------------------
+MIX_SETTINGS = {
+    "enabled": os.environ.get("AUDIO_PREMIX", "1") != "0",
+    "sample_rate": 44100,
+    "channels": 2,
+    "ducking": os.environ.get("AUDIO_DUCKING", "") == "1",
+    "duck_threshold_db": -35.0,   # voice RMS above this counts as speech
+    "duck_gain_db": -9.0,         # bed attenuation while the voice is active
+    "rms_window_ms": 50,
+    "duck_release_ms": 300,       # smoothing of the duck envelope (no pumping)
+    "limiter_ceiling_db": -1.0,
+    "limiter_block_ms": 5,
+}
+
+
+def _db_to_gain(db):
+    return 10.0 ** (db / 20.0)
+
+
+def _ms_to_samples(ms, sample_rate):
+    return max(1, int(sample_rate * ms / 1000))
+
+
+# ---------------------------
+# 📥 Decode / 💾 Write
+# ---------------------------
+
+def decode(path, sample_rate=None, channels=None):
+    """Decode any audio file once with ffmpeg → float32 array of shape (samples, channels)."""
+    sample_rate = sample_rate or MIX_SETTINGS["sample_rate"]
+    channels = channels or MIX_SETTINGS["channels"]
+    cmd = [
+        get_setting("FFMPEG_BINARY"), "-loglevel", "error", "-i", path,
+        "-vn", "-ac", str(channels), "-ar", str(sample_rate), "-f", "f32le", "-",
+    ]
+    raw = subprocess.run(cmd, capture_output=True, check=True).stdout
+    return np.frombuffer(raw, dtype=np.float32).reshape(-1, channels)
+
+
+def write_wav(path, samples, sample_rate=None):
+    """Write float32 samples in [-1, 1] as 16-bit PCM WAV."""
+    sample_rate = sample_rate or MIX_SETTINGS["sample_rate"]
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767.0).astype("<i2")
+    with wave.open(path, "wb") as f:
+        f.setnchannels(samples.shape[1])
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(pcm.tobytes())
+    return path
+
+
+# ---------------------------
+# 🧮 Vectorised DSP
+# ---------------------------
+
+def change_speed(samples, speed_factor):
+    """
+    Same effect as change_audio_speed (play faster/slower by resampling), done with
+    one np.interp per channel instead of an mp3 round trip.
+    """
+    if abs(speed_factor - 1.0) < 1e-6:
+        return samples
+    length = max(1, int(len(samples) / speed_factor))
+    positions = np.arange(length, dtype=np.float64) * speed_factor
+    source = np.arange(len(samples), dtype=np.float64)
+    return np.stack([np.interp(positions, source, samples[:, c]) for c in range(samples.shape[1])],
+                    axis=1).astype(np.float32)
+
+
+def fit_length(samples, length):
+    """Trim, or loop the bed until it covers `length` samples."""
+    if len(samples) == 0:
+        return np.zeros((length, MIX_SETTINGS["channels"]), dtype=np.float32)
+    if len(samples) < length:
+        samples = np.tile(samples, (-(-length // len(samples)), 1))
+    return samples[:length]
+
+
+def _moving_average(values, window):
+    """Centered moving average via a cumulative sum — O(n) for any window."""
+    padded = np.pad(values, (window // 2, window - 1 - window // 2), mode="edge")
+    csum = np.cumsum(padded, dtype=np.float64)
+    csum = np.concatenate(([0.0], csum))
+    return ((csum[window:] - csum[:-window]) / window).astype(np.float32)
+
+
+def rms_envelope(samples, window):
+    """Per-sample RMS (mono sum of channels) over a sliding window."""
+    mono = samples.mean(axis=1)
+    return np.sqrt(_moving_average(mono * mono, window))
+
+
+def duck_envelope(voice, sample_rate, settings=None):
+    """Bed gain per sample: duck_gain while the voice is above the threshold, 1.0 otherwise."""
+    settings = settings or MIX_SETTINGS
+    rms = rms_envelope(voice, _ms_to_samples(settings["rms_window_ms"], sample_rate))
+    active = rms > _db_to_gain(settings["duck_threshold_db"])
+    gain = np.where(active, _db_to_gain(settings["duck_gain_db"]), 1.0).astype(np.float32)
+    return _moving_average(gain, _ms_to_samples(settings["duck_release_ms"], sample_rate))
+
+
+def limit(samples, sample_rate, settings=None):
+    """
+    Block peak limiter: each block's gain is the min over itself and its neighbours,
+    interpolated between block centres, so no sample ends up above the ceiling and the
+    gain never jumps within a block.
+    """
+    settings = settings or MIX_SETTINGS
+    ceiling = _db_to_gain(settings["limiter_ceiling_db"])
+    block = _ms_to_samples(settings["limiter_block_ms"], sample_rate)
+    n = len(samples)
+    if n == 0:
+        return samples
+    blocks = -(-n // block)
+    peaks = np.abs(samples).max(axis=1)
+    peaks = np.pad(peaks, (0, blocks * block - n)).reshape(blocks, block).max(axis=1)
+    if peaks.max() <= ceiling:
+        return samples
+    gains = np.minimum(1.0, ceiling / np.maximum(peaks, 1e-9))
+    gains = np.minimum(gains, np.minimum(np.roll(gains, 1), np.roll(gains, -1)))
+    centres = np.arange(blocks) * block + block / 2.0
+    per_sample = np.interp(np.arange(n), centres, gains).astype(np.float32)
+    return np.clip(samples * per_sample[:, None], -ceiling, ceiling)
+
+
+# ---------------------------
+# 🎛️ Pre-mix
+# ---------------------------
+
+def premix(voice_path, bg_path, output_path, duration, voice_speed_factor=1.0,
+           voice_volume=1.8, bg_volume=0.08, ducking=None, settings=None):
+    """
+    Decode voice and bed once, retime the voice, apply gains (and optional ducking)
+    in one vectorised pass, limit, and write a single PCM WAV of `duration` seconds.
+    """
+    settings = settings or MIX_SETTINGS
+    if ducking is None:
+        ducking = settings["ducking"]
+    sample_rate = settings["sample_rate"]
+    length = int(round(duration * sample_rate))
+
+    voice = change_speed(decode(voice_path, sample_rate), voice_speed_factor)
+    voice = np.pad(voice[:length], ((0, max(0, length - len(voice))), (0, 0)))
+    bed = fit_length(decode(bg_path, sample_rate), length)
+
+    bed_gain = bg_volume
+    if ducking:
+        bed_gain = bg_volume * duck_envelope(voice, sample_rate, settings)[:, None]
+    mixed = voice * voice_volume + bed * bed_gain
+    mixed = limit(mixed, sample_rate, settings)
+
+    write_wav(output_path, mixed, sample_rate)
+    print(f"🎛️ Pre-mixed audio: {duration:.2f}s | voice {voice_volume}x | bed {bg_volume}x"
+          f"{' | ducking' if ducking else ''} → {output_path}")
+    return output_path
+
+
+def mux(video_path, audio_path, output_path, duration=None, audio_bitrate=None):
+    """Copy the video stream and add the pre-mixed track (the only audio encode)."""
+    cmd = [
+        get_setting("FFMPEG_BINARY"), "-y", "-loglevel", "error",
+        "-i", video_path, "-i", audio_path,
+        "-map", "0:v:0", "-map", "1:a:0",
+        "-c:v", "copy", "-c:a", "aac",
+    ]
+    if audio_bitrate:
+        cmd += ["-b:a", audio_bitrate]
+    if duration:
+        cmd += ["-t", f"{duration:.3f}"]
+    cmd += ["-movflags", "+faststart", output_path]
+    subprocess.run(cmd, check=True)
+    return output_path
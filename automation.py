@@ -1,25 +1,74 @@
 # automation.py
+import argparse
 import json
+import os
 import time
-from download_yt_v import get_yt
-from text_to_audio_generater import dub_audio
+import dedup
+import metrics
+import preflight
+import profiling
+import scratch
+import thumbnail
+from download_yt_v import fetch_info, download_video
+from text_to_audio_generater import translate_transcript, synthesize_voice
 from edit_video import video_edit
 from speed import adjust_audio_tone
-from yt_uploader import upload_video
+from yt_client import get_credentials
+from yt_uploader import upload_video, prepare_video_details
+from pipeline_dag import Pipeline, Stage
+from preflight import PREFLIGHT_RULES, PreflightRejection
+from json_store import locked_json
+from render_buffer import RenderBuffer
 
 URL_LINKS = 'shorts_links.json'
 PROCESS_TRACK = 'process_track.json'
+ATTEMPTS_FILE = 'url_attempts.json'
+MAX_URL_ATTEMPTS = 3   # runs killed or interrupted mid-way before a URL is given up
 
+# Per-stage deadlines (seconds); the job watchdog kills a run whose stage overruns
+STAGE_TIMEOUTS = {
+    "preflight": 60,
+    "auth": 60,
+    "fetch_info": 120,
+    "download": 600,
+    "preflight_file": 30,
+    "dedup": 120,
+    "translate": 180,
+    "synthesize": 300,
+    "adjust_audio_tone": 300,
+    "upload_details": 30,
+    "video_edit": 1800,
+    "thumbnail": 60,
+    "upload_video": 1800,
+}
 
-def get_single_new_url() -> str | None:
-    """Return the first un-processed YouTube Shorts URL, or None."""
+
+_candidate_listener = None
+
+
+def listen_candidates(callback):
+    """
+    Report each URL a run starts working on to callback(url); None stops reporting.
+    job_watchdog.py uses it to release that URL's upload slot if it kills the job.
+    """
+    global _candidate_listener
+    _candidate_listener = callback
+
+
+def _notify_candidate(url):
+    if _candidate_listener is not None:
+        _candidate_listener(url)
+
+
+def get_pending_urls():
+    """Yield un-processed YouTube Shorts URLs in file order."""
     # ---- load shorts -------------------------------------------------
     try:
         with open(URL_LINKS, 'r', encoding='utf-8') as f:
             shorts_data = json.load(f)
     except Exception as e:
         print(f"[ERROR] loading {URL_LINKS}: {e}")
-        return None
+        return
 
     # ---- load already processed --------------------------------------
     try:
@@ -40,45 +89,343 @@ def get_single_new_url() -> str | None:
 
     for url in shorts_urls:
         if url and url not in processed_urls and "youtube.com/shorts/" in url:
-            return url
+            yield url
 
-    print("No new Shorts URLs found.")
-    return None
 
-
-def run_automation() -> str:
-    """Execute the full pipeline for ONE short."""
-    print("\n=== Automation START ===")
-    url = get_single_new_url()
+def get_single_new_url() -> str | None:
+    """Return the first un-processed YouTube Shorts URL, or None."""
+    url = next(get_pending_urls(), None)
     if not url:
-        msg = "No new URL to process."
+        print("No new Shorts URLs found.")
+    return url
+
+
+def mark_processed(url, **extra):
+    """Append a URL to PROCESS_TRACK so it is never picked again."""
+    try:
+        with open(PROCESS_TRACK, 'r', encoding='utf-8') as f:
+            track = json.load(f)
+    except FileNotFoundError:
+        track = []
+
+    track.append({"url": url, "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"), **extra})
+    with open(PROCESS_TRACK, 'w', encoding='utf-8') as f:
+        json.dump(track, f, indent=2, ensure_ascii=False)
+    with locked_json(ATTEMPTS_FILE, {}) as attempts:
+        attempts.pop(url, None)
+
+
+def count_attempt(url):
+    """
+    Record one more run of a URL and return how many there were. URLs are only marked
+    processed when they finish, so a job the watchdog keeps killing would otherwise
+    be picked again forever.
+    """
+    with locked_json(ATTEMPTS_FILE, {}) as attempts:
+        attempts[url] = attempts.get(url, 0) + 1
+        return attempts[url]
+
+
+class DuplicateShort(Exception):
+    """Raised by the dedup stage when the download matches an earlier short."""
+
+    def __init__(self, duplicate_of):
+        super().__init__(duplicate_of)
+        self.duplicate_of = duplicate_of
+
+
+class UploadInterrupted(Exception):
+    """The upload failed after its session was opened; the next run resumes it."""
+
+
+# ---------------------------
+# 🕸️ Pipeline stages
+# ---------------------------
+# Each stage takes its inputs as keyword arguments and returns its outputs.
+# "cpu" stages run in worker processes, so they stay module-level. dedup stays on a
+# thread: its work is one ffmpeg subprocess, and the in-memory BK-tree must see the
+# hashes it registers. Every intermediate file goes to the job's scratch dir
+# ("workdir"); persistent state (process_track.json, caches, tokens) stays in the cwd.
+
+def stage_preflight(url):
+    return preflight.check_url(url)
+
+
+def stage_auth():
+    get_credentials()
+    return True
+
+
+def stage_info(url, source_probe, workdir):
+    started = time.perf_counter()
+    # A fresh probe already holds the yt-dlp info; a cached one makes fetch_info extract it
+    metadata = fetch_info(url, save_path=workdir, track_file=PROCESS_TRACK, record=False,
+                          info=source_probe.get("info"))
+    if metadata['info'] is None:
+        raise RuntimeError("could not fetch video metadata")
+    if not metadata['transcript_file']:
+        raise RuntimeError("no transcript available")
+    metadata['started'] = started
+    return metadata
+
+
+def stage_download(metadata, workdir):
+    video = download_video(metadata['info'], workdir)
+    if not video:
+        raise RuntimeError("video download failed")
+    # fetch_info + download_video together are what the get_yt series has always measured
+    metrics.observe("pipeline_stage_duration_seconds", time.perf_counter() - metadata['started'],
+                    stage="get_yt")
+    return video
+
+
+def stage_check_file(video):
+    return preflight.check_file(video)
+
+
+def stage_dedup(url, video, video_probe):
+    duplicate_of = dedup.find_duplicate(video, dedup.video_id_from_url(url))
+    if duplicate_of:
+        raise DuplicateShort(duplicate_of)
+    return True
+
+
+def stage_translate(metadata, workdir):
+    with open(metadata['transcript_file'], 'r', encoding='utf-8') as f:
+        _, translation = translate_transcript(f.read(), translate_to="hi", save_dir=workdir)
+    if not translation:
+        raise RuntimeError("translation failed")
+    return translation
+
+
+def stage_synthesize(translation, source_probe, unique, workdir):
+    if source_probe.get("duration"):
+        preflight.check_dub_estimate(translation, source_probe["duration"])
+    dub = synthesize_voice(translation, os.path.join(workdir, "hindi_dub.mp3"), voice="hi-IN-SwaraNeural")
+    if not dub:
+        raise RuntimeError("voice generation failed")
+    return dub
+
+
+def stage_tone(dub):
+    dub_tone = adjust_audio_tone(dub)
+    if not dub_tone:
+        raise RuntimeError("tone adjustment failed")
+    return dub_tone
+
+
+def stage_upload_details(metadata):
+    return prepare_video_details(metadata)
+
+
+def stage_render(dub_tone, unique, workdir):
+    result = video_edit(choose_bg='', work_dir=workdir)
+    if not result.startswith("✅"):
+        raise RuntimeError(result)
+    return os.path.join(workdir, "output_video.mp4")
+
+
+def stage_thumbnail(output_video):
+    return thumbnail.pick_thumbnail(output_video)
+
+
+def stage_upload(url, output_video, upload_details, youtube_auth, thumbnail_file):
+    # Keyed by URL: a retry after a crash re-renders into a new scratch dir
+    result = upload_video(output_video, details=upload_details, thumbnail=thumbnail_file, job_key=url)
+    if 'error' in result:
+        if result.get('resumable'):
+            raise UploadInterrupted(result['error'])
+        raise RuntimeError(f"upload failed: {result['error']}")
+    return result
+
+
+def _upload_stages():
+    return [
+        Stage("auth", stage_auth, outputs=["youtube_auth"]),
+        Stage("upload_video", stage_upload,
+              inputs=["url", "output_video", "upload_details", "youtube_auth", "thumbnail_file"],
+              outputs=["upload_result"]),
+    ]
+
+
+def build_pipeline(upload=True):
+    """
+    The per-short pipeline as a DAG; `python automation.py --show-dag` prints it.
+    upload=False stops at the rendered video and thumbnail (render-ahead).
+    Translation overlaps the download; TTS waits for dedup, so a near-duplicate
+    costs at most a translation, not a dub.
+    """
+    stages = [
+        Stage("preflight", stage_preflight, inputs=["url"], outputs=["source_probe"]),
+        Stage("fetch_info", stage_info, inputs=["url", "source_probe", "workdir"], outputs=["metadata"]),
+        Stage("download", stage_download, inputs=["metadata", "workdir"], outputs=["video"]),
+        Stage("preflight_file", stage_check_file, inputs=["video"], outputs=["video_probe"]),
+        Stage("dedup", stage_dedup, inputs=["url", "video", "video_probe"], outputs=["unique"]),
+        Stage("translate", stage_translate, inputs=["metadata", "workdir"], outputs=["translation"]),
+        Stage("synthesize", stage_synthesize, inputs=["translation", "source_probe", "unique", "workdir"],
+              outputs=["dub"]),
+        Stage("adjust_audio_tone", stage_tone, inputs=["dub"], outputs=["dub_tone"], kind="cpu"),
+        Stage("upload_details", stage_upload_details, inputs=["metadata"], outputs=["upload_details"]),
+        Stage("video_edit", stage_render, inputs=["dub_tone", "unique", "workdir"], outputs=["output_video"],
+              kind="cpu"),
+        Stage("thumbnail", stage_thumbnail, inputs=["output_video"], outputs=["thumbnail_file"]),
+    ]
+    if upload:
+        stages += _upload_stages()
+    return Pipeline(stages, provided=["url", "workdir"], timeouts=STAGE_TIMEOUTS)
+
+
+def build_publish_pipeline():
+    """Just the upload of a rendered-ahead short, under the same stage deadlines."""
+    return Pipeline(_upload_stages(), provided=["url", "output_video", "upload_details", "thumbnail_file"],
+                    timeouts=STAGE_TIMEOUTS)
+
+
+def process_url(url, workdir=".", upload=True):
+    """
+    Run the pipeline DAG for one URL, with its intermediates in workdir.
+    upload=False renders ahead: the result goes into the render buffer instead of YouTube.
+    Preflight checks gate the expensive stages; a PreflightRejection or a duplicate
+    ends this URL early.
+    Profiled runs execute the stages serially so each capture covers one stage.
+    """
+    try:
+        artifacts = build_pipeline(upload).run(url=url, workdir=workdir, serial=profiling.is_active())
+    except DuplicateShort as duplicate:
+        # ---- skip re-uploads / near-identical clips ---------------------
+        mark_processed(url, skipped="duplicate", duplicate_of=duplicate.duplicate_of)
+        msg = f"SKIPPED – near-duplicate of {duplicate.duplicate_of}"
         print(msg)
         return msg
+    except (PreflightRejection, UploadInterrupted):
+        # Rejections are recorded by the caller; an interrupted upload stays pending
+        raise
+    except Exception as e:
+        mark_processed(url, skipped="failed", reason=str(e))
+        raise
 
-    try:
-        get_yt(url)
-        time.sleep(1)
-        dub_audio()
-        time.sleep(1)
-        adjust_audio_tone("hindi_dub.mp3")
-        time.sleep(1)
-        video_edit(choose_bg='')
-        result = upload_video()
-
-        # ---- remember this URL as processed -------------------------
+    if not upload:
+        item = RenderBuffer().push(url, artifacts['output_video'], artifacts['thumbnail_file'],
+                                   artifacts['upload_details'])
+        mark_processed(url, buffered=item['id'])
+        print("=== Automation SUCCESS (rendered ahead) ===")
+        return f"SUCCESS – rendered ahead as buffer item {item['id']}"
+
+    # ---- remember this URL as processed -------------------------
+    mark_processed(url)
+
+    print("=== Automation SUCCESS ===")
+    return f"SUCCESS – {artifacts['upload_result']}"
+
+
+def publish_from_buffer(run_id=None):
+    """
+    Upload the oldest rendered-ahead short. Returns the run result, or None if the buffer is empty.
+    The claim is held in run_id's name, so the watchdog can put the item back if it kills the job.
+    An item that fails its last allowed attempt is set aside and the next one is tried.
+    """
+    buffer = RenderBuffer()
+    while True:
+        item = buffer.claim_oldest(claimed_by=run_id)
+        if item is None:
+            return None
+        _notify_candidate(item['url'])
+        age_hours = (time.time() - item['created_at']) / 3600
+        print(f"📦 Publishing buffer item {item['id']} ({item['url']}), rendered {age_hours:.1f}h ago")
         try:
-            with open(PROCESS_TRACK, 'r', encoding='utf-8') as f:
-                track = json.load(f)
-        except FileNotFoundError:
-            track = []
+            artifacts = build_publish_pipeline().run(url=item['url'], output_video=item['video'],
+                                                     upload_details=item['details'],
+                                                     thumbnail_file=item['thumbnail'],
+                                                     serial=profiling.is_active())
+        except Exception as e:
+            if buffer.restore(item['id']) != 'failed':
+                return f"Automation FAILED: {e}"
+            print(f"🚫 Buffer item {item['id']} failed {item['attempts'] + 1} times ({e}) — set aside")
+            continue
+        break
+    buffer.remove(item['id'])
+    print("=== Automation SUCCESS (from buffer) ===")
+    return f"SUCCESS – {artifacts['upload_result']}"
 
-        track.append({"url": url, "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")})
-        with open(PROCESS_TRACK, 'w', encoding='utf-8') as f:
-            json.dump(track, f, indent=2, ensure_ascii=False)
 
-        print("=== Automation SUCCESS ===")
-        return f"SUCCESS – {result}"
+def run_automation(profile=False, run_id=None, mode="full") -> str:
+    """
+    Execute the full pipeline for ONE short.
+    mode="publish" uploads the oldest rendered-ahead short instead and only falls back
+    to a full run when the buffer is empty; mode="prerender" renders one short into
+    the buffer without uploading it.
+    Candidates rejected by preflight are recorded and the next pending URL is tried,
+    up to PREFLIGHT_RULES['max_candidates_per_run'] rejections.
+    profile=True stores a cProfile + tracemalloc capture per stage under profiles/<run_id>.
+    Intermediates live in a scratch dir named after run_id (see scratch.py); the run
+    is refused up front when there is no room for it.
+    """
+    print(f"\n=== Automation START ({mode}) ===")
+    run_id = run_id or time.strftime("run-%Y%m%d-%H%M%S")
+    if mode == "publish":
+        try:
+            result = publish_from_buffer(run_id)
+        except Exception as e:
+            result = f"Automation FAILED: {e}"
+        if result is not None:
+            print(result)
+            return result
+        print("📭 Render buffer empty — falling back to a full run")
+    elif mode == "prerender" and RenderBuffer().is_full():
+        msg = "SKIPPED – render buffer full"
+        print(msg)
+        return msg
+
+    pending = get_pending_urls()
+
+    try:
+        workdir = scratch.allocate(run_id)
+    except scratch.ScratchBudgetExceeded as e:
+        msg = f"REFUSED – {e}"
+        print(msg)
+        return msg
+
+    if profile:
+        profiling.start(run_id)
+    try:
+        for attempt, url in enumerate(pending):
+            if attempt >= PREFLIGHT_RULES["max_candidates_per_run"]:
+                break
+            print(f"🎯 Candidate: {url}")
+            attempts = count_attempt(url)
+            if attempts > MAX_URL_ATTEMPTS:
+                print(f"🚫 Giving up on {url} after {MAX_URL_ATTEMPTS} interrupted runs")
+                mark_processed(url, skipped="failed", reason=f"{MAX_URL_ATTEMPTS} interrupted runs")
+                continue
+            _notify_candidate(url)
+            try:
+                return process_url(url, workdir, upload=mode != "prerender")
+            except PreflightRejection as rejection:
+                preflight.record_rejection(url, str(rejection), rejection.stage)
+                mark_processed(url, skipped="preflight", reason=str(rejection))
+
+        msg = "No new URL to process."
+        print(msg)
+        return msg
     except Exception as e:
         err = f"Automation FAILED: {e}"
         print(err)
-        return err
\ No newline at end of file
+        return err
+    finally:
+        profiling.stop()
+        scratch.release(workdir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Process one new short end to end")
+    parser.add_argument("--profile", action="store_true",
+                        help="capture cProfile + tracemalloc per stage under profiles/")
+    parser.add_argument("--run-id", default=None)
+    parser.add_argument("--mode", choices=["full", "publish", "prerender"], default="full",
+                        help="publish = upload from the render buffer, prerender = fill it")
+    parser.add_argument("--show-dag", action="store_true", help="print the stage graph and exit")
+    args = parser.parse_args()
+    if args.show_dag:
+        print(build_pipeline(upload=args.mode != "prerender").describe())
+    else:
+        print(run_automation(profile=args.profile, run_id=args.run_id, mode=args.mode))
\ No newline at end of file
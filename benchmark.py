@@ -0,0 +1,292 @@
+import argparse
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+
+from moviepy.config import get_setting
+
+# ---------------------------
+# Synthetic inputs
+# ---------------------------
+
+def make_synthetic_inputs(work_dir, seconds=45, voice_seconds=40, size="1080x1920", fps=30):
+    """
+    Generate yt_video.mp4, hindi_dub_tone.mp3 and a background track with ffmpeg's
+    lavfi sources so benchmarks are repeatable and need no network.
+    """
+    ffmpeg = get_setting("FFMPEG_BINARY")
+    files = {
+        "video": os.path.join(work_dir, "yt_video.mp4"),
+        "voice": os.path.join(work_dir, "hindi_dub_tone.mp3"),
+        "bg": os.path.join(work_dir, "bg.mp3"),
+    }
+    commands = [
+        ["-f", "lavfi", "-i", f"testsrc2=size={size}:rate={fps}:duration={seconds}",
+         "-f", "lavfi", "-i", f"sine=frequency=330:duration={seconds}",
+         "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p", "-c:a", "aac", files["video"]],
+        ["-f", "lavfi", "-i", f"sine=frequency=220:duration={voice_seconds}", files["voice"]],
+        ["-f", "lavfi", "-i", "anoisesrc=duration=20:amplitude=0.2", files["bg"]],
+    ]
+    for args in commands:
+        subprocess.run([ffmpeg, "-y", "-loglevel", "error", *args], check=True)
+    return files
+
+
+def _timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+# ---------------------------
+# Render scaling
+# ---------------------------
+
+def bench_render(max_workers=None, seconds=45):
+    """Wall time of the composite vs. pre-mixed single-pipe render and of segmented renders on 1..N workers."""
+    from edit_video import video_edit
+
+    max_workers = max_workers or os.cpu_count() or 1
+    work_dir = tempfile.mkdtemp(prefix="bench_render_")
+    cwd = os.getcwd()
+    rows = []
+    try:
+        files = make_synthetic_inputs(work_dir, seconds=seconds, voice_seconds=int(seconds * 0.9))
+        os.chdir(work_dir)
+
+        elapsed, result = _timed(video_edit, choose_bg=files["bg"], use_cache=False, premix=False)
+        rows.append(("composite", elapsed, result))
+        elapsed, result = _timed(video_edit, choose_bg=files["bg"], use_cache=False, premix=True)
+        rows.append(("single pipe", elapsed, result))
+
+        workers = 1
+        while workers <= max_workers:
+            elapsed, result = _timed(video_edit, choose_bg=files["bg"],
+                                     parallel_segments=workers, workers=workers, use_cache=False)
+            rows.append((f"{workers} workers", elapsed, result))
+            workers *= 2
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    base = rows[0][1]
+    print(f"\n{'=' * 60}")
+    print(f"📊 RENDER SCALING ({seconds}s synthetic 1080x1920 source)")
+    print(f"{'=' * 60}")
+    for label, elapsed, result in rows:
+        print(f"{label:>12}: {elapsed:7.2f}s  x{base / elapsed:4.2f}  {result}")
+    return rows
+
+
+# ---------------------------
+# Streaming render under a memory ceiling
+# ---------------------------
+
+def bench_stream(seconds=600, memory_limit_mb=384):
+    """
+    Render a long synthetic clip with the streaming path and fail if any stage
+    goes over the memory ceiling (ffmpeg is killed by the StageMeter).
+    """
+    from speed import adjust_audio_tone
+    from streaming import render_streaming, StageMeter
+
+    work_dir = tempfile.mkdtemp(prefix="bench_stream_")
+    try:
+        files = make_synthetic_inputs(work_dir, seconds=seconds, voice_seconds=int(seconds * 1.2))
+        raw_voice = os.path.join(work_dir, "hindi_dub.mp3")
+        shutil.move(files["voice"], raw_voice)
+
+        with StageMeter("bench: tone", memory_limit_mb):
+            elapsed_tone, _ = _timed(adjust_audio_tone, raw_voice, files["voice"], streaming=True)
+        with StageMeter("bench: render", memory_limit_mb) as meter:
+            elapsed_render, _ = _timed(render_streaming, files["video"], files["voice"], files["bg"],
+                                       os.path.join(work_dir, "output_video.mp4"),
+                                       memory_limit_mb=memory_limit_mb)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"\n{'=' * 60}")
+    print(f"📊 STREAMING RENDER ({seconds}s source, {memory_limit_mb} MB ceiling)")
+    print(f"{'=' * 60}")
+    print(f"tone:   {elapsed_tone:7.2f}s")
+    print(f"render: {elapsed_render:7.2f}s  python peak {meter.peak_self_mb:.0f} MB")
+    return elapsed_tone, elapsed_render
+
+
+# ---------------------------
+# YouTube client reuse
+# ---------------------------
+
+def bench_auth(calls=20):
+    """Cost of the first client build vs. cached reuse (needs token.pickle)."""
+    import yt_client
+
+    yt_client.reset()
+    cold, _ = _timed(yt_client.get_youtube)
+    warm = [_timed(yt_client.get_youtube)[0] for _ in range(calls)]
+
+    print(f"\n{'=' * 60}")
+    print("📊 YOUTUBE CLIENT")
+    print(f"{'=' * 60}")
+    print(f"first build: {cold * 1000:8.1f} ms")
+    print(f"cached call: {sum(warm) / len(warm) * 1000:8.3f} ms avg over {calls}")
+    return cold, warm
+
+
+# ---------------------------
+# Uploads against the fake API
+# ---------------------------
+
+@contextmanager
+def fake_api(**settings):
+    """Point yt_client at a local fake_youtube.py server for the duration of the block."""
+    import yt_client
+    from fake_youtube import start_fake_server
+
+    server, state, url = start_fake_server(**settings)
+    previous_endpoint = yt_client.API_ENDPOINT
+    yt_client.API_ENDPOINT = url
+    yt_client.reset()
+    try:
+        yield state
+    finally:
+        yt_client.API_ENDPOINT = previous_endpoint
+        yt_client.reset()
+        server.shutdown()
+
+
+def bench_upload(videos=4, size_mb=40, bandwidth_mbps=100, latency_ms=30, fail_rate=0.0,
+                 concurrency_levels=(1, 2, 4)):
+    """
+    Batch-upload synthetic files to fake_youtube.py and report wall time per
+    concurrency level. Quota, slot and session state live in a temp dir.
+    """
+    from upload_on_yt import batch_upload_videos
+
+    work_dir = tempfile.mkdtemp(prefix="bench_upload_")
+    cwd = os.getcwd()
+    rows = []
+    with fake_api(bandwidth_mbps=bandwidth_mbps, latency_ms=latency_ms,
+                  fail_rate=fail_rate, seed=7) as state:
+        try:
+            os.chdir(work_dir)
+            files = []
+            for i in range(videos):
+                path = f"video_{i}.mp4"
+                with open(path, "wb") as f:
+                    f.write(os.urandom(size_mb * 1024 * 1024))
+                files.append(path)
+
+            for level in concurrency_levels:
+                elapsed, results = _timed(batch_upload_videos, files, use_defaults=True,
+                                          concurrency=level, channel=f"bench-{level}")
+                ok = [r for r in results if "success" in r]
+                rate = sum(r["mb_per_s"] for r in ok) / len(ok) if ok else 0.0
+                rows.append((level, elapsed, len(ok), rate))
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"\n{'=' * 60}")
+    print(f"📊 UPLOADS ({videos} x {size_mb} MB, {bandwidth_mbps} Mbps, {latency_ms} ms, "
+          f"{fail_rate:.0%} 5xx)")
+    print(f"{'=' * 60}")
+    for level, elapsed, ok, rate in rows:
+        print(f"concurrency {level}: {elapsed:7.2f}s  {ok}/{videos} ok  {rate:6.2f} MB/s per upload")
+    print(f"server: {state.stats}")
+    return rows
+
+
+# ---------------------------
+# Render + upload by encode mode
+# ---------------------------
+
+ENCODE_BENCH_MODES = [
+    ("x264 default", {"mode": "default"}),
+    ("bitrate", {"mode": "bitrate"}),
+    ("bitrate 2-pass", {"mode": "bitrate", "two_pass": True}),
+    ("size", {"mode": "size"}),
+    ("size 2-pass", {"mode": "size", "two_pass": True}),
+]
+
+
+def bench_encode(seconds=45, uplink_mbps=10, target_size_mb=15, latency_ms=30):
+    """
+    Render the same synthetic short in each encode mode and upload it to the fake API
+    at `uplink_mbps`; reports render, upload and total wall time per mode.
+    """
+    from edit_video import video_edit
+    from yt_uploader import upload_video
+
+    work_dir = tempfile.mkdtemp(prefix="bench_encode_")
+    cwd = os.getcwd()
+    rows = []
+    with fake_api(bandwidth_mbps=uplink_mbps, latency_ms=latency_ms, seed=7):
+        try:
+            files = make_synthetic_inputs(work_dir, seconds=seconds, voice_seconds=int(seconds * 0.9))
+            os.chdir(work_dir)
+            for label, overrides in ENCODE_BENCH_MODES:
+                encode = dict(overrides, uplink_mbps=uplink_mbps, target_size_mb=target_size_mb)
+                render_s, result = _timed(video_edit, choose_bg=files["bg"], use_cache=False, encode=encode)
+                size_mb = os.path.getsize("output_video.mp4") / (1024 * 1024)
+                upload_s, uploaded = _timed(upload_video, "output_video.mp4", "missing.json")
+                ok = "success" in uploaded
+                rows.append((label, render_s, upload_s, size_mb, ok))
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"\n{'=' * 72}")
+    print(f"📊 RENDER + UPLOAD ({seconds}s synthetic short, {uplink_mbps:g} Mbps uplink, "
+          f"size target {target_size_mb} MB)")
+    print(f"{'=' * 72}")
+    for label, render_s, upload_s, size_mb, ok in rows:
+        print(f"{label:>15}: render {render_s:7.2f}s + upload {upload_s:7.2f}s "
+              f"= {render_s + upload_s:7.2f}s  {size_mb:6.1f} MB{'' if ok else '  UPLOAD FAILED'}")
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pipeline benchmarks")
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    render = sub.add_parser("render", help="segmented render scaling from 1 to N workers")
+    render.add_argument("--workers", type=int, default=None)
+    render.add_argument("--seconds", type=int, default=45)
+
+    stream = sub.add_parser("stream", help="long synthetic render under a memory ceiling")
+    stream.add_argument("--seconds", type=int, default=600)
+    stream.add_argument("--memory-limit-mb", type=int, default=384)
+
+    auth = sub.add_parser("auth", help="YouTube client build vs. cached reuse")
+    auth.add_argument("--calls", type=int, default=20)
+
+    upload = sub.add_parser("upload", help="batch uploads against the local fake API")
+    upload.add_argument("--videos", type=int, default=4)
+    upload.add_argument("--size-mb", type=int, default=40)
+    upload.add_argument("--bandwidth-mbps", type=float, default=100)
+    upload.add_argument("--latency-ms", type=float, default=30)
+    upload.add_argument("--fail-rate", type=float, default=0.0)
+    upload.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4])
+
+    encode = sub.add_parser("encode", help="render + upload wall time per encode mode")
+    encode.add_argument("--seconds", type=int, default=45)
+    encode.add_argument("--uplink-mbps", type=float, default=10)
+    encode.add_argument("--target-size-mb", type=float, default=15)
+    encode.add_argument("--latency-ms", type=float, default=30)
+
+    args = parser.parse_args()
+    if args.bench == "render":
+        bench_render(args.workers, args.seconds)
+    elif args.bench == "stream":
+        bench_stream(args.seconds, args.memory_limit_mb)
+    elif args.bench == "auth":
+        bench_auth(args.calls)
+    elif args.bench == "upload":
+        bench_upload(args.videos, args.size_mb, args.bandwidth_mbps, args.latency_ms,
+                     args.fail_rate, args.concurrency)
+    elif args.bench == "encode":
+        bench_encode(args.seconds, args.uplink_mbps, args.target_size_mb, args.latency_ms)
@@ -0,0 +1,242 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing, contextmanager
+
+# ---------------------------
+# ⚙️ Coordination Settings
+# ---------------------------
+STATE_DB = os.environ.get("AUTOMATION_STATE_DB", "automation_state.db")
+LEASE_SETTINGS = {
+    "ttl_seconds": 30,        # a leader that misses heartbeats for this long loses the lease
+    "heartbeat_seconds": 10,
+}
+
+ACTIVE_STATUSES = ("queued", "running", "cancelling")
+_ACTIVE_IN = f"status IN ({', '.join('?' * len(ACTIVE_STATUSES))})"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    heartbeat_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    options TEXT NOT NULL DEFAULT '{}',
+    result TEXT,
+    owner TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+"""
+_schema_ready = set()
+
+
+_PROCESS_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+def process_id():
+    """Identity of this process in leases and job rows."""
+    return _PROCESS_ID
+
+
+def connect():
+    conn = sqlite3.connect(STATE_DB, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    if STATE_DB not in _schema_ready:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        _schema_ready.add(STATE_DB)
+    return conn
+
+
+@contextmanager
+def transaction():
+    """BEGIN IMMEDIATE … COMMIT: one writer at a time across every process."""
+    with closing(connect()) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+# ---------------------------
+# 👑 Lease-based leader election
+# ---------------------------
+
+class Lease:
+    """
+    A named lease in STATE_DB. The holder renews it every heartbeat; if it stops
+    (crash, deploy, OOM) another process takes over once the lease expires.
+    """
+
+    def __init__(self, name="scheduler", owner=None):
+        self.name = name
+        self.owner = owner or process_id()
+        self._valid_until = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def is_leader(self):
+        return time.time() < self._valid_until
+
+    def try_acquire(self):
+        now = time.time()
+        ttl = LEASE_SETTINGS["ttl_seconds"]
+        with transaction() as conn:
+            row = conn.execute("SELECT owner, expires_at FROM leases WHERE name = ?",
+                               (self.name,)).fetchone()
+            if row and row["owner"] != self.owner and row["expires_at"] > now:
+                self._valid_until = 0.0
+                return False
+            conn.execute(
+                "INSERT INTO leases (name, owner, expires_at, heartbeat_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, "
+                "expires_at = excluded.expires_at, heartbeat_at = excluded.heartbeat_at",
+                (self.name, self.owner, now + ttl, now))
+            took_over = not row or row["owner"] != self.owner
+        # Stop trusting the lease a heartbeat before anyone else may take it
+        self._valid_until = now + ttl - LEASE_SETTINGS["heartbeat_seconds"]
+        if took_over:
+            print(f"[LEASE] {self.owner} now leads '{self.name}'")
+            JobStore().fail_orphans(self.owner)
+        return True
+
+    def release(self):
+        self._stop.set()
+        self._valid_until = 0.0
+        with transaction() as conn:
+            conn.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (self.name, self.owner))
+
+    def holder(self):
+        with closing(connect()) as conn:
+            row = conn.execute("SELECT owner, expires_at FROM leases WHERE name = ?",
+                               (self.name,)).fetchone()
+        if row and row["expires_at"] > time.time():
+            return row["owner"]
+        return None
+
+    def _heartbeat(self):
+        while not self._stop.is_set():
+            try:
+                self.try_acquire()
+            except sqlite3.Error as e:
+                self._valid_until = 0.0
+                print(f"[LEASE] heartbeat failed: {e}")
+            self._stop.wait(LEASE_SETTINGS["heartbeat_seconds"])
+
+    def start(self):
+        self._thread = threading.Thread(target=self._heartbeat, daemon=True, name=f"lease-{self.name}")
+        self._thread.start()
+        return self
+
+
+# ---------------------------
+# 📋 Shared job state
+# ---------------------------
+
+def _job_dict(row):
+    if row is None:
+        return None
+    job = dict(row)
+    job["options"] = json.loads(job["options"] or "{}")
+    return job
+
+
+class JobStore:
+    """Pipeline runs as rows in STATE_DB, readable from every web worker."""
+
+    def enqueue_if_idle(self, kind, options=None):
+        """Queue a run unless one is already queued or running. Returns the job or None."""
+        with transaction() as conn:
+            busy = conn.execute(
+                f"SELECT id FROM jobs WHERE {_ACTIVE_IN} LIMIT 1", ACTIVE_STATUSES).fetchone()
+            if busy:
+                return None
+            cur = conn.execute(
+                "INSERT INTO jobs (kind, status, options, created_at) VALUES (?, 'queued', ?, ?)",
+                (kind, json.dumps(options or {}), time.time()))
+            job_id = cur.lastrowid
+        return self.get(job_id)
+
+    def claim_next(self, owner):
+        """Atomically move the oldest queued job to running for `owner`."""
+        with transaction() as conn:
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1").fetchone()
+            if not row:
+                return None
+            conn.execute("UPDATE jobs SET status = 'running', owner = ?, started_at = ? WHERE id = ?",
+                         (owner, time.time(), row["id"]))
+        return self.get(row["id"])
+
+    def finish(self, job_id, status, result, owner=None):
+        """
+        Record a job's outcome. With owner, only if the job is still that process's:
+        a new leader's fail_orphans() may already have closed it. Returns True if written.
+        """
+        with transaction() as conn:
+            if owner is None:
+                cur = conn.execute("UPDATE jobs SET status = ?, result = ?, finished_at = ? WHERE id = ?",
+                                   (status, str(result), time.time(), job_id))
+            else:
+                cur = conn.execute(
+                    "UPDATE jobs SET status = ?, result = ?, finished_at = ? "
+                    "WHERE id = ? AND owner = ? AND status IN ('running', 'cancelling')",
+                    (status, str(result), time.time(), job_id, owner))
+        return cur.rowcount > 0
+
+    def request_cancel(self, job_id):
+        """
+        Queued jobs are cancelled at once; running ones move to 'cancelling' and the
+        leader's watchdog kills them. Returns the updated job, or None if unknown.
+        """
+        with transaction() as conn:
+            row = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            if row["status"] == "queued":
+                conn.execute("UPDATE jobs SET status = 'cancelled', result = 'cancelled before start', "
+                             "finished_at = ? WHERE id = ?", (time.time(), job_id))
+            elif row["status"] == "running":
+                conn.execute("UPDATE jobs SET status = 'cancelling' WHERE id = ?", (job_id,))
+        return self.get(job_id)
+
+    def fail_orphans(self, new_owner):
+        """Running jobs of a previous leader will never finish — close them out."""
+        with transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', result = 'leader lost', finished_at = ? "
+                "WHERE status IN ('running', 'cancelling') AND owner != ?", (time.time(), new_owner))
+
+    def count(self, status):
+        with closing(connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (status,)).fetchone()[0]
+
+    def get(self, job_id):
+        with closing(connect()) as conn:
+            return _job_dict(conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def active(self):
+        with closing(connect()) as conn:
+            return _job_dict(conn.execute(
+                f"SELECT * FROM jobs WHERE {_ACTIVE_IN} ORDER BY id LIMIT 1", ACTIVE_STATUSES).fetchone())
+
+    def recent(self, limit=20):
+        with closing(connect()) as conn:
+            rows = conn.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return [_job_dict(r) for r in rows]
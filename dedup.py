@@ -0,0 +1,183 @@
+import json
+import re
+import subprocess
+
+import numpy as np
+from moviepy.config import get_setting
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+
+from json_store import locked_json
+
+# ---------------------------
+# ⚙️ Dedup Settings
+# ---------------------------
+PHASH_INDEX = "phash_index.json"
+DEDUP_SETTINGS = {
+    "frames": 8,               # frames sampled evenly across the video
+    "max_distance": 10,        # Hamming distance (of 64 bits) that counts as the same frame
+    "min_match_ratio": 0.5,    # share of sampled frames that must match one earlier video
+}
+
+_HASH_SIZE = 32     # frames are reduced to 32x32 grey before the DCT
+_LOW_FREQ = 8       # the top-left 8x8 DCT block becomes the 64-bit hash
+
+
+def video_id_from_url(url):
+    match = re.search(r"(?:shorts/|v=|youtu\.be/)([\w-]{11})", url or "")
+    return match.group(1) if match else url
+
+
+# ---------------------------
+# 🧮 Vectorised pHash
+# ---------------------------
+
+def _dct_matrix(n):
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2 / n)
+    matrix[0] /= np.sqrt(2)
+    return matrix.astype(np.float32)
+
+
+_DCT = _dct_matrix(_HASH_SIZE)
+
+
+def sample_frames(video_path, count=None):
+    """Decode `count` evenly spaced 32x32 grey frames in a single ffmpeg pass → (count, 32, 32)."""
+    count = count or DEDUP_SETTINGS["frames"]
+    duration = ffmpeg_parse_infos(video_path)["duration"] or 1.0
+    cmd = [
+        get_setting("FFMPEG_BINARY"), "-loglevel", "error", "-i", video_path,
+        "-vf", f"fps={count / duration:.6f},scale={_HASH_SIZE}:{_HASH_SIZE}:flags=area,format=gray",
+        "-frames:v", str(count), "-f", "rawvideo", "-",
+    ]
+    raw = subprocess.run(cmd, capture_output=True, check=True).stdout
+    frame_bytes = _HASH_SIZE * _HASH_SIZE
+    usable = len(raw) // frame_bytes
+    return np.frombuffer(raw[:usable * frame_bytes], dtype=np.uint8).reshape(usable, _HASH_SIZE, _HASH_SIZE)
+
+
+def phash_frames(frames):
+    """DCT pHash of a batch of frames in one pass. Returns a list of 64-bit ints."""
+    if len(frames) == 0:
+        return []
+    dct = _DCT @ frames.astype(np.float32) @ _DCT.T
+    low = dct[:, :_LOW_FREQ, :_LOW_FREQ].reshape(len(frames), -1)
+    # Median of the AC terms only: the DC term would dominate and flatten the hash
+    median = np.median(low[:, 1:], axis=1, keepdims=True)
+    bits = np.packbits(low > median, axis=1)
+    return [int(h) for h in bits.view(">u8").ravel()]
+
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+
+# ---------------------------
+# 🌳 BK-tree index
+# ---------------------------
+
+class BKTree:
+    """
+    Metric tree over Hamming distance: a query only descends into children whose edge
+    distance is within [d - radius, d + radius], so lookups touch a small part of the
+    index even at tens of thousands of hashes.
+    """
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def add(self, value, item):
+        self.size += 1
+        if self.root is None:
+            self.root = [value, [item], {}]
+            return
+        node = self.root
+        while True:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [item], {}]
+                return
+            node = child
+
+    def query(self, value, radius):
+        """All (item, distance) within `radius` of value."""
+        if self.root is None:
+            return []
+        found, stack = [], [self.root]
+        while stack:
+            node = stack.pop()
+            distance = hamming(value, node[0])
+            if distance <= radius:
+                found.extend((item, distance) for item in node[1])
+            for edge, child in node[2].items():
+                if distance - radius <= edge <= distance + radius:
+                    stack.append(child)
+        return found
+
+
+_tree = None
+_tree_videos = set()
+
+
+def _load_tree():
+    """Build the BK-tree from PHASH_INDEX once per process; later adds go to both."""
+    global _tree
+    if _tree is None:
+        _tree = BKTree()
+        try:
+            with open(PHASH_INDEX, "r", encoding="utf-8") as f:
+                videos = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            videos = {}
+        for video_id, hashes in videos.items():
+            _add_to_tree(video_id, [int(h, 16) for h in hashes])
+    return _tree
+
+
+def _add_to_tree(video_id, hashes):
+    if video_id in _tree_videos:
+        return
+    _tree_videos.add(video_id)
+    for h in hashes:
+        _tree.add(h, video_id)
+
+
+def register(video_id, hashes):
+    _load_tree()
+    with locked_json(PHASH_INDEX, {}) as videos:
+        videos[video_id] = [f"{h:016x}" for h in hashes]
+    _add_to_tree(video_id, hashes)
+
+
+def find_duplicate(video_path, video_id):
+    """
+    Hash sampled frames of a downloaded short and compare them with everything
+    processed before. Returns the id of a near-duplicate, or None (and the short
+    is added to the index).
+    """
+    hashes = phash_frames(sample_frames(video_path))
+    if not hashes:
+        return None
+    tree = _load_tree()
+
+    votes = {}
+    for h in hashes:
+        matched = {item for item, _ in tree.query(h, DEDUP_SETTINGS["max_distance"]) if item != video_id}
+        for item in matched:
+            votes[item] = votes.get(item, 0) + 1
+
+    if votes:
+        best, count = max(votes.items(), key=lambda kv: kv[1])
+        if count >= DEDUP_SETTINGS["min_match_ratio"] * len(hashes):
+            print(f"🪞 Near-duplicate: {count}/{len(hashes)} frames match {best}")
+            return best
+
+    register(video_id, hashes)
+    print(f"🆕 Perceptual hashes indexed for {video_id} ({_tree.size} frames in index)")
+    return None
@@ -2,11 +2,63 @@ from yt_dlp import YoutubeDL
 import os
 import json
 
-def get_yt(url, save_path='.'):
+import metrics
+
+def _subtitle_text(ydl, info_dict):
+    """Plain text of the English subtitles (manual first, then automatic), or ''."""
+    transcript_text = ""
+    subtitles = info_dict.get('subtitles', {})
+    automatic_captions = info_dict.get('automatic_captions', {})
+
+    # Try manual subtitles first, then automatic
+    all_subs = subtitles if subtitles else automatic_captions
+
+    if all_subs and 'en' in all_subs:
+        # Get the subtitle data
+        sub_list = all_subs['en']
+        for sub in sub_list:
+            if 'url' in sub:
+                # Download and parse subtitle
+                try:
+                    sub_data = ydl.urlopen(sub['url']).read().decode('utf-8')
+                    # Basic cleanup for common subtitle formats
+                    lines = sub_data.split('\n')
+                    for line in lines:
+                        # Skip timestamp lines and empty lines
+                        if '-->' not in line and line.strip() and not line.strip().isdigit():
+                            transcript_text += line.strip() + " "
+                    break
+                except:
+                    continue
+    return transcript_text
+
+
+def _ydl_opts(save_path):
+    return {
+        'outtmpl': os.path.join(save_path, 'yt_video.%(ext)s'),
+        'format': 'best',
+        'quiet': False,
+        'noplaylist': True,
+        'overwrites': True,
+        'writesubtitles': True,
+        'writeautomaticsub': True,
+        'subtitleslangs': ['en'],
+        'skip_download': False
+    }
+
+
+@metrics.instrument("fetch_info")
+def fetch_info(url, save_path='.', track_file=None, record=True, info=None):
     """
-    Download YouTube video, transcript, and save metadata to JSON.
-    Tracks processed videos in 'process_track.json' and skips duplicates.
-    Always overwrites yt_video.mp4, yt_metadata.json, and yt_transcript.txt.
+    First half of get_yt: metadata + transcript only, no video download.
+    Saves yt_metadata.json and yt_transcript.txt and records the URL in process_track.json,
+    so translation can start while download_video() is still running.
+    The raw yt-dlp info is returned in result['info'] for download_video().
+    track_file defaults to process_track.json inside save_path.
+    record=False only checks track_file; the caller marks the URL once it is done
+    (automation.py, so an interrupted upload is retried).
+    info: a yt-dlp info dict already extracted for url (preflight.probe_url()); it is
+    used instead of extracting again.
     """
     result = {
         'title': None,
@@ -14,14 +66,14 @@ def get_yt(url, save_path='.'):
         'tags': None,
         'url': url,
         'video_file': None,
-        'transcript_file': None
+        'transcript_file': None,
+        'info': None
     }
 
     # File paths
-    video_file = os.path.join(save_path, "yt_video.mp4")
     json_file = os.path.join(save_path, "yt_metadata.json")
     transcript_file = os.path.join(save_path, "yt_transcript.txt")
-    track_file = os.path.join(save_path, "process_track.json")
+    track_file = track_file or os.path.join(save_path, "process_track.json")
 
     # ✅ Load or create tracking file
     if os.path.exists(track_file):
@@ -37,90 +89,97 @@ def get_yt(url, save_path='.'):
             return result  # ⛔ Stop function early
 
     # ✅ Delete old files if they exist
-    for fpath in [video_file, json_file, transcript_file]:
+    for fpath in [json_file, transcript_file]:
         if os.path.exists(fpath):
             os.remove(fpath)
             print(f"🧹 Old {os.path.basename(fpath)} deleted")
 
     try:
-        # ✅ yt-dlp settings
-        ydl_opts = {
-            'outtmpl': os.path.join(save_path, 'yt_video.%(ext)s'),
-            'format': 'best',
-            'quiet': False,
-            'noplaylist': True,
-            'overwrites': True,
-            'writesubtitles': True,
-            'writeautomaticsub': True,
-            'subtitleslangs': ['en'],
-            'skip_download': False
-        }
-
-        with YoutubeDL(ydl_opts) as ydl:
-            info_dict = ydl.extract_info(url, download=True)
+        with YoutubeDL(_ydl_opts(save_path)) as ydl:
+            info_dict = info if info is not None else ydl.extract_info(url, download=False)
 
             result['title'] = info_dict.get('title')
             result['description'] = info_dict.get('description')
             result['tags'] = info_dict.get('tags', [])
-            result['video_file'] = video_file
+            result['info'] = info_dict
 
             # ✅ Extract transcript from subtitles
-            transcript_text = ""
-            subtitles = info_dict.get('subtitles', {})
-            automatic_captions = info_dict.get('automatic_captions', {})
-            
-            # Try manual subtitles first, then automatic
-            all_subs = subtitles if subtitles else automatic_captions
-            
-            if all_subs and 'en' in all_subs:
-                # Get the subtitle data
-                sub_list = all_subs['en']
-                for sub in sub_list:
-                    if 'url' in sub:
-                        # Download and parse subtitle
-                        try:
-                            sub_data = ydl.urlopen(sub['url']).read().decode('utf-8')
-                            # Basic cleanup for common subtitle formats
-                            lines = sub_data.split('\n')
-                            for line in lines:
-                                # Skip timestamp lines and empty lines
-                                if '-->' not in line and line.strip() and not line.strip().isdigit():
-                                    transcript_text += line.strip() + " "
-                            break
-                        except:
-                            continue
-            
-            # ✅ Save transcript to file
-            if transcript_text:
-                with open(transcript_file, 'w', encoding='utf-8') as f:
-                    f.write(transcript_text.strip())
-                result['transcript_file'] = transcript_file
-                print("✅ Transcript saved as: yt_transcript.txt")
-            else:
-                print("⚠️ No transcript available for this video")
-
-            # ✅ Save metadata
-            metadata = {
-                'title': result['title'],
-                'description': result['description'],
-                'tags': result['tags'],
-                'url': url,
-                'has_transcript': bool(transcript_text)
-            }
-
-            with open(json_file, 'w', encoding='utf-8') as f:
-                json.dump(metadata, f, indent=4, ensure_ascii=False)
-
-            # ✅ Save to process_track.json
+            transcript_text = _subtitle_text(ydl, info_dict)
+
+        # ✅ Save transcript to file
+        if transcript_text:
+            with open(transcript_file, 'w', encoding='utf-8') as f:
+                f.write(transcript_text.strip())
+            result['transcript_file'] = transcript_file
+            print("✅ Transcript saved as: yt_transcript.txt")
+        else:
+            print("⚠️ No transcript available for this video")
+
+        # ✅ Save metadata
+        metadata = {
+            'title': result['title'],
+            'description': result['description'],
+            'tags': result['tags'],
+            'url': url,
+            'has_transcript': bool(transcript_text)
+        }
+
+        with open(json_file, 'w', encoding='utf-8') as f:
+            json.dump(metadata, f, indent=4, ensure_ascii=False)
+
+        print("✅ Metadata saved as: yt_metadata.json")
+
+        # ✅ Save to process_track.json
+        if record:
             processed.append(metadata)
             with open(track_file, 'w', encoding='utf-8') as f:
                 json.dump(processed, f, indent=4, ensure_ascii=False)
-
-            print("\n✅ Video downloaded as: yt_video.mp4")
-            print("✅ Metadata saved as: yt_metadata.json")
             print("✅ Added to process_track.json")
 
+    except Exception as e:
+        print("❌ Error while fetching metadata:", e)
+        result['error'] = str(e)
+
+    return result
+
+
+@metrics.instrument("download_video", none_is_error=True)
+def download_video(info_dict, save_path='.'):
+    """
+    Second half of get_yt: download the video for an info dict from fetch_info()
+    without extracting it again. Returns the path of yt_video.mp4, or None.
+    """
+    video_file = os.path.join(save_path, "yt_video.mp4")
+    if os.path.exists(video_file):
+        os.remove(video_file)
+        print(f"🧹 Old {os.path.basename(video_file)} deleted")
+
+    try:
+        opts = dict(_ydl_opts(save_path), writesubtitles=False, writeautomaticsub=False)
+        with YoutubeDL(opts) as ydl:
+            ydl.process_ie_result(info_dict, download=True)
     except Exception as e:
         print("❌ Error while downloading:", e)
+        return None
+
+    if not os.path.exists(video_file):
+        return None
+    metrics.inc("downloaded_bytes_total", os.path.getsize(video_file))
+    print("\n✅ Video downloaded as: yt_video.mp4")
+    return video_file
+
 
-    return result
\ No newline at end of file
+@metrics.instrument("get_yt")
+def get_yt(url, save_path='.'):
+    """
+    Download YouTube video, transcript, and save metadata to JSON.
+    Tracks processed videos in 'process_track.json' and skips duplicates.
+    Always overwrites yt_video.mp4, yt_metadata.json, and yt_transcript.txt.
+    """
+    result = fetch_info(url, save_path)
+    info_dict = result.pop('info')
+    if info_dict is not None:
+        result['video_file'] = download_video(info_dict, save_path)
+        if result['video_file'] is None:
+            result['error'] = "video download failed"
+    return result
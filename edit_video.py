@@ -1,7 +1,41 @@
 from moviepy.editor import VideoFileClip, AudioFileClip, CompositeAudioClip, vfx
+from moviepy.config import get_setting
+from moviepy.version import __version__ as moviepy_version
 from pydub import AudioSegment
+from concurrent.futures import ProcessPoolExecutor
+import subprocess
+import shutil
+import time
 import os
 
+import audio_mix
+import encoding
+import metrics
+import render_cache
+from audio_mix import MIX_SETTINGS
+from streaming import STREAMING_SETTINGS, render_streaming
+
+# Segments shorter than this are not worth a separate x264 process
+MIN_SEGMENT_SECONDS = 2.0
+
+# Bump whenever the render logic changes output for the same inputs
+RENDER_BACKEND_VERSION = "1"
+_ffmpeg_version = None
+
+
+def render_backend():
+    """Version strings of everything that shapes the rendered bytes (part of the cache key)."""
+    global _ffmpeg_version
+    if _ffmpeg_version is None:
+        try:
+            out = subprocess.run([get_setting("FFMPEG_BINARY"), "-version"],
+                                 capture_output=True, text=True).stdout
+            _ffmpeg_version = out.splitlines()[0] if out else "unknown"
+        except Exception:
+            _ffmpeg_version = "unknown"
+    return {"render": RENDER_BACKEND_VERSION, "moviepy": moviepy_version, "ffmpeg": _ffmpeg_version}
+
+
 # ----------------------------------
 # ⚙️ Utility: Change audio speed
 # ----------------------------------
@@ -20,10 +54,125 @@ def change_audio_speed(input_audio_path, speed_factor, output_path):
         raise RuntimeError(f"change_audio_speed error: {e}")
 
 
+# ----------------------------------
+# 🧵 Parallel segmented encoding
+# ----------------------------------
+def choose_segment_count(duration, segments=0):
+    """
+    Resolve the number of segments for a parallel render.
+    segments=0 → one per CPU core, but never shorter than MIN_SEGMENT_SECONDS.
+    """
+    if segments and segments > 0:
+        return int(segments)
+    cores = os.cpu_count() or 1
+    return max(1, min(cores, int(duration // MIN_SEGMENT_SECONDS)))
+
+
+def segment_bounds(duration, fps, segments):
+    """
+    Split [0, duration) into `segments` ranges whose edges sit on frame boundaries,
+    so every segment starts on its own keyframe and no frame is dropped or doubled.
+    """
+    total_frames = max(1, int(round(duration * fps)))
+    segments = max(1, min(segments, total_frames))
+    edges = [round(i * total_frames / segments) for i in range(segments + 1)]
+    return [(edges[i] / fps, edges[i + 1] / fps) for i in range(segments) if edges[i + 1] > edges[i]]
+
+
+def write_video_passes(clip, output_path, plan, audio_kwargs=None, **kwargs):
+    """
+    write_videofile once per x264 pass of the encode plan. The analysis pass of a
+    two-pass encode is video-only and its output is thrown away.
+    """
+    base = os.path.splitext(output_path)[0]
+    passlog = f"{base}_x264"
+    passes = encoding.encode_passes(plan, passlog)
+    try:
+        for number, rate_args in enumerate(passes, 1):
+            if number < len(passes):
+                scratch = f"{base}_pass{number}.mp4"
+                clip.write_videofile(scratch, codec="libx264", audio=False,
+                                     ffmpeg_params=rate_args, **kwargs)
+                os.remove(scratch)
+            else:
+                clip.write_videofile(output_path, codec="libx264", ffmpeg_params=rate_args,
+                                     **(audio_kwargs or {"audio": False}), **kwargs)
+    finally:
+        encoding.remove_passlog(passlog)
+    return output_path
+
+
+def _render_segment(job):
+    """Worker: re-open the source, apply the same retime and encode one video-only segment."""
+    video_path, speed_factor, start, end, segment_path, threads, plan = job
+    clip = VideoFileClip(video_path, audio=False)
+    try:
+        part = clip.fx(vfx.speedx, factor=speed_factor).subclip(start, end)
+        write_video_passes(part, segment_path, plan, threads=threads, logger=None)
+    finally:
+        clip.close()
+    return segment_path
+
+
+def render_segmented(video_path, speed_factor, duration, fps, final_audio, output_path,
+                     segments=0, workers=None, plan=None):
+    """
+    Render the retimed video as independent segments in a process pool, join them
+    losslessly with the concat demuxer and mux the mixed audio in the same pass.
+    final_audio is either an audio clip or the path of a pre-mixed track.
+    plan: encoding.plan_encode() result applied to every segment (default: x264 defaults).
+    """
+    plan = plan or encoding.plan_encode(duration, 0, 0, fps, encoding.resolve({"mode": "default"}))
+    segments = choose_segment_count(duration, segments)
+    bounds = segment_bounds(duration, fps, segments)
+    workers = workers or min(len(bounds), os.cpu_count() or 1)
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    print(f"🧵 Parallel render: {len(bounds)} segments on {workers} workers ({threads} x264 threads each)")
+
+    work_dir = f"{os.path.splitext(output_path)[0]}_segments"
+    os.makedirs(work_dir, exist_ok=True)
+    try:
+        jobs = [
+            (video_path, speed_factor, start, end, os.path.join(work_dir, f"seg_{i:03d}.mp4"), threads, plan)
+            for i, (start, end) in enumerate(bounds)
+        ]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            segment_paths = list(pool.map(_render_segment, jobs))
+
+        if isinstance(final_audio, str):
+            audio_path, audio_args = final_audio, ["-c:a", "aac", "-b:a", encoding.audio_bitrate(plan)]
+        else:
+            audio_path, audio_args = os.path.join(work_dir, "audio.m4a"), ["-c:a", "copy"]
+            final_audio.write_audiofile(audio_path, fps=44100, codec="aac",
+                                        bitrate=encoding.audio_bitrate(plan), logger=None)
+
+        list_path = os.path.join(work_dir, "segments.txt")
+        with open(list_path, "w", encoding="utf-8") as f:
+            for path in segment_paths:
+                f.write(f"file '{os.path.abspath(path)}'\n")
+
+        cmd = [
+            get_setting("FFMPEG_BINARY"), "-y", "-loglevel", "error",
+            "-f", "concat", "-safe", "0", "-i", list_path,
+            "-i", audio_path,
+            "-map", "0:v:0", "-map", "1:a:0",
+            "-c:v", "copy", *audio_args, "-t", f"{duration:.3f}",
+            "-movflags", "+faststart",
+            output_path,
+        ]
+        subprocess.run(cmd, check=True)
+        return output_path
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
 # ----------------------------------
 # 🎬 Main Function: Video Editor
 # ----------------------------------
-def video_edit(choose_bg=None, voice_volume=1.8, bg_volume=0.08):
+@metrics.instrument("video_edit")
+def video_edit(choose_bg=None, voice_volume=1.8, bg_volume=0.08, parallel_segments=None, workers=None,
+               use_cache=True, streaming=None, memory_limit_mb=None, premix=None, ducking=None,
+               encode=None, work_dir="."):
     """
     Combine video, voice, and optional background music.
 
@@ -32,12 +181,37 @@ def video_edit(choose_bg=None, voice_volume=1.8, bg_volume=0.08):
                    If None or missing, default = 'blade runner 2055.m4a'
         voice_volume: Volume multiplier for voice (1.0 = normal)
         bg_volume: Volume multiplier for background (1.0 = same as source)
+        parallel_segments: None = single moviepy pipe (default).
+                           0 = split into one segment per core, N = N segments.
+        workers: Process pool size for the segmented render (default: per core)
+        use_cache: Reuse a previous render of identical inputs and settings
+        streaming: Render through one bounded-memory ffmpeg graph instead of moviepy
+                   (default: STREAMING_RENDER env var)
+        memory_limit_mb: Memory ceiling for the streaming render
+        premix: Mix voice + background into one PCM track with numpy before rendering,
+                instead of a moviepy CompositeAudioClip (default: AUDIO_PREMIX env var, on)
+        ducking: Lower the background while the voice is speaking (premix only,
+                 default: AUDIO_DUCKING env var)
+        encode: Overrides for encoding.ENCODE_SETTINGS, e.g. {"mode": "size",
+                "target_size_mb": 15, "two_pass": True} to trade render CPU for upload bytes
+        work_dir: Directory holding the job's inputs and intermediates (a scratch.py
+                  job dir in automation); the output is written there too
     """
+    if streaming is None:
+        streaming = STREAMING_SETTINGS["enabled"]
+    if premix is None:
+        premix = MIX_SETTINGS["enabled"]
+    if ducking is None:
+        ducking = MIX_SETTINGS["ducking"]
+    encode_settings = encoding.resolve(encode)
+
     try:
-        video_path = "yt_video.mp4"
-        voice_path = "hindi_dub_tone.mp3"
+        video_path = os.path.join(work_dir, "yt_video.mp4")
+        voice_path = os.path.join(work_dir, "hindi_dub_tone.mp3")
         default_bg = "blade runner.mp3"
-        output_path = "output_video.mp4"
+        output_path = os.path.join(work_dir, "output_video.mp4")
+        temp_paths = [os.path.join(work_dir, name)
+                      for name in ("temp_voice.mp3", "mixed_audio.wav", "video_only.mp4")]
 
         # ✅ Automatically use default background if not provided
         if not choose_bg or not os.path.exists(choose_bg):
@@ -52,6 +226,33 @@ def video_edit(choose_bg=None, voice_volume=1.8, bg_volume=0.08):
         if not os.path.exists(choose_bg):
             return f"❌ Error: background file not found: {choose_bg}"
 
+        # ♻️ Identical inputs + settings → reuse the previous render
+        cache_key = None
+        if use_cache:
+            cache_params = {
+                "voice_volume": voice_volume,
+                "bg_volume": bg_volume,
+                "parallel_segments": parallel_segments,
+                "streaming": bool(streaming),
+                "premix": bool(premix) and not streaming,
+                "ducking": bool(premix and ducking) and not streaming,
+                "encode": {k: v for k, v in encode_settings.items() if k != "uplink_mbps"},
+            }
+            cache_key = render_cache.render_key(
+                {"video": video_path, "voice": voice_path, "bg": choose_bg},
+                cache_params, render_backend())
+            if render_cache.lookup(cache_key, output_path):
+                return f"✅ Output saved as '{output_path}' (cached)"
+
+        # 🌊 Bounded-memory path: no moviepy clips or pydub segments in this process
+        if streaming:
+            render_streaming(video_path, voice_path, choose_bg, output_path,
+                             voice_volume=voice_volume, bg_volume=bg_volume,
+                             memory_limit_mb=memory_limit_mb, encode=encode_settings)
+            if cache_key:
+                render_cache.store(cache_key, output_path, cache_params)
+            return f"✅ Output saved as '{output_path}'"
+
         # 🎞️ Load clips
         video = VideoFileClip(video_path)
         voice = AudioFileClip(voice_path)
@@ -71,50 +272,88 @@ def video_edit(choose_bg=None, voice_volume=1.8, bg_volume=0.08):
         # 🌀 Adjust video speed
         adjusted_video = video.fx(vfx.speedx, factor=video_speed_factor)
 
-        # 🎧 Adjust voice speed
-        temp_voice_path = "temp_voice.mp3"
-        change_audio_speed(voice_path, voice_speed_factor, temp_voice_path)
-        adjusted_voice = AudioFileClip(temp_voice_path).volumex(voice_volume)
-        print(f"🎚️ Voice volume set to {voice_volume}x")
+        temp_voice_path, mix_path, video_only_path = temp_paths
+        clips = [video, voice, adjusted_video]
 
-        # 🎵 Background music
-        bg_clip = AudioFileClip(choose_bg)
-        if bg_clip.duration > target_duration:
-            bg_clip = bg_clip.subclip(0, target_duration)
+        if premix:
+            # 🎛️ Voice + background → one PCM track, decoded and mixed once in numpy
+            audio_mix.premix(voice_path, choose_bg, mix_path, target_duration,
+                             voice_speed_factor=voice_speed_factor, voice_volume=voice_volume,
+                             bg_volume=bg_volume, ducking=ducking)
+            final_audio = mix_path
+            final_video = adjusted_video.subclip(0, target_duration)
         else:
-            bg_clip = bg_clip.fx(vfx.loop, duration=target_duration)
-        bg_clip = bg_clip.volumex(bg_volume)
-        print(f"🎶 Background: {os.path.basename(choose_bg)} | Volume: {bg_volume}x")
+            # 🎧 Adjust voice speed
+            change_audio_speed(voice_path, voice_speed_factor, temp_voice_path)
+            adjusted_voice = AudioFileClip(temp_voice_path).volumex(voice_volume)
+            print(f"🎚️ Voice volume set to {voice_volume}x")
+
+            # 🎵 Background music
+            bg_clip = AudioFileClip(choose_bg)
+            if bg_clip.duration > target_duration:
+                bg_clip = bg_clip.subclip(0, target_duration)
+            else:
+                bg_clip = bg_clip.fx(vfx.loop, duration=target_duration)
+            bg_clip = bg_clip.volumex(bg_volume)
+            print(f"🎶 Background: {os.path.basename(choose_bg)} | Volume: {bg_volume}x")
 
-        # 🎛️ Mix voice + background
-        final_audio = CompositeAudioClip([adjusted_voice, bg_clip])
+            # 🎛️ Mix voice + background
+            final_audio = CompositeAudioClip([adjusted_voice, bg_clip])
 
-        # 🧩 Combine with video
-        final_video = adjusted_video.set_audio(final_audio).subclip(0, target_duration)
+            # 🧩 Combine with video
+            final_video = adjusted_video.set_audio(final_audio).subclip(0, target_duration)
+            clips += [adjusted_voice, bg_clip, final_audio]
+        clips.append(final_video)
 
         # 💾 Export final
-        print("📦 Rendering final video...")
-        final_video.write_videofile(output_path, codec="libx264", audio_codec="aac")
+        plan = encoding.plan_encode(target_duration, *video.size, video.fps, encode_settings)
+        print(encoding.describe(plan))
+        render_started = time.perf_counter()
+        if parallel_segments is not None:
+            print("📦 Rendering final video in parallel segments...")
+            if not premix:
+                final_audio = final_audio.set_duration(target_duration)
+            render_segmented(video_path, video_speed_factor, target_duration, video.fps,
+                             final_audio, output_path,
+                             segments=parallel_segments, workers=workers, plan=plan)
+        elif premix:
+            print("📦 Rendering final video (pre-mixed audio is muxed afterwards)...")
+            write_video_passes(final_video, video_only_path, plan)
+            audio_mix.mux(video_only_path, mix_path, output_path, duration=target_duration,
+                          audio_bitrate=encoding.audio_bitrate(plan))
+        else:
+            print("📦 Rendering final video...")
+            # moviepy would otherwise put its temp audio track in the cwd
+            audio_kwargs = {"audio_codec": "aac", "audio_bitrate": encoding.audio_bitrate(plan),
+                            "temp_audiofile": os.path.join(work_dir, "temp_audio.m4a")}
+            write_video_passes(final_video, output_path, plan, audio_kwargs=audio_kwargs)
+        metrics.set_gauge("render_fps", target_duration * video.fps / (time.perf_counter() - render_started))
         print(f"✅ Video editing completed: {output_path}")
+        encoding.report(plan, output_path)
 
         # 🧹 Cleanup
-        for clip in [video, voice, adjusted_voice, adjusted_video, bg_clip, final_audio, final_video]:
+        for clip in clips:
             try:
                 clip.close()
             except:
                 pass
 
-        if os.path.exists(temp_voice_path):
-            os.remove(temp_voice_path)
+        for path in temp_paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+        if cache_key:
+            render_cache.store(cache_key, output_path, cache_params)
 
         return f"✅ Output saved as '{output_path}'"
 
     except Exception as e:
-        if os.path.exists("temp_voice.mp3"):
-            try:
-                os.remove("temp_voice.mp3")
-            except:
-                pass
+        for path in temp_paths:
+            if os.path.exists(path):
+                try:
+                    os.remove(path)
+                except:
+                    pass
         return f"❌ Error during video editing: {e}"
 
 
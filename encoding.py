@@ -0,0 +1,124 @@
+import os
+
+import metrics
+
+# ---------------------------
+# ⚙️ Encode Settings
+# ---------------------------
+# mode "default" keeps libx264's CRF defaults; "bitrate" and "size" cap the output so
+# upload time on a slow uplink stays predictable.
+ENCODE_SETTINGS = {
+    "mode": os.environ.get("ENCODE_MODE", "default"),
+    "video_kbps": None,             # bitrate mode; None → derived from resolution and fps
+    "bits_per_pixel": 0.06,         # bitrate-mode default for a 1080x1920 short ≈ 3.7 Mbps at 30 fps
+    "target_size_mb": float(os.environ.get("ENCODE_TARGET_MB", "25")),   # size mode
+    "min_video_kbps": 600,          # never starve x264 below this to hit a size
+    "audio_kbps": 128,              # AAC cap in every mode
+    "two_pass": os.environ.get("ENCODE_TWO_PASS", "") == "1",   # bitrate/size modes only
+    "preset": "medium",
+    "container_overhead": 0.02,     # mp4 boxes + bitrate overshoot
+    "uplink_mbps": float(os.environ.get("UPLINK_MBPS", "10")),
+}
+
+ENCODE_MODES = ("default", "bitrate", "size")
+
+
+def resolve(overrides=None):
+    """ENCODE_SETTINGS with per-call overrides applied (validated)."""
+    settings = dict(ENCODE_SETTINGS, **(overrides or {}))
+    if settings["mode"] not in ENCODE_MODES:
+        raise ValueError(f"encode mode must be one of {ENCODE_MODES}, not {settings['mode']!r}")
+    return settings
+
+
+# ---------------------------
+# 🧮 Rate planning
+# ---------------------------
+
+def plan_encode(duration, width, height, fps, settings=None):
+    """
+    Decide the x264 rate control for one render. predicted_bytes is None in default
+    mode, where the size is only known after encoding.
+    """
+    settings = settings or resolve()
+    mode = settings["mode"]
+    audio_kbps = settings["audio_kbps"]
+    video_kbps = None
+
+    if mode == "bitrate":
+        video_kbps = settings["video_kbps"] or width * height * fps * settings["bits_per_pixel"] / 1000
+    elif mode == "size":
+        total_kbits = settings["target_size_mb"] * 1024 * 1024 * 8 / 1000
+        total_kbits /= 1 + settings["container_overhead"]
+        video_kbps = max(settings["min_video_kbps"], total_kbits / duration - audio_kbps)
+
+    predicted_bytes = None
+    if video_kbps:
+        video_kbps = int(video_kbps)
+        predicted_bytes = int((video_kbps + audio_kbps) * 1000 / 8 * duration
+                              * (1 + settings["container_overhead"]))
+    return {
+        "mode": mode,
+        "video_kbps": video_kbps,
+        "audio_kbps": audio_kbps,
+        "two_pass": bool(settings["two_pass"] and video_kbps),
+        "preset": settings["preset"],
+        "predicted_bytes": predicted_bytes,
+        "uplink_mbps": settings["uplink_mbps"],
+    }
+
+
+def upload_seconds(nbytes, uplink_mbps):
+    return nbytes * 8 / (uplink_mbps * 1_000_000)
+
+
+def describe(plan):
+    if not plan["video_kbps"]:
+        return f"🎚️ Encode: x264 defaults ({plan['preset']}), audio ≤ {plan['audio_kbps']}k"
+    size_mb = plan["predicted_bytes"] / (1024 * 1024)
+    return (f"🎚️ Encode: {plan['mode']} mode, video {plan['video_kbps']}k + audio {plan['audio_kbps']}k"
+            f"{', two-pass' if plan['two_pass'] else ''} → ~{size_mb:.1f} MB, "
+            f"~{upload_seconds(plan['predicted_bytes'], plan['uplink_mbps']):.1f}s upload "
+            f"at {plan['uplink_mbps']:g} Mbps")
+
+
+# ---------------------------
+# 🎛️ ffmpeg arguments
+# ---------------------------
+
+def x264_args(plan, pass_number=None, passlog=None):
+    """Rate-control args for libx264; pass_number 1/2 for a two-pass encode."""
+    args = ["-preset", plan["preset"]]
+    if plan["video_kbps"]:
+        kbps = plan["video_kbps"]
+        args += ["-b:v", f"{kbps}k", "-maxrate", f"{int(kbps * 1.5)}k", "-bufsize", f"{kbps * 2}k"]
+    if pass_number:
+        args += ["-pass", str(pass_number), "-passlogfile", passlog]
+    return args
+
+
+def encode_passes(plan, passlog):
+    """One arg list per x264 pass: [final] or [analysis, final]."""
+    if not plan["two_pass"]:
+        return [x264_args(plan)]
+    return [x264_args(plan, 1, passlog), x264_args(plan, 2, passlog)]
+
+
+def audio_bitrate(plan):
+    return f"{plan['audio_kbps']}k"
+
+
+def remove_passlog(passlog):
+    for suffix in ("-0.log", "-0.log.mbtree", "-0.log.temp", "-0.log.mbtree.temp"):
+        if os.path.exists(passlog + suffix):
+            os.remove(passlog + suffix)
+
+
+def report(plan, output_path):
+    """Print and record the actual size and predicted upload time of a finished render."""
+    nbytes = os.path.getsize(output_path)
+    seconds = upload_seconds(nbytes, plan["uplink_mbps"])
+    metrics.set_gauge("predicted_upload_seconds", seconds)
+    print(f"📤 {os.path.basename(output_path)}: {nbytes / (1024 * 1024):.1f} MB "
+          f"→ ~{seconds:.1f}s upload at {plan['uplink_mbps']:g} Mbps")
+    return {"bytes": nbytes, "upload_seconds": seconds}
@@ -0,0 +1,236 @@
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# ---------------------------
+# ⚙️ Fake Server Settings
+# ---------------------------
+FAKE_SETTINGS = {
+    "bandwidth_mbps": None,   # shared uplink shaping, None = unlimited
+    "latency_ms": 0,          # added to every request
+    "fail_rate": 0.0,         # probability a chunk PUT answers 503
+    "stall_rate": 0.0,        # probability a chunk PUT answers 308 without taking the bytes
+    "seed": None,
+}
+
+_READ_BLOCK = 64 * 1024
+
+
+class _Link:
+    """Shared uplink: every byte read by any session reserves wire time on one timeline."""
+
+    def __init__(self, mbps):
+        self.bytes_per_s = mbps * 1_000_000 / 8 if mbps else None
+        self.lock = threading.Lock()
+        self.free_at = 0.0
+
+    def transfer(self, nbytes):
+        if not self.bytes_per_s:
+            return
+        with self.lock:
+            start = max(time.monotonic(), self.free_at)
+            self.free_at = start + nbytes / self.bytes_per_s
+            wait = self.free_at - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+
+
+class FakeYouTubeState:
+    def __init__(self, settings):
+        self.settings = dict(FAKE_SETTINGS, **settings)
+        self.random = random.Random(self.settings["seed"])
+        self.link = _Link(self.settings["bandwidth_mbps"])
+        self.lock = threading.Lock()
+        self.sessions = {}
+        self.videos = {}
+        self.tokens = set()
+        self.stats = {"token_refreshes": 0, "sessions": 0, "chunks": 0,
+                      "bytes": 0, "injected_5xx": 0, "injected_stalls": 0, "thumbnails": 0}
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.stats[name] += n
+
+    def expire_session(self, upload_id):
+        with self.lock:
+            self.sessions.pop(upload_id, None)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state = None  # set per server in start_fake_server
+
+    def log_message(self, fmt, *args):
+        pass
+
+    # ---- helpers -----------------------------------------------------
+    def _send(self, code, body=None, headers=None):
+        payload = json.dumps(body).encode("utf-8") if body is not None else b""
+        self.send_response(code)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        if payload:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _read_body(self, shaped=False):
+        remaining = int(self.headers.get("Content-Length") or 0)
+        chunks = []
+        while remaining > 0:
+            block = self.rfile.read(min(_READ_BLOCK, remaining))
+            if not block:
+                break
+            if shaped:
+                self.state.link.transfer(len(block))
+            chunks.append(block)
+            remaining -= len(block)
+        return b"".join(chunks)
+
+    def _authorized(self):
+        auth = self.headers.get("Authorization", "")
+        return auth.startswith("Bearer ") and auth[7:] in self.state.tokens
+
+    def _latency(self):
+        if self.state.settings["latency_ms"]:
+            time.sleep(self.state.settings["latency_ms"] / 1000)
+
+    # ---- routes ------------------------------------------------------
+    def do_GET(self):
+        self._latency()
+        if urlparse(self.path).path == "/stats":
+            with self.state.lock:
+                return self._send(200, dict(self.state.stats, videos=len(self.state.videos)))
+        self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        self._latency()
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+
+        if url.path.endswith("/token"):
+            self._read_body()
+            token = f"fake-{uuid.uuid4().hex}"
+            with self.state.lock:
+                self.state.tokens.add(token)
+            self.state.count("token_refreshes")
+            return self._send(200, {"access_token": token, "expires_in": 3600, "token_type": "Bearer"})
+
+        if not self._authorized():
+            self._read_body()
+            return self._send(401, {"error": {"code": 401, "message": "invalid token"}})
+
+        if url.path.endswith("/videos") and query.get("uploadType") == ["resumable"]:
+            metadata = json.loads(self._read_body() or b"{}")
+            upload_id = uuid.uuid4().hex
+            total = self.headers.get("X-Upload-Content-Length")
+            with self.state.lock:
+                self.state.sessions[upload_id] = {
+                    "metadata": metadata, "received": 0,
+                    "total": int(total) if total else None,
+                }
+            self.state.count("sessions")
+            host = self.headers.get("Host")
+            location = f"http://{host}{url.path}?uploadType=resumable&upload_id={upload_id}"
+            return self._send(200, headers={"Location": location})
+
+        if url.path.endswith("/thumbnails/set"):
+            self._read_body(shaped=True)
+            self.state.count("thumbnails")
+            video_id = (query.get("videoId") or [""])[0]
+            return self._send(200, {"kind": "youtube#thumbnailSetResponse",
+                                    "items": [{"default": {"url": f"fake://{video_id}.jpg"}}]})
+
+        self._read_body()
+        self._send(404, {"error": "not found"})
+
+    def do_PUT(self):
+        self._latency()
+        query = parse_qs(urlparse(self.path).query)
+        upload_id = (query.get("upload_id") or [""])[0]
+        with self.state.lock:
+            session = self.state.sessions.get(upload_id)
+        if session is None:
+            self._read_body()
+            return self._send(404, {"error": {"code": 404, "message": "upload session not found"}})
+
+        content_range = self.headers.get("Content-Range", "")
+        status_query = re.match(r"bytes \*/(\d+|\*)", content_range)
+        chunk = re.match(r"bytes (\d+)-(\d+)/(\d+|\*)", content_range)
+
+        if status_query:
+            self._read_body()
+            return self._progress(session)
+
+        roll = self.state.random.random()
+        body = self._read_body(shaped=True)
+        if roll < self.state.settings["fail_rate"]:
+            self.state.count("injected_5xx")
+            return self._send(503, {"error": {"code": 503, "message": "backendError"}})
+        if roll < self.state.settings["fail_rate"] + self.state.settings["stall_rate"]:
+            self.state.count("injected_stalls")
+            return self._progress(session)
+
+        if chunk:
+            start, end, total = int(chunk.group(1)), int(chunk.group(2)), chunk.group(3)
+            with self.state.lock:
+                # Overlapping re-sends are fine; a gap is not
+                if start <= session["received"]:
+                    session["received"] = max(session["received"], end + 1)
+                if total != "*":
+                    session["total"] = int(total)
+            self.state.count("chunks")
+            self.state.count("bytes", len(body))
+        return self._progress(session)
+
+    def _progress(self, session):
+        if session["total"] is not None and session["received"] >= session["total"]:
+            video_id = uuid.uuid4().hex[:11]
+            with self.state.lock:
+                self.state.videos[video_id] = session["metadata"]
+            return self._send(200, dict(session["metadata"], kind="youtube#video", id=video_id))
+        headers = {"Range": f"bytes=0-{session['received'] - 1}"} if session["received"] else {}
+        return self._send(308, headers=headers)
+
+
+def start_fake_server(host="127.0.0.1", port=0, **settings):
+    """
+    Start the fake API on a background thread.
+    Returns (server, state, base_url); point yt_client.API_ENDPOINT at base_url.
+    """
+    state = FakeYouTubeState(settings)
+    handler = type("FakeYouTubeHandler", (_Handler,), {"state": state})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://{host}:{server.server_address[1]}"
+    print(f"🧪 Fake YouTube API listening on {base_url}")
+    return server, state, base_url
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the YouTube Data API upload flow")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--bandwidth-mbps", type=float, default=None)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--stall-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    server, _, url = start_fake_server(port=args.port, bandwidth_mbps=args.bandwidth_mbps,
+                                       latency_ms=args.latency_ms, fail_rate=args.fail_rate,
+                                       stall_rate=args.stall_rate, seed=args.seed)
+    print(f"Run uploads with YOUTUBE_API_ENDPOINT={url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,156 @@
+import multiprocessing
+import os
+import signal
+import time
+
+import pipeline_dag
+import render_buffer
+import scratch
+
+# ---------------------------
+# ⚙️ Watchdog Settings
+# ---------------------------
+WATCHDOG_SETTINGS = {
+    "poll_seconds": 1.0,
+    "job_timeout_seconds": int(os.environ.get("JOB_TIMEOUT_SECONDS", str(3 * 3600))),  # all candidates
+    "kill_grace_seconds": 10,     # SIGTERM → SIGKILL
+}
+
+
+# ---------------------------
+# 👶 Job process
+# ---------------------------
+
+def _job_main(sender, options, run_id):
+    """
+    Runs in the job process: its own process group, so one killpg takes ffmpeg,
+    yt-dlp and DAG worker processes down with it. Stage events and the URL being
+    worked on go to the watchdog.
+    Prerender jobs run CPU-capped (render_buffer.apply_cpu_cap); "deferred" jobs
+    upload the batch items that upload_on_yt deferred for quota.
+    """
+    os.setpgrp()
+    from automation import listen_candidates, run_automation
+
+    mode = options.get("mode", "full")
+    if mode == "deferred":
+        from upload_on_yt import run_deferred_uploads
+        sender.send(("result", run_deferred_uploads()))
+        return
+    if mode == "prerender":
+        render_buffer.apply_cpu_cap()
+    pipeline_dag.listen(lambda event, stage: sender.send((event, stage.name, stage.timeout)))
+    listen_candidates(lambda url: sender.send(("url", url)))
+    result = run_automation(profile=options.get("profile", False), run_id=run_id, mode=mode)
+    sender.send(("result", result))
+
+
+def kill_job_process(proc):
+    """SIGTERM the job's process group, SIGKILL whatever is left after the grace period."""
+    try:
+        os.killpg(proc.pid, signal.SIGTERM)
+    except ProcessLookupError:
+        proc.kill()   # killed before setpgrp ran
+    proc.join(WATCHDOG_SETTINGS["kill_grace_seconds"])
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    proc.join()
+
+
+def cleanup_partial_artifacts(run_id):
+    """
+    A killed or crashed run never releases its scratch dir (everything half-written
+    is in there) nor the render-buffer item it was publishing.
+    """
+    scratch.discard(run_id)
+    render_buffer.RenderBuffer().restore_claims(run_id)
+
+
+def release_upload(url):
+    """
+    Release the publish slot and upload session a killed job booked for url. A job
+    that crashed on its own keeps them, so its retry resumes the upload.
+    """
+    from yt_uploader import abandon_upload
+
+    try:
+        abandon_upload(url)
+    except Exception as e:
+        print(f"[WATCHDOG] could not release the upload slot for {url}: {e}")
+
+
+# ---------------------------
+# ⏱️ Watched run
+# ---------------------------
+
+def run_watched(job, jobs, lease=None):
+    """
+    Run one job in a killable subprocess and enforce deadlines while it runs:
+    each stage's timeout, the whole job's timeout, and cancel requests stored in
+    the job row. With a lease, the job is also killed as soon as this process stops
+    being leader, before another leader can re-run it. Returns (result text, outcome)
+    where outcome is None for a run that finished on its own, else "timed_out",
+    "cancelled" or "failed" (lease lost).
+    """
+    ctx = multiprocessing.get_context("spawn")
+    receiver, sender = ctx.Pipe(duplex=False)
+    run_id = f"job-{job['id']}"
+    proc = ctx.Process(target=_job_main, name=run_id,
+                       args=(sender, job["options"], run_id))
+    proc.start()
+    sender.close()
+
+    started = time.time()
+    running = {}        # stage → (deadline, timeout)
+    url = None          # candidate the job is working on
+    result = None
+    while result is None:
+        # A chatty job must not starve the deadline checks below, so no `continue` here
+        if receiver.poll(WATCHDOG_SETTINGS["poll_seconds"]):
+            try:
+                message = receiver.recv()
+            except EOFError:
+                break
+            if message[0] == "result":
+                result = message[1]
+                break
+            if message[0] == "url":
+                url = message[1]
+            else:
+                event, name, timeout = message
+                if event == "start":
+                    running[name] = (time.time() + timeout if timeout else None, timeout)
+                else:
+                    running.pop(name, None)
+
+        now = time.time()
+        overdue = [(name, timeout) for name, (deadline, timeout) in running.items()
+                   if deadline and now > deadline]
+        outcome = None
+        if overdue:
+            outcome, reason = "timed_out", f"stage {overdue[0][0]} exceeded {overdue[0][1]}s"
+        elif now - started > WATCHDOG_SETTINGS["job_timeout_seconds"]:
+            outcome, reason = "timed_out", f"job exceeded {WATCHDOG_SETTINGS['job_timeout_seconds']}s"
+        elif (jobs.get(job["id"]) or {}).get("status") == "cancelling":
+            outcome, reason = "cancelled", "cancelled by request"
+        elif lease is not None and not lease.is_leader:
+            outcome, reason = "failed", "leader lease lost"
+        if outcome:
+            print(f"[WATCHDOG] job {job['id']}: {reason} – killing pid {proc.pid}")
+            kill_job_process(proc)
+            cleanup_partial_artifacts(run_id)
+            if url:
+                release_upload(url)
+            if outcome == "failed":
+                return f"Automation FAILED: {reason}, job killed", outcome
+            label = "TIMED OUT" if outcome == "timed_out" else "CANCELLED"
+            return f"{label} – {reason}", outcome
+
+    proc.join()
+    receiver.close()
+    if result is None:
+        cleanup_partial_artifacts(run_id)
+        result = f"Automation FAILED: job process exited with code {proc.exitcode}"
+    return result, None
@@ -0,0 +1,39 @@
+import fcntl
+import json
+import os
+from contextlib import contextmanager
+
+
+@contextmanager
+def locked_json(path, default):
+    """
+    Read-modify-write a JSON file atomically across threads and processes.
+
+    Yields the loaded data (or `default` if the file is missing/corrupt); whatever the
+    caller leaves in the yielded object is written back via a temp file + os.replace
+    while an exclusive flock is held on `<path>.lock`.
+    """
+    with open(path + ".lock", "a+") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                data = default
+            yield data
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+            os.replace(tmp, path)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def read_json(path, default):
+    """Lock-free read of a file written by locked_json (os.replace keeps it consistent)."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return default
@@ -0,0 +1,198 @@
+import asyncio
+import functools
+import json
+import sqlite3
+import time
+from contextlib import closing, contextmanager
+
+from coordination import connect, transaction
+
+# ---------------------------
+# ⚙️ Metric definitions
+# ---------------------------
+STAGE_BUCKETS = (0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+METRICS = {
+    "pipeline_stage_duration_seconds": ("histogram", "Wall time of one pipeline stage"),
+    "pipeline_stage_errors_total": ("counter", "Pipeline stage calls that raised or returned an error"),
+    "downloaded_bytes_total": ("counter", "Bytes of source video downloaded"),
+    "uploaded_bytes_total": ("counter", "Bytes sent to YouTube"),
+    "render_fps": ("gauge", "Frames per second of the last render"),
+    "predicted_upload_seconds": ("gauge", "Upload time of the last render at the configured uplink"),
+    "scratch_bytes": ("gauge", "Bytes held in job scratch dirs by tier"),
+    "render_buffer_depth": ("gauge", "Upload-ready shorts in the render-ahead buffer"),
+    "render_buffer_oldest_age_seconds": ("gauge", "Age of the oldest upload-ready short"),
+    "render_cache_requests_total": ("counter", "Render cache lookups by result"),
+    "jobs_total": ("counter", "Finished pipeline jobs by status"),
+    "job_queue_depth": ("gauge", "Jobs waiting to run"),
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS metrics (
+    name TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    value REAL NOT NULL DEFAULT 0,
+    buckets TEXT,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (name, labels)
+);
+"""
+_schema_ready = False
+
+
+def _ensure_schema():
+    global _schema_ready
+    if not _schema_ready:
+        with closing(connect()) as conn:
+            conn.executescript(_SCHEMA)
+        _schema_ready = True
+
+
+def _labels(labels):
+    return json.dumps({k: str(v) for k, v in labels.items()}, sort_keys=True)
+
+
+# ---------------------------
+# Instrumentation API
+# ---------------------------
+# Samples go to the shared SQLite state DB, so /metrics on any web worker sees what
+# the leader's pipeline recorded. A failed write is reported and otherwise ignored.
+
+def _write(sql, params):
+    try:
+        _ensure_schema()
+        with transaction() as conn:
+            conn.execute(sql, params)
+    except sqlite3.Error as e:
+        print(f"⚠️ metrics write failed: {e}")
+
+
+def inc(name, value=1, **labels):
+    _write("INSERT INTO metrics (name, labels, value) VALUES (?, ?, ?) "
+           "ON CONFLICT(name, labels) DO UPDATE SET value = value + excluded.value",
+           (name, _labels(labels), value))
+
+
+def set_gauge(name, value, **labels):
+    _write("INSERT INTO metrics (name, labels, value) VALUES (?, ?, ?) "
+           "ON CONFLICT(name, labels) DO UPDATE SET value = excluded.value",
+           (name, _labels(labels), value))
+
+
+def observe(name, value, buckets=STAGE_BUCKETS, **labels):
+    key = _labels(labels)
+    try:
+        _ensure_schema()
+        with transaction() as conn:
+            row = conn.execute("SELECT value, buckets, count FROM metrics WHERE name = ? AND labels = ?",
+                               (name, key)).fetchone()
+            counts = json.loads(row["buckets"]) if row else [0] * len(buckets)
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    counts[i] += 1
+            conn.execute(
+                "INSERT OR REPLACE INTO metrics (name, labels, value, buckets, count) VALUES (?, ?, ?, ?, ?)",
+                (name, key, (row["value"] if row else 0) + value, json.dumps(counts),
+                 (row["count"] if row else 0) + 1))
+    except sqlite3.Error as e:
+        print(f"⚠️ metrics write failed: {e}")
+
+
+@contextmanager
+def timed(stage):
+    """Record the wall time of a block as pipeline_stage_duration_seconds{stage=...}."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe("pipeline_stage_duration_seconds", time.perf_counter() - start, stage=stage)
+
+
+def is_error_result(result, none_is_error=False):
+    """
+    The pipeline's non-raising failures: "❌ ..." strings, {'error': ...} dicts and,
+    for stages that report failure that way, None.
+    """
+    if result is None:
+        return none_is_error
+    if isinstance(result, str):
+        return result.startswith("❌")
+    return isinstance(result, dict) and "error" in result
+
+
+def instrument(stage, none_is_error=False):
+    """
+    Decorator form of timed(); works for plain and async functions. A call that
+    raises or returns an error result also counts in pipeline_stage_errors_total;
+    none_is_error=True is for stages that return None when they fail.
+    """
+    def decorate(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with timed(stage):
+                    try:
+                        result = await fn(*args, **kwargs)
+                    except Exception:
+                        inc("pipeline_stage_errors_total", stage=stage)
+                        raise
+                    if is_error_result(result, none_is_error):
+                        inc("pipeline_stage_errors_total", stage=stage)
+                    return result
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timed(stage):
+                try:
+                    result = fn(*args, **kwargs)
+                except Exception:
+                    inc("pipeline_stage_errors_total", stage=stage)
+                    raise
+                if is_error_result(result, none_is_error):
+                    inc("pipeline_stage_errors_total", stage=stage)
+                return result
+        return wrapper
+    return decorate
+
+
+# ---------------------------
+# Prometheus exposition
+# ---------------------------
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt_labels(labels, extra=None):
+    items = dict(labels, **(extra or {}))
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items.items()) + "}"
+
+
+def render_prometheus():
+    """All recorded metrics in Prometheus text exposition format (0.0.4)."""
+    _ensure_schema()
+    with closing(connect()) as conn:
+        rows = conn.execute("SELECT * FROM metrics ORDER BY name, labels").fetchall()
+
+    by_name = {}
+    for row in rows:
+        by_name.setdefault(row["name"], []).append(row)
+
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for row in by_name.get(name, []):
+            labels = json.loads(row["labels"])
+            if kind == "histogram":
+                for bound, count in zip(STAGE_BUCKETS, json.loads(row["buckets"])):
+                    lines.append(f"{name}_bucket{_fmt_labels(labels, {'le': bound})} {count}")
+                lines.append(f"{name}_bucket{_fmt_labels(labels, {'le': '+Inf'})} {row['count']}")
+                lines.append(f"{name}_sum{_fmt_labels(labels)} {row['value']}")
+                lines.append(f"{name}_count{_fmt_labels(labels)} {row['count']}")
+            else:
+                lines.append(f"{name}{_fmt_labels(labels)} {row['value']}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,187 @@
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import profiling
+
+# ---------------------------
+# ⚙️ DAG Settings
+# ---------------------------
+DAG_SETTINGS = {
+    "io_workers": 6,                            # threads for network / subprocess-bound stages
+    "cpu_workers": min(2, os.cpu_count() or 1),  # processes for GIL-bound stages
+}
+
+STAGE_KINDS = ("io", "cpu")
+
+_listener = None
+
+
+def listen(callback):
+    """
+    Report stage events to callback(event, stage) with event in start/done/failed;
+    None stops reporting. job_watchdog.py uses this to enforce stage deadlines.
+    """
+    global _listener
+    _listener = callback
+
+
+def _notify(event, stage):
+    if _listener is not None:
+        _listener(event, stage)
+
+
+class Stage:
+    """
+    One step of a pipeline: fn(**inputs) → outputs.
+
+    inputs/outputs are artifact names. A stage with one output returns the value,
+    with several it returns a tuple in the same order. kind="cpu" stages run in a
+    worker process, so fn must be a module-level function with picklable arguments.
+    timeout is the stage's deadline in seconds, enforced by the job watchdog.
+    """
+
+    def __init__(self, name, fn, inputs=(), outputs=(), kind="io", timeout=None):
+        if kind not in STAGE_KINDS:
+            raise ValueError(f"stage {name}: kind must be one of {STAGE_KINDS}")
+        self.name = name
+        self.fn = fn
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.kind = kind
+        self.timeout = timeout
+
+    def unpack(self, value):
+        if not self.outputs:
+            return {}
+        if len(self.outputs) == 1:
+            return {self.outputs[0]: value}
+        return dict(zip(self.outputs, value))
+
+
+def _call(fn, kwargs):
+    return fn(**kwargs)
+
+
+class Pipeline:
+    """
+    A declarative DAG of stages; artifacts flow from outputs to matching inputs.
+    timeouts maps stage names to deadlines for stages that do not set their own.
+    """
+
+    def __init__(self, stages, provided=(), timeouts=None):
+        self.stages = list(stages)
+        self.provided = tuple(provided)
+        for stage in self.stages:
+            if stage.timeout is None and timeouts:
+                stage.timeout = timeouts.get(stage.name)
+        self.producers = {}
+        for stage in self.stages:
+            for output in stage.outputs:
+                if output in self.producers or output in self.provided:
+                    raise ValueError(f"artifact '{output}' is produced twice")
+                self.producers[output] = stage.name
+        for stage in self.stages:
+            missing = [i for i in stage.inputs if i not in self.producers and i not in self.provided]
+            if missing:
+                raise ValueError(f"stage {stage.name}: no producer for {missing}")
+        self.levels()  # raises on cycles
+
+    def levels(self):
+        """Stages grouped by dependency depth: everything in one level can run together."""
+        available = set(self.provided)
+        remaining = list(self.stages)
+        levels = []
+        while remaining:
+            ready = [s for s in remaining if all(i in available for i in s.inputs)]
+            if not ready:
+                raise ValueError(f"cycle between stages {[s.name for s in remaining]}")
+            levels.append(ready)
+            for stage in ready:
+                available.update(stage.outputs)
+            remaining = [s for s in remaining if s not in ready]
+        return levels
+
+    def describe(self):
+        """Printable view of the DAG, one dependency level per block."""
+        lines = [f"provided: {', '.join(self.provided) or '-'}"]
+        for depth, level in enumerate(self.levels()):
+            lines.append(f"level {depth}:")
+            for stage in level:
+                inputs = ", ".join(stage.inputs) or "-"
+                outputs = ", ".join(stage.outputs) or "-"
+                deadline = f"  (≤ {stage.timeout}s)" if stage.timeout else ""
+                lines.append(f"  [{stage.kind:>3}] {stage.name:<18} {inputs} → {outputs}{deadline}")
+        return "\n".join(lines)
+
+    # ---------------------------
+    # ▶️ Execution
+    # ---------------------------
+
+    def run(self, serial=False, **provided):
+        """
+        Run every stage once its inputs exist: io stages on threads, cpu stages in
+        processes. The first failure stops new stages from starting; stages already
+        running are waited for, then the exception is re-raised.
+        serial=True runs in dependency order on this thread (used when profiling).
+        Returns the dict of all artifacts.
+        """
+        artifacts = dict(provided)
+        missing = [name for name in self.provided if name not in artifacts]
+        if missing:
+            raise ValueError(f"missing provided artifacts: {missing}")
+
+        started = time.perf_counter()
+        if serial:
+            for level in self.levels():
+                for stage in level:
+                    _notify("start", stage)
+                    try:
+                        with profiling.stage(stage.name):
+                            value = stage.fn(**{i: artifacts[i] for i in stage.inputs})
+                    except Exception:
+                        _notify("failed", stage)
+                        raise
+                    _notify("done", stage)
+                    artifacts.update(stage.unpack(value))
+            return artifacts
+
+        needs_processes = any(s.kind == "cpu" for s in self.stages)
+        threads = ThreadPoolExecutor(max_workers=DAG_SETTINGS["io_workers"], thread_name_prefix="dag")
+        processes = ProcessPoolExecutor(max_workers=DAG_SETTINGS["cpu_workers"]) if needs_processes else None
+        pending = list(self.stages)
+        running = {}
+        error = None
+        try:
+            while pending or running:
+                if error is None:
+                    for stage in [s for s in pending if all(i in artifacts for i in s.inputs)]:
+                        pending.remove(stage)
+                        pool = processes if stage.kind == "cpu" else threads
+                        kwargs = {i: artifacts[i] for i in stage.inputs}
+                        running[pool.submit(_call, stage.fn, kwargs)] = (stage, time.perf_counter())
+                        _notify("start", stage)
+                        print(f"▶️ [{stage.kind}] {stage.name}")
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, stage_started = running.pop(future)
+                    try:
+                        artifacts.update(stage.unpack(future.result()))
+                        _notify("done", stage)
+                        print(f"⏹️ {stage.name} done in {time.perf_counter() - stage_started:.2f}s")
+                    except Exception as e:
+                        _notify("failed", stage)
+                        print(f"❌ {stage.name} failed: {e}")
+                        if error is None:
+                            error = e
+        finally:
+            threads.shutdown(wait=True)
+            if processes is not None:
+                processes.shutdown(wait=True)
+
+        if error is not None:
+            raise error
+        print(f"🕸️ Pipeline finished in {time.perf_counter() - started:.2f}s")
+        return artifacts
@@ -0,0 +1,148 @@
+import time
+
+from yt_dlp import YoutubeDL
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+
+from json_store import locked_json, read_json
+from speed import TONE_SETTINGS
+
+# ---------------------------
+# ⚙️ Preflight Rules
+# ---------------------------
+PROBE_CACHE = "probe_cache.json"
+REJECTIONS_FILE = "preflight_rejections.json"
+PREFLIGHT_RULES = {
+    "min_duration": 5,                 # seconds
+    "max_duration": 90,
+    "require_vertical": True,          # height > width
+    "require_audio": True,
+    "require_english_captions": True,
+    "dub_chars_per_second": 14.0,      # edge_tts hi-IN speaking rate before TONE_SETTINGS speed-up
+    "min_voice_speed_factor": 0.6,     # video_edit squeezes/stretches the voice by this factor
+    "max_voice_speed_factor": 1.5,
+    "probe_cache_hours": 24 * 7,
+    "max_candidates_per_run": 5,       # rejected URLs tried before giving up for this run
+}
+
+
+class PreflightRejection(Exception):
+    """Raised when a candidate short fails a preflight rule; the message is the reason."""
+
+    def __init__(self, reason, stage=""):
+        super().__init__(reason)
+        self.stage = stage
+
+
+# ---------------------------
+# 🔎 Probes
+# ---------------------------
+
+def _has_english(tracks):
+    return any(lang == "en" or lang.startswith("en-") for lang in (tracks or {}))
+
+
+def probe_url(url):
+    """
+    Metadata-only yt-dlp probe (no download), cached in PROBE_CACHE.
+    Keeps just the fields the rules need; a fresh probe also carries the raw yt-dlp
+    info under "info" (never cached) so fetch_info() does not extract it again.
+    """
+    cached = read_json(PROBE_CACHE, {}).get(url)
+    if cached and time.time() - cached["probed_at"] < PREFLIGHT_RULES["probe_cache_hours"] * 3600:
+        return cached
+
+    with YoutubeDL({"quiet": True, "noplaylist": True, "skip_download": True}) as ydl:
+        info = ydl.extract_info(url, download=False)
+
+    probe = {
+        "probed_at": time.time(),
+        "id": info.get("id"),
+        "title": info.get("title"),
+        "duration": info.get("duration"),
+        "width": info.get("width"),
+        "height": info.get("height"),
+        "has_audio": info.get("acodec") not in (None, "none") or any(
+            f.get("acodec") not in (None, "none") for f in info.get("formats") or []),
+        "has_english_captions": _has_english(info.get("subtitles"))
+                                or _has_english(info.get("automatic_captions")),
+    }
+    with locked_json(PROBE_CACHE, {}) as cache:
+        cache[url] = probe
+    return dict(probe, info=info)
+
+
+def probe_file(path):
+    """Container-level probe of a downloaded file (ffmpeg header parse, no decoding)."""
+    info = ffmpeg_parse_infos(path)
+    width, height = info.get("video_size") or (None, None)
+    return {
+        "duration": info.get("duration"),
+        "width": width,
+        "height": height,
+        "has_audio": info.get("audio_found", False),
+    }
+
+
+# ---------------------------
+# ✅ Rules
+# ---------------------------
+
+def _check_shape(probe, stage):
+    rules = PREFLIGHT_RULES
+    duration = probe.get("duration")
+    if duration is not None:
+        if duration < rules["min_duration"]:
+            raise PreflightRejection(f"too short ({duration:.0f}s < {rules['min_duration']}s)", stage)
+        if duration > rules["max_duration"]:
+            raise PreflightRejection(f"too long ({duration:.0f}s > {rules['max_duration']}s)", stage)
+    width, height = probe.get("width"), probe.get("height")
+    if rules["require_vertical"] and width and height and width >= height:
+        raise PreflightRejection(f"not vertical ({width}x{height})", stage)
+    if rules["require_audio"] and probe.get("has_audio") is False:
+        raise PreflightRejection("no audio track", stage)
+
+
+def check_url(url):
+    """Rules that only need yt-dlp metadata — run before anything is downloaded."""
+    probe = probe_url(url)
+    _check_shape(probe, "probe")
+    if PREFLIGHT_RULES["require_english_captions"] and not probe["has_english_captions"]:
+        raise PreflightRejection("no English captions", "probe")
+    return probe
+
+
+def check_file(path):
+    """Re-check the actual download (formats can differ from the metadata)."""
+    probe = probe_file(path)
+    _check_shape(probe, "file")
+    return probe
+
+
+def estimate_dub_seconds(translated_text):
+    """Expected length of hindi_dub_tone.mp3 from the translated character count."""
+    raw = len(translated_text) / PREFLIGHT_RULES["dub_chars_per_second"]
+    return raw / TONE_SETTINGS["speed"]
+
+
+def check_dub_estimate(translated_text, video_duration):
+    """
+    Reject before TTS if video_edit would have to warp the voice too much.
+    video_edit targets (video + voice) / 2, so the voice factor is 2v / (video + v).
+    """
+    voice = estimate_dub_seconds(translated_text)
+    factor = 2 * voice / (video_duration + voice)
+    print(f"🧮 Estimated dub: {voice:.1f}s for {video_duration:.1f}s video → voice speed x{factor:.2f}")
+    if not PREFLIGHT_RULES["min_voice_speed_factor"] <= factor <= PREFLIGHT_RULES["max_voice_speed_factor"]:
+        raise PreflightRejection(f"voice speed factor x{factor:.2f} out of range "
+                                 f"({voice:.0f}s dub vs {video_duration:.0f}s video)", "dub_estimate")
+
+
+def record_rejection(url, reason, stage):
+    with locked_json(REJECTIONS_FILE, []) as rejections:
+        rejections.append({
+            "url": url,
+            "stage": stage,
+            "reason": reason,
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        })
+    print(f"🚫 Preflight rejected {url} at {stage}: {reason}")
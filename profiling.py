@@ -0,0 +1,160 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+# ---------------------------
+# ⚙️ Profiling Settings
+# ---------------------------
+PROFILE_DIR = "profiles"
+PROFILE_SETTINGS = {
+    "tracemalloc_frames": 5,     # stack depth kept per allocation
+    "top_allocations": 25,
+    "top_functions": 40,
+}
+
+_NULL = nullcontext()
+_active = None
+
+
+class ProfileSession:
+    """cProfile + tracemalloc capture for one pipeline run, one file pair per stage."""
+
+    def __init__(self, run_id):
+        self.run_id = str(run_id)
+        self.dir = os.path.join(PROFILE_DIR, self.run_id)
+        os.makedirs(self.dir, exist_ok=True)
+        self.stages = []
+        self._open = False
+        self._attached = []   # profilers of other threads that worked for the open stage
+
+    @contextmanager
+    def stage(self, name):
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(PROFILE_SETTINGS["tracemalloc_frames"])
+        before = tracemalloc.take_snapshot()
+        profiler = cProfile.Profile()
+        self._attached = []
+        self._open = True
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            self._open = False
+            elapsed = time.perf_counter() - start
+            after = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            if started_tracing:
+                tracemalloc.stop()
+
+            stats = pstats.Stats(profiler)
+            for other in self._attached:
+                stats.add(other)
+            stats.dump_stats(os.path.join(self.dir, f"{name}.prof"))
+            top = after.compare_to(before, "traceback")[:PROFILE_SETTINGS["top_allocations"]]
+            with open(os.path.join(self.dir, f"{name}.alloc.txt"), "w", encoding="utf-8") as f:
+                for diff in top:
+                    f.write(f"{diff.size_diff / 1024:+.1f} KiB in {diff.count_diff:+d} blocks\n")
+                    for line in diff.traceback.format():
+                        f.write(f"    {line}\n")
+            self.stages.append({"stage": name, "seconds": round(elapsed, 3),
+                                "traced_peak_mb": round(peak / (1024 * 1024), 1)})
+            self._write_index()
+            print(f"🔬 Profiled {name}: {elapsed:.2f}s → {self.dir}")
+
+    @contextmanager
+    def attach(self):
+        """Profile this thread's share of the open stage (another thread's cProfile can't see it)."""
+        if not self._open:
+            yield
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Python 3.12+: cProfile uses sys.monitoring, and the stage's profiler
+            # already covers every thread
+            yield
+            return
+        try:
+            yield
+        finally:
+            profiler.disable()
+            self._attached.append(profiler)
+
+    def _write_index(self):
+        with open(os.path.join(self.dir, "index.json"), "w", encoding="utf-8") as f:
+            json.dump({"run_id": self.run_id, "stages": self.stages}, f, indent=2)
+
+
+# ---------------------------
+# Run-level switch
+# ---------------------------
+
+def start(run_id):
+    global _active
+    _active = ProfileSession(run_id)
+    return _active
+
+
+def stop():
+    global _active
+    _active = None
+
+
+def is_active():
+    return _active is not None
+
+
+def stage(name):
+    """Profile a block if this run is being profiled; otherwise a shared no-op context."""
+    return _active.stage(name) if _active is not None else _NULL
+
+
+def attach():
+    """Add the calling thread's work to the stage being profiled (executor / event-loop threads)."""
+    return _active.attach() if _active is not None else _NULL
+
+
+# ---------------------------
+# Reading captured profiles
+# ---------------------------
+
+def profile_dir(run_id):
+    return os.path.join(PROFILE_DIR, str(run_id))
+
+
+def load_index(run_id):
+    try:
+        with open(os.path.join(profile_dir(run_id), "index.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def render_report(run_id):
+    """Plain-text report: per-stage top functions by cumulative time + top allocations."""
+    index = load_index(run_id)
+    if not index:
+        return None
+    out = io.StringIO()
+    for entry in index["stages"]:
+        name = entry["stage"]
+        out.write(f"{'=' * 78}\n{name}: {entry['seconds']}s, "
+                  f"traced peak {entry['traced_peak_mb']} MB\n{'=' * 78}\n")
+        stats = pstats.Stats(os.path.join(profile_dir(run_id), f"{name}.prof"), stream=out)
+        stats.sort_stats("cumulative").print_stats(PROFILE_SETTINGS["top_functions"])
+        alloc_path = os.path.join(profile_dir(run_id), f"{name}.alloc.txt")
+        if os.path.exists(alloc_path):
+            out.write("Top allocations:\n")
+            with open(alloc_path, "r", encoding="utf-8") as f:
+                out.write(f.read())
+        out.write("\n")
+    return out.getvalue()
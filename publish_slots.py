@@ -0,0 +1,138 @@
+import os
+from bisect import bisect_left, insort
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from json_store import locked_json, read_json
+
+# ---------------------------
+# ⚙️ Slot Settings
+# ---------------------------
+SLOTS_FILE = "publish_slots.json"
+SLOT_SETTINGS = {
+    "timezone": os.environ.get("PUBLISH_TIMEZONE", "UTC"),
+    "min_lead_minutes": 15,     # YouTube rejects publishAt times too close to now
+}
+SLOT_TEMPLATES = {
+    "daily": ["07:35"],
+    "twice_daily": ["09:45", "19:30"],
+}
+
+
+# ---------------------------
+# Slot index <-> time
+# ---------------------------
+# Slot n of a template with k times per day is time n % k on day date.fromordinal(n // k),
+# so booked slots are plain sorted integers per (channel, template, timezone).
+
+def _template_key(template, tz):
+    return f"{tz}|{','.join(template)}"
+
+
+def _parse_template(template):
+    times = []
+    for hhmm in template:
+        hour, minute = (int(part) for part in hhmm.split(":"))
+        times.append((hour, minute))
+    return sorted(times)
+
+
+def slot_time(index, template, tz):
+    """Aware datetime (in tz) of slot `index`."""
+    times = _parse_template(template)
+    hour, minute = times[index % len(times)]
+    day = date.fromordinal(index // len(times))
+    return datetime(day.year, day.month, day.day, hour, minute, tzinfo=ZoneInfo(tz))
+
+
+def first_slot_after(moment, template, tz):
+    """Index of the first slot strictly after `moment`."""
+    times = _parse_template(template)
+    local = moment.astimezone(ZoneInfo(tz))
+    for day_offset in (0, 1):
+        day = local.date() + timedelta(days=day_offset)
+        for i, (hour, minute) in enumerate(times):
+            candidate = datetime(day.year, day.month, day.day, hour, minute, tzinfo=ZoneInfo(tz))
+            if candidate > local:
+                return day.toordinal() * len(times) + i
+    raise ValueError("empty slot template")
+
+
+def first_free(booked, start):
+    """
+    Smallest free index >= start in a sorted list of unique booked indices.
+    booked[p + j] - (start + j) never decreases, so the end of the contiguous
+    booked run starting at `start` is found by binary search: O(log n).
+    """
+    p = bisect_left(booked, start)
+    if p == len(booked) or booked[p] != start:
+        return start
+    lo, hi = 0, len(booked) - p - 1
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if booked[p + mid] == start + mid:
+            lo = mid
+        else:
+            hi = mid - 1
+    return start + lo + 1
+
+
+def to_rfc3339(moment):
+    """publishAt wants UTC; convert instead of labelling a local time with 'Z'."""
+    return moment.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+# ---------------------------
+# Booking
+# ---------------------------
+
+def book_next_slot(channel="default", template=None, tz=None, now=None):
+    """
+    Reserve and return the next free publish slot for a channel.
+    Atomic across threads and processes (flock on the index file).
+    """
+    template = template or SLOT_TEMPLATES["daily"]
+    tz = tz or SLOT_SETTINGS["timezone"]
+    now = now or datetime.now(timezone.utc)
+    earliest = now + timedelta(minutes=SLOT_SETTINGS["min_lead_minutes"])
+    key = _template_key(template, tz)
+
+    with locked_json(SLOTS_FILE, {}) as index:
+        booked = index.setdefault(channel, {}).setdefault(key, [])
+        start = first_slot_after(earliest, template, tz)
+        # Slots in the past can never be handed out again
+        del booked[:bisect_left(booked, start - len(template))]
+        slot = first_free(booked, start)
+        insort(booked, slot)
+
+    scheduled = slot_time(slot, template, tz)
+    print(f"📅 Booked publish slot: {scheduled.strftime('%Y-%m-%d %I:%M %p %Z')} ({channel})")
+    return scheduled
+
+
+def release_slot(scheduled, channel="default", template=None, tz=None):
+    """Give a slot back (e.g. the upload that booked it failed)."""
+    template = template or SLOT_TEMPLATES["daily"]
+    tz = tz or SLOT_SETTINGS["timezone"]
+    local = scheduled.astimezone(ZoneInfo(tz))
+    times = _parse_template(template)
+    if (local.hour, local.minute) not in times:
+        return False
+    slot = local.date().toordinal() * len(times) + times.index((local.hour, local.minute))
+
+    with locked_json(SLOTS_FILE, {}) as index:
+        booked = index.get(channel, {}).get(_template_key(template, tz), [])
+        p = bisect_left(booked, slot)
+        if p < len(booked) and booked[p] == slot:
+            booked.pop(p)
+            print(f"↩️ Released publish slot: {local.strftime('%Y-%m-%d %I:%M %p %Z')}")
+            return True
+    return False
+
+
+def booked_slots(channel="default", template=None, tz=None):
+    """Upcoming booked publish times for a channel."""
+    template = template or SLOT_TEMPLATES["daily"]
+    tz = tz or SLOT_SETTINGS["timezone"]
+    booked = read_json(SLOTS_FILE, {}).get(channel, {}).get(_template_key(template, tz), [])
+    return [slot_time(i, template, tz) for i in booked]
@@ -0,0 +1,241 @@
+import argparse
+import json
+import os
+import shutil
+import time
+import uuid
+from contextlib import closing
+from datetime import datetime
+
+import metrics
+from coordination import connect, transaction
+
+# ---------------------------
+# ⚙️ Render-ahead Settings
+# ---------------------------
+# With render-ahead on, the 06:30 job only uploads a short rendered earlier, and
+# "prerender" jobs keep up to `depth` upload-ready shorts in BUFFER_DIR.
+BUFFER_DIR = "render_buffer"
+BUFFER_SETTINGS = {
+    "enabled": os.environ.get("RENDER_AHEAD", "") == "1",
+    "depth": int(os.environ.get("RENDER_AHEAD_DEPTH", "3")),
+    "off_peak_hours": os.environ.get("RENDER_AHEAD_HOURS", "0-5"),   # local "start-end", may wrap
+    "refill_minutes": 20,          # how often the leader checks whether to queue a prerender
+    "max_load_per_cpu": 0.5,       # 1-min load average per core above which no refill starts
+    "cpu_share": 0.5,              # fraction of cores a prerender job may run on
+    "nice": 10,
+    "claim_ttl_minutes": 45,       # a 'publishing' claim older than this is put back (the
+                                   # upload stage's own deadline is 30 min)
+    "max_publish_attempts": 3,     # an item whose upload failed this often is set aside as 'failed'
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS render_buffer (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL,
+    path TEXT NOT NULL,
+    details TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'ready',
+    created_at REAL NOT NULL,
+    claimed_at REAL,
+    claimed_by TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS render_buffer_status ON render_buffer (status, id);
+"""
+_schema_ready = False
+
+
+def _ensure_schema():
+    global _schema_ready
+    if not _schema_ready:
+        with closing(connect()) as conn:
+            conn.executescript(_SCHEMA)
+        with transaction() as conn:
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(render_buffer)")}
+            if "claimed_by" not in columns:   # buffers created before claims named their job
+                conn.execute("ALTER TABLE render_buffer ADD COLUMN claimed_by TEXT")
+            if "attempts" not in columns:
+                conn.execute("ALTER TABLE render_buffer ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+        _schema_ready = True
+
+
+# A claim given back without a finished upload is one failed attempt; the last one
+# allowed sets the item aside instead of putting it back at the head of the queue
+_RELEASE_CLAIM = ("UPDATE render_buffer SET attempts = attempts + 1, claimed_at = NULL, claimed_by = NULL, "
+                  "status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'ready' END ")
+
+
+def _reclaim_stale(conn):
+    """Put back claims whose publish job died without restoring them."""
+    cutoff = time.time() - BUFFER_SETTINGS["claim_ttl_minutes"] * 60
+    cur = conn.execute(_RELEASE_CLAIM + "WHERE status = 'publishing' AND claimed_at < ?",
+                       (BUFFER_SETTINGS["max_publish_attempts"], cutoff))
+    if cur.rowcount:
+        print(f"♻️ Render buffer: reclaimed {cur.rowcount} stale publishing claim(s)")
+
+
+def _item_dict(row):
+    if row is None:
+        return None
+    item = dict(row)
+    item["details"] = json.loads(item["details"])
+    item["video"] = os.path.join(item["path"], "output_video.mp4")
+    thumbnail = os.path.join(item["path"], "thumbnail.jpg")
+    item["thumbnail"] = thumbnail if os.path.exists(thumbnail) else None
+    return item
+
+
+class RenderBuffer:
+    """
+    Upload-ready shorts as rows in STATE_DB plus one directory each under BUFFER_DIR.
+    'ready' items wait for the publish job; 'publishing' is held while one uploads,
+    by the job named in claimed_by, for at most claim_ttl_minutes. 'failed' items
+    used up max_publish_attempts and stay on disk for inspection.
+    """
+
+    def __init__(self, root=BUFFER_DIR):
+        self.root = root
+        _ensure_schema()
+
+    def push(self, url, video, thumbnail, details):
+        """Move a finished render (and its thumbnail) out of the job's scratch dir."""
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        path = os.path.abspath(os.path.join(self.root, name))
+        os.makedirs(path)
+        shutil.move(video, os.path.join(path, "output_video.mp4"))
+        if thumbnail:
+            shutil.move(thumbnail, os.path.join(path, "thumbnail.jpg"))
+        with transaction() as conn:
+            cur = conn.execute(
+                "INSERT INTO render_buffer (url, path, details, created_at) VALUES (?, ?, ?, ?)",
+                (url, path, json.dumps(details, ensure_ascii=False), time.time()))
+            item_id = cur.lastrowid
+        print(f"📦 Render buffer: item {item_id} ready ({url})")
+        return self.get(item_id)
+
+    def claim_oldest(self, claimed_by=None):
+        """
+        Atomically mark the oldest ready item as publishing for the job claimed_by.
+        Returns it, or None if empty.
+        """
+        with transaction() as conn:
+            _reclaim_stale(conn)
+            row = conn.execute(
+                "SELECT id FROM render_buffer WHERE status = 'ready' ORDER BY id LIMIT 1").fetchone()
+            if not row:
+                return None
+            conn.execute("UPDATE render_buffer SET status = 'publishing', claimed_at = ?, claimed_by = ? "
+                         "WHERE id = ?", (time.time(), claimed_by, row["id"]))
+        return self.get(row["id"])
+
+    def restore(self, item_id):
+        """
+        Put a claimed item back at its place in the queue (its upload failed), or set
+        it aside after max_publish_attempts. Returns the item's new status.
+        """
+        with transaction() as conn:
+            conn.execute(_RELEASE_CLAIM + "WHERE id = ?", (BUFFER_SETTINGS["max_publish_attempts"], item_id))
+            row = conn.execute("SELECT status FROM render_buffer WHERE id = ?", (item_id,)).fetchone()
+        return row["status"] if row else None
+
+    def restore_claims(self, claimed_by):
+        """Put back every item a job still holds (the watchdog killed it). Returns the count."""
+        with transaction() as conn:
+            cur = conn.execute(_RELEASE_CLAIM + "WHERE status = 'publishing' AND claimed_by = ?",
+                               (BUFFER_SETTINGS["max_publish_attempts"], claimed_by))
+        if cur.rowcount:
+            print(f"♻️ Render buffer: restored {cur.rowcount} item(s) claimed by {claimed_by}")
+        return cur.rowcount
+
+    def remove(self, item_id):
+        """Drop a published item and its files."""
+        item = self.get(item_id)
+        with transaction() as conn:
+            conn.execute("DELETE FROM render_buffer WHERE id = ?", (item_id,))
+        if item:
+            shutil.rmtree(item["path"], ignore_errors=True)
+
+    def get(self, item_id):
+        with closing(connect()) as conn:
+            return _item_dict(conn.execute("SELECT * FROM render_buffer WHERE id = ?", (item_id,)).fetchone())
+
+    def items(self):
+        with closing(connect()) as conn:
+            return [_item_dict(r) for r in conn.execute("SELECT * FROM render_buffer ORDER BY id").fetchall()]
+
+    def stats(self):
+        """Depth, target and oldest ready item's age; also updates the buffer gauges."""
+        with transaction() as conn:
+            _reclaim_stale(conn)
+            row = conn.execute(
+                "SELECT COUNT(*) AS depth, MIN(created_at) AS oldest FROM render_buffer "
+                "WHERE status = 'ready'").fetchone()
+            publishing = conn.execute(
+                "SELECT COUNT(*) FROM render_buffer WHERE status = 'publishing'").fetchone()[0]
+            failed = conn.execute(
+                "SELECT COUNT(*) FROM render_buffer WHERE status = 'failed'").fetchone()[0]
+        oldest_age = time.time() - row["oldest"] if row["oldest"] else None
+        metrics.set_gauge("render_buffer_depth", row["depth"])
+        metrics.set_gauge("render_buffer_oldest_age_seconds", oldest_age or 0)
+        return {"enabled": BUFFER_SETTINGS["enabled"], "depth": row["depth"],
+                "target": BUFFER_SETTINGS["depth"], "publishing": publishing,
+                "failed": failed, "oldest_age_seconds": oldest_age}
+
+    def is_full(self):
+        return self.stats()["depth"] >= BUFFER_SETTINGS["depth"]
+
+
+# ---------------------------
+# ⏳ Refill policy
+# ---------------------------
+
+def in_off_peak(now=None):
+    """True inside BUFFER_SETTINGS['off_peak_hours'] ("0-5" = 00:00–04:59, "22-5" wraps midnight)."""
+    start, end = (int(h) for h in BUFFER_SETTINGS["off_peak_hours"].split("-"))
+    hour = (now or datetime.now()).hour
+    if start <= end:
+        return start <= hour < end
+    return hour >= start or hour < end
+
+
+def refill_decision(buffer=None, now=None):
+    """(should_refill, reason) for the leader's periodic check."""
+    if not BUFFER_SETTINGS["enabled"]:
+        return False, "render-ahead disabled"
+    stats = (buffer or RenderBuffer()).stats()
+    if stats["depth"] >= stats["target"]:
+        return False, f"buffer full ({stats['depth']}/{stats['target']})"
+    if not in_off_peak(now):
+        return False, f"outside off-peak hours {BUFFER_SETTINGS['off_peak_hours']}"
+    load = os.getloadavg()[0] / (os.cpu_count() or 1)
+    if load > BUFFER_SETTINGS["max_load_per_cpu"]:
+        return False, f"host busy (load {load:.2f}/core)"
+    return True, f"buffer {stats['depth']}/{stats['target']}"
+
+
+def apply_cpu_cap():
+    """
+    Confine the calling (prerender job) process to a share of the cores at low
+    priority; ffmpeg and DAG workers started afterwards inherit both.
+    """
+    os.nice(BUFFER_SETTINGS["nice"])
+    if hasattr(os, "sched_setaffinity"):
+        cores = sorted(os.sched_getaffinity(0))
+        keep = cores[:max(1, int(len(cores) * BUFFER_SETTINGS["cpu_share"]))]
+        os.sched_setaffinity(0, keep)
+        print(f"🐢 Prerender capped to {len(keep)}/{len(cores)} cores at nice {BUFFER_SETTINGS['nice']}")
+
+
+# ---------------------------
+# CLI
+# ---------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect the render-ahead buffer")
+    parser.parse_args()
+    buffer = RenderBuffer()
+    for item in buffer.items():
+        created = time.strftime("%Y-%m-%d %H:%M", time.localtime(item["created_at"]))
+        print(f"#{item['id']:<4} {item['status']:<10} {created}  {item['attempts']} attempt(s)  {item['url']}")
+    print(buffer.stats())
+    print("refill:", *refill_decision(buffer))
@@ -0,0 +1,204 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import metrics
+
+# ---------------------------
+# ⚙️ Cache Settings
+# ---------------------------
+CACHE_DIR = ".render_cache"
+INDEX_FILE = os.path.join(CACHE_DIR, "index.json")
+CACHE_SETTINGS = {
+    "max_age_days": 7,               # entries older than this are evicted
+    "max_total_mb": 2048,            # least recently used entries go first
+}
+
+_hash_memo = {}
+
+
+# ---------------------------
+# Keys
+# ---------------------------
+
+def file_fingerprint(path):
+    """sha256 of the file contents, memoised on (path, size, mtime)."""
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    if memo_key in _hash_memo:
+        return _hash_memo[memo_key]
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    _hash_memo[memo_key] = digest.hexdigest()
+    return _hash_memo[memo_key]
+
+
+def render_key(inputs, params, backend):
+    """
+    Deterministic cache key for one render.
+
+    Args:
+        inputs: {name: file path} — hashed by content, not by name or mtime
+        params: every setting that changes the output (volumes, encode options, ...)
+        backend: version strings of the render stack
+    """
+    payload = {
+        "inputs": {name: file_fingerprint(path) for name, path in sorted(inputs.items())},
+        "params": params,
+        "backend": backend,
+    }
+    blob = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(blob).hexdigest()
+
+
+# ---------------------------
+# Index
+# ---------------------------
+
+def _load_index():
+    try:
+        with open(INDEX_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _save_index(index):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp = INDEX_FILE + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=2)
+    os.replace(tmp, INDEX_FILE)
+
+
+def _entry_path(key):
+    return os.path.join(CACHE_DIR, f"{key}.mp4")
+
+
+# ---------------------------
+# Lookup / store
+# ---------------------------
+
+def lookup(key, output_path):
+    """Copy a cached render to output_path. Returns True on a hit."""
+    index = _load_index()
+    entry = index.get(key)
+    cached = _entry_path(key)
+    if not entry or not os.path.exists(cached):
+        if entry:
+            index.pop(key, None)
+            _save_index(index)
+        metrics.inc("render_cache_requests_total", result="miss")
+        return False
+
+    shutil.copyfile(cached, output_path)
+    entry["last_used"] = time.time()
+    entry["hits"] = entry.get("hits", 0) + 1
+    _save_index(index)
+    metrics.inc("render_cache_requests_total", result="hit")
+    print(f"♻️ Render cache hit: {key[:12]} → {output_path}")
+    return True
+
+
+def store(key, output_path, params=None):
+    """Copy a finished render into the cache, then apply the eviction policy."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp = _entry_path(key) + ".tmp"
+    shutil.copyfile(output_path, tmp)
+    os.replace(tmp, _entry_path(key))
+
+    now = time.time()
+    index = _load_index()
+    index[key] = {
+        "created": now,
+        "last_used": now,
+        "hits": 0,
+        "size": os.path.getsize(_entry_path(key)),
+        "params": params or {},
+    }
+    _save_index(index)
+    print(f"💾 Render cached: {key[:12]}")
+    evict()
+
+
+def evict(max_age_days=None, max_total_mb=None):
+    """Drop entries older than max_age_days, then LRU entries until under max_total_mb."""
+    if max_age_days is None:
+        max_age_days = CACHE_SETTINGS["max_age_days"]
+    if max_total_mb is None:
+        max_total_mb = CACHE_SETTINGS["max_total_mb"]
+
+    index = _load_index()
+    now = time.time()
+    removed = []
+
+    for key, entry in list(index.items()):
+        if now - entry["created"] > max_age_days * 86400 or not os.path.exists(_entry_path(key)):
+            removed.append(key)
+            index.pop(key)
+
+    total = sum(e["size"] for e in index.values())
+    for key, entry in sorted(index.items(), key=lambda kv: kv[1]["last_used"]):
+        if total <= max_total_mb * 1024 * 1024:
+            break
+        total -= entry["size"]
+        removed.append(key)
+        index.pop(key)
+
+    for key in removed:
+        try:
+            os.remove(_entry_path(key))
+        except FileNotFoundError:
+            pass
+    if removed:
+        _save_index(index)
+        print(f"🧹 Render cache evicted {len(removed)} entr{'y' if len(removed) == 1 else 'ies'}")
+    return removed
+
+
+def purge():
+    """Remove every cached render."""
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)
+    print("🧹 Render cache purged")
+
+
+def stats():
+    index = _load_index()
+    return {
+        "entries": len(index),
+        "total_mb": round(sum(e["size"] for e in index.values()) / (1024 * 1024), 1),
+        "hits": sum(e.get("hits", 0) for e in index.values()),
+    }
+
+
+# ---------------------------
+# CLI
+# ---------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or purge the render cache")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("list", help="list cached renders")
+    sub.add_parser("stats", help="entry count, size and hits")
+    ev = sub.add_parser("evict", help="apply the age/size policy now")
+    ev.add_argument("--max-age-days", type=float, default=None)
+    ev.add_argument("--max-total-mb", type=float, default=None)
+    sub.add_parser("purge", help="delete every cached render")
+    args = parser.parse_args()
+
+    if args.cmd == "list":
+        for key, entry in sorted(_load_index().items(), key=lambda kv: kv[1]["created"]):
+            created = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry["created"]))
+            print(f"{key[:12]}  {created}  {entry['size'] / (1024 * 1024):7.1f} MB  "
+                  f"hits={entry.get('hits', 0)}  {json.dumps(entry.get('params', {}))}")
+    elif args.cmd == "stats":
+        print(stats())
+    elif args.cmd == "evict":
+        evict(args.max_age_days, args.max_total_mb)
+    elif args.cmd == "purge":
+        purge()
@@ -0,0 +1,255 @@
+import argparse
+import json
+import os
+import shutil
+import time
+
+import metrics
+
+# ---------------------------
+# ⚙️ Scratch Settings
+# ---------------------------
+SCRATCH_SETTINGS = {
+    "tmpfs_root": os.environ.get("SCRATCH_TMPFS", "/dev/shm/yt-shorts"),   # "" → disk only
+    "disk_root": os.environ.get("SCRATCH_DIR", ".scratch"),
+    "job_estimate_mb": 800,        # peak intermediates of one short (source, dubs, mix, render)
+    "tmpfs_reserve_mb": 512,       # RAM left free in tmpfs after a job's estimate
+    # tmpfs pages count against the container's memory limit; 0 → read it from the cgroup
+    "memory_limit_mb": int(os.environ.get("SCRATCH_MEMORY_LIMIT_MB", "0")),
+    "disk_budget_mb": int(os.environ.get("SCRATCH_BUDGET_MB", "4096")),   # all job dirs on disk
+    "min_disk_free_mb": 1024,      # free space that must remain after the estimate
+    "keep_hours": 24,              # finished job dirs older than this are collected
+    "keep_max_mb": 1024,           # oldest finished job dirs go first above this
+}
+
+MARKER = ".scratch.json"
+
+
+class ScratchBudgetExceeded(RuntimeError):
+    """Raised instead of starting a job that would not fit the disk budget."""
+
+
+# ---------------------------
+# Bookkeeping
+# ---------------------------
+
+def _roots():
+    """(tier, root) pairs; an empty tmpfs_root disables that tier."""
+    roots = [("tmpfs", SCRATCH_SETTINGS["tmpfs_root"]), ("disk", SCRATCH_SETTINGS["disk_root"])]
+    return [(tier, root) for tier, root in roots if root]
+
+
+def _free_mb(path):
+    st = os.statvfs(path)
+    return st.f_bavail * st.f_frsize / (1024 * 1024)
+
+
+_CGROUP_LIMIT_FILES = ("/sys/fs/cgroup/memory.max",                      # cgroup v2
+                       "/sys/fs/cgroup/memory/memory.limit_in_bytes")   # cgroup v1
+
+
+def memory_limit_mb():
+    """The container's memory limit: the setting, else the cgroup limit, else physical RAM."""
+    if SCRATCH_SETTINGS["memory_limit_mb"]:
+        return SCRATCH_SETTINGS["memory_limit_mb"]
+    physical = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / (1024 * 1024)
+    for path in _CGROUP_LIMIT_FILES:
+        try:
+            with open(path, "r") as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        if value.isdigit():
+            # v1 reports "unlimited" as a number near 2**63
+            return min(int(value) / (1024 * 1024), physical)
+    return physical
+
+
+def tmpfs_room_mb():
+    """
+    MB a new job may put in tmpfs: the memory limit minus the render's RSS ceiling
+    (STREAM_MEMORY_LIMIT_MB) minus what tmpfs job dirs already hold, capped by the
+    filesystem's own free space.
+    """
+    from streaming import STREAMING_SETTINGS
+
+    tmpfs_parent = os.path.dirname(SCRATCH_SETTINGS["tmpfs_root"].rstrip("/"))
+    held_mb = sum(d["bytes"] for d in job_dirs() if d["tier"] == "tmpfs") / (1024 * 1024)
+    room = memory_limit_mb() - STREAMING_SETTINGS["memory_limit_mb"] - held_mb
+    return min(room, _free_mb(tmpfs_parent))
+
+
+def usage(path):
+    """Bytes used under a directory."""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except FileNotFoundError:
+                pass
+    return total
+
+
+def _read_marker(path):
+    try:
+        with open(os.path.join(path, MARKER), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _write_marker(path, marker):
+    with open(os.path.join(path, MARKER), "w", encoding="utf-8") as f:
+        json.dump(marker, f, indent=2)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def job_dirs():
+    """Every job dir in both tiers with its marker, size and tier."""
+    dirs = []
+    for tier, root in _roots():
+        if not os.path.isdir(root):
+            continue
+        for name in os.listdir(root):
+            path = os.path.join(root, name)
+            if not os.path.isdir(path):
+                continue
+            marker = _read_marker(path)
+            # A job killed by the watchdog never marks itself finished
+            if marker.get("state") == "active" and not _pid_alive(marker.get("pid", 0)):
+                marker["state"] = "abandoned"
+            dirs.append({"name": name, "path": path, "tier": tier, "bytes": usage(path),
+                         "created": marker.get("created", os.path.getmtime(path)),
+                         "finished": marker.get("finished"), "state": marker.get("state", "unknown")})
+    return dirs
+
+
+# ---------------------------
+# 📂 Allocation
+# ---------------------------
+
+def allocate(name, estimate_mb=None):
+    """
+    Create the scratch dir for one job and return its absolute path. Uses tmpfs when
+    it has room for the estimate (tmpfs_room_mb()), otherwise disk; raises
+    ScratchBudgetExceeded when the disk tier is over budget or the filesystem would
+    run too low.
+    """
+    settings = SCRATCH_SETTINGS
+    estimate_mb = estimate_mb or settings["job_estimate_mb"]
+    gc()
+
+    tmpfs_parent = os.path.dirname(settings["tmpfs_root"].rstrip("/"))
+    if (settings["tmpfs_root"] and os.path.isdir(tmpfs_parent)
+            and tmpfs_room_mb() >= estimate_mb + settings["tmpfs_reserve_mb"]):
+        root, tier = settings["tmpfs_root"], "tmpfs"
+    else:
+        root, tier = settings["disk_root"], "disk"
+        os.makedirs(root, exist_ok=True)
+        used_mb = sum(d["bytes"] for d in job_dirs() if d["tier"] == "disk") / (1024 * 1024)
+        if used_mb + estimate_mb > settings["disk_budget_mb"]:
+            raise ScratchBudgetExceeded(
+                f"scratch budget: {used_mb:.0f} MB used + {estimate_mb} MB needed "
+                f"> {settings['disk_budget_mb']} MB")
+        if _free_mb(root) - estimate_mb < settings["min_disk_free_mb"]:
+            raise ScratchBudgetExceeded(
+                f"disk space: {_free_mb(root):.0f} MB free, need {estimate_mb} MB "
+                f"+ {settings['min_disk_free_mb']} MB reserve")
+
+    path = os.path.abspath(os.path.join(root, name))
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
+    _write_marker(path, {"name": name, "state": "active", "pid": os.getpid(), "created": time.time()})
+    print(f"📂 Scratch for {name}: {path} ({tier})")
+    return path
+
+
+def release(path):
+    """
+    Mark a job dir finished and record its size. tmpfs dirs are freed at once
+    (they hold RAM); disk dirs stay for inspection until gc() collects them.
+    """
+    nbytes = usage(path)
+    print(f"📂 Scratch used by {os.path.basename(path)}: {nbytes / (1024 * 1024):.1f} MB")
+    tmpfs_root = SCRATCH_SETTINGS["tmpfs_root"]
+    if tmpfs_root and path.startswith(os.path.abspath(tmpfs_root) + os.sep):
+        shutil.rmtree(path, ignore_errors=True)
+        return nbytes
+    marker = _read_marker(path)
+    marker.update(state="finished", finished=time.time(), bytes=nbytes)
+    _write_marker(path, marker)
+    return nbytes
+
+
+def discard(name):
+    """Delete a job's scratch dir in either tier (e.g. after the watchdog killed it)."""
+    for _, root in _roots():
+        path = os.path.join(root, name)
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+            print(f"🧹 Scratch discarded: {path}")
+
+
+def gc(keep_hours=None, keep_max_mb=None):
+    """
+    Remove finished and abandoned job dirs older than keep_hours, then the oldest
+    remaining ones until they fit keep_max_mb. Active jobs are never touched.
+    """
+    if keep_hours is None:
+        keep_hours = SCRATCH_SETTINGS["keep_hours"]
+    if keep_max_mb is None:
+        keep_max_mb = SCRATCH_SETTINGS["keep_max_mb"]
+
+    now = time.time()
+    dirs = job_dirs()
+    done = [d for d in dirs if d["state"] != "active"]
+    removed = [d for d in done if now - (d["finished"] or d["created"]) > keep_hours * 3600]
+    kept = sorted((d for d in done if d not in removed), key=lambda d: d["finished"] or d["created"])
+    total = sum(d["bytes"] for d in kept)
+    for d in kept:
+        if total <= keep_max_mb * 1024 * 1024:
+            break
+        total -= d["bytes"]
+        removed.append(d)
+
+    for d in removed:
+        shutil.rmtree(d["path"], ignore_errors=True)
+    if removed:
+        print(f"🧹 Scratch collected {len(removed)} job dir{'' if len(removed) == 1 else 's'} "
+              f"({sum(d['bytes'] for d in removed) / (1024 * 1024):.1f} MB)")
+
+    for tier in ("tmpfs", "disk"):
+        metrics.set_gauge("scratch_bytes", sum(d["bytes"] for d in dirs if d["tier"] == tier
+                                               and d not in removed), tier=tier)
+    return removed
+
+
+# ---------------------------
+# CLI
+# ---------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or collect job scratch space")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("list", help="job dirs in both tiers")
+    collect = sub.add_parser("gc", help="apply the age/size policy now")
+    collect.add_argument("--keep-hours", type=float, default=None)
+    collect.add_argument("--keep-max-mb", type=float, default=None)
+    args = parser.parse_args()
+
+    if args.cmd == "list":
+        for d in sorted(job_dirs(), key=lambda d: d["created"]):
+            created = time.strftime("%Y-%m-%d %H:%M", time.localtime(d["created"]))
+            print(f"{d['name']:<28} {d['tier']:<5} {d['state']:<9} {created}  "
+                  f"{d['bytes'] / (1024 * 1024):7.1f} MB  {d['path']}")
+    elif args.cmd == "gc":
+        gc(args.keep_hours, args.keep_max_mb)
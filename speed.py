@@ -2,6 +2,9 @@ from pydub import AudioSegment
 from pydub.effects import speedup
 import os
 
+import metrics
+from streaming import STREAMING_SETTINGS, adjust_audio_tone_streaming
+
 # ---------------------------
 # 🎛️ Tone Settings
 # ---------------------------
@@ -17,15 +20,28 @@ TONE_SETTINGS = {
 # Audio Editing Functions
 # ---------------------------
 
-def adjust_audio_tone(input_file, output_file=None, settings=None):
-    """Apply the tone adjustments in two stages for smoother sound."""
+@metrics.instrument("adjust_audio_tone", none_is_error=True)
+def adjust_audio_tone(input_file, output_file=None, settings=None, streaming=None):
+    """
+    Apply the tone adjustments in two stages for smoother sound.
+    streaming=True runs the same chain through ffmpeg in bounded memory
+    (default: STREAMING_RENDER env var).
+    """
     if settings is None:
         settings = TONE_SETTINGS
+    if streaming is None:
+        streaming = STREAMING_SETTINGS["enabled"]
     
     try:
         if not output_file:
             name, ext = os.path.splitext(input_file)
             output_file = f"{name}_tone{ext}"
+
+        if streaming:
+            print(f"🌊 Streaming tone adjust: {input_file}")
+            adjust_audio_tone_streaming(input_file, output_file, settings)
+            print(f"✅ Done! → {output_file}")
+            return output_file
         
         print(f"🎵 Loading: {input_file}")
         audio = AudioSegment.from_file(input_file)
@@ -0,0 +1,229 @@
+import os
+import re
+import subprocess
+import threading
+import time
+
+from moviepy.config import get_setting
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+
+import encoding
+import metrics
+
+# ---------------------------
+# ⚙️ Streaming Settings
+# ---------------------------
+STREAMING_SETTINGS = {
+    "enabled": os.environ.get("STREAMING_RENDER", "") == "1",
+    "memory_limit_mb": int(os.environ.get("STREAM_MEMORY_LIMIT_MB", "384")),
+    "audio_rate": 44100,
+    "poll_seconds": 0.1,
+}
+
+# Resident memory of an idle ffmpeg process before it holds any frames
+_FFMPEG_BASE_MB = 40
+
+
+class MemoryCeilingExceeded(RuntimeError):
+    pass
+
+
+# ---------------------------
+# 📈 RSS measurement
+# ---------------------------
+
+def _rss_mb(pid="self"):
+    """Current resident set size of a process in MB (Linux /proc), or 0 if unavailable."""
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except (FileNotFoundError, ProcessLookupError, PermissionError):
+        pass
+    return 0.0
+
+
+class StageMeter:
+    """
+    Sample peak RSS of this process (and an optional ffmpeg child) during one stage.
+    Kills the child if the combined RSS goes over memory_limit_mb.
+    """
+
+    def __init__(self, stage, memory_limit_mb=None):
+        self.stage = stage
+        self.memory_limit_mb = memory_limit_mb or STREAMING_SETTINGS["memory_limit_mb"]
+        self.peak_self_mb = 0.0
+        self.peak_child_mb = 0.0
+        self.child = None
+        self.exceeded = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak_self_mb = max(self.peak_self_mb, _rss_mb())
+            if self.child is not None and self.child.poll() is None:
+                self.peak_child_mb = max(self.peak_child_mb, _rss_mb(self.child.pid))
+                if self.peak_self_mb + self.peak_child_mb > self.memory_limit_mb:
+                    self.exceeded = True
+                    self.child.kill()
+            self._stop.wait(STREAMING_SETTINGS["poll_seconds"])
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+        print(f"📈 Peak RSS [{self.stage}]: python {self.peak_self_mb:.0f} MB | "
+              f"ffmpeg {self.peak_child_mb:.0f} MB | limit {self.memory_limit_mb} MB")
+        return False
+
+    @property
+    def peak_mb(self):
+        return self.peak_self_mb + self.peak_child_mb
+
+
+def run_ffmpeg(args, stage, memory_limit_mb=None):
+    """Run ffmpeg under a StageMeter. Returns (stderr text, meter)."""
+    cmd = [get_setting("FFMPEG_BINARY"), "-y", "-hide_banner", "-nostats", *args]
+    with StageMeter(stage, memory_limit_mb) as meter:
+        meter.child = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        _, stderr = meter.child.communicate()
+    stderr = stderr.decode("utf-8", errors="replace")
+    if meter.exceeded:
+        raise MemoryCeilingExceeded(
+            f"{stage}: RSS {meter.peak_mb:.0f} MB over the {meter.memory_limit_mb} MB ceiling")
+    if meter.child.returncode != 0:
+        raise RuntimeError(f"{stage}: ffmpeg failed: {stderr.strip()[-500:]}")
+    return stderr, meter
+
+
+# ---------------------------
+# 🎛️ Chunk sizing
+# ---------------------------
+
+def x264_budget(width, height, memory_limit_mb):
+    """
+    Translate a memory ceiling into x264 thread / lookahead counts. x264 keeps roughly
+    (threads + lookahead + refs) frames in flight, so those bound the encoder's working set.
+    """
+    frame_mb = width * height * 1.5 / (1024 * 1024)
+    frames = max(4, int((memory_limit_mb - _FFMPEG_BASE_MB) / (frame_mb * 3)))
+    threads = max(1, min(os.cpu_count() or 1, frames // 6))
+    lookahead = max(0, min(40, frames - threads - 4))
+    return threads, lookahead
+
+
+# ---------------------------
+# 🎵 Streaming tone adjustment
+# ---------------------------
+
+def adjust_audio_tone_streaming(input_file, output_file, settings, memory_limit_mb=None):
+    """
+    Same chain as speed.adjust_audio_tone, expressed as ffmpeg filters so the track is
+    processed frame by frame instead of held in memory as AudioSegments.
+    Normalisation needs the peak first, so a volumedetect pass runs ahead of the write pass.
+    """
+    duration = ffmpeg_parse_infos(input_file)["duration"]
+    filters = []
+    if settings["speed"] != 1.0:
+        filters.append(f"atempo={settings['speed']}")
+        duration /= settings["speed"]
+    if settings["volume_change"] != 0:
+        filters.append(f"volume={settings['volume_change']}dB")
+
+    if settings["normalize"]:
+        probe = ",".join(filters + ["volumedetect"])
+        stderr, _ = run_ffmpeg(["-i", input_file, "-af", probe, "-f", "null", "-"],
+                               "tone: peak scan", memory_limit_mb)
+        match = re.search(r"max_volume:\s*(-?[\d.]+) dB", stderr)
+        if match:
+            # Same headroom as pydub's AudioSegment.normalize()
+            filters.append(f"volume={-0.1 - float(match.group(1)):.2f}dB")
+
+    if settings["fade_in"] > 0:
+        filters.append(f"afade=t=in:st=0:d={settings['fade_in'] / 1000}")
+    if settings["fade_out"] > 0:
+        fade = settings["fade_out"] / 1000
+        filters.append(f"afade=t=out:st={max(0.0, duration - fade):.3f}:d={fade}")
+
+    args = ["-i", input_file]
+    if filters:
+        args += ["-af", ",".join(filters)]
+    run_ffmpeg(args + [output_file], "tone: write", memory_limit_mb)
+    return output_file
+
+
+# ---------------------------
+# 🎬 Streaming render
+# ---------------------------
+
+def render_streaming(video_path, voice_path, bg_path, output_path,
+                     voice_volume=1.8, bg_volume=0.08, memory_limit_mb=None, encode=None):
+    """
+    Equivalent of video_edit's moviepy graph as one ffmpeg filtergraph: retime, voice
+    speed change, looped/trimmed background and the mix all stream through ffmpeg, and
+    the encoder's frame buffers are sized to fit memory_limit_mb.
+    encode: overrides for encoding.ENCODE_SETTINGS (two-pass runs the graph twice).
+    """
+    memory_limit_mb = memory_limit_mb or STREAMING_SETTINGS["memory_limit_mb"]
+    video_info = ffmpeg_parse_infos(video_path)
+    voice_info = ffmpeg_parse_infos(voice_path)
+
+    video_duration = video_info["duration"]
+    voice_duration = voice_info["duration"]
+    target_duration = (video_duration + voice_duration) / 2.0
+    video_speed_factor = video_duration / target_duration
+    voice_speed_factor = voice_duration / target_duration
+    print(f"🎬 Video: {video_duration:.2f}s | 🎙 Voice: {voice_duration:.2f}s | "
+          f"⏰ Target: {target_duration:.2f}s")
+
+    rate = STREAMING_SETTINGS["audio_rate"]
+    voice_rate = voice_info.get("audio_fps") or rate
+    width, height = video_info["video_size"]
+    threads, lookahead = x264_budget(width, height, memory_limit_mb)
+    print(f"🧮 Memory ceiling {memory_limit_mb} MB → x264 threads={threads}, lookahead={lookahead}")
+    plan = encoding.plan_encode(target_duration, width, height, video_info["video_fps"],
+                                encoding.resolve(encode))
+    print(encoding.describe(plan))
+
+    graph = (
+        f"[0:v]setpts=PTS/{video_speed_factor:.6f}[v];"
+        f"[1:a]asetrate={int(voice_rate * voice_speed_factor)},aresample={rate},"
+        f"volume={voice_volume}[voice];"
+        f"[2:a]aresample={rate},atrim=0:{target_duration:.3f},volume={bg_volume}[bg];"
+        f"[voice][bg]amix=inputs=2:duration=longest:normalize=0[a]"
+    )
+    args = [
+        "-i", video_path,
+        "-i", voice_path,
+        "-stream_loop", "-1", "-i", bg_path,
+        "-filter_complex", graph,
+        "-map", "[v]", "-map", "[a]",
+        "-t", f"{target_duration:.3f}",
+        "-c:v", "libx264", "-threads", str(threads),
+        "-x264-params", f"rc-lookahead={lookahead}",
+        "-max_muxing_queue_size", "256",
+        "-c:a", "aac", "-b:a", encoding.audio_bitrate(plan),
+    ]
+    passlog = f"{os.path.splitext(output_path)[0]}_x264"
+    passes = encoding.encode_passes(plan, passlog)
+    start = time.perf_counter()
+    try:
+        for number, rate_args in enumerate(passes, 1):
+            if number < len(passes):
+                run_ffmpeg([*args, *rate_args, "-f", "null", os.devnull], f"render pass {number}",
+                           memory_limit_mb)
+            else:
+                _, meter = run_ffmpeg([*args, *rate_args, output_path], "render", memory_limit_mb)
+    finally:
+        encoding.remove_passlog(passlog)
+    elapsed = time.perf_counter() - start
+    metrics.set_gauge("render_fps", target_duration * video_info["video_fps"] / elapsed)
+    print(f"✅ Streaming render done in {elapsed:.1f}s "
+          f"(peak {meter.peak_mb:.0f} MB)")
+    encoding.report(plan, output_path)
+    return output_path
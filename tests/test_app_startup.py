@@ -0,0 +1,46 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("apscheduler")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Under `python app.py` a spawned job process re-runs app.py as __mp_main__
+SPAWN_A_JOB = """
+import json, multiprocessing, sys
+import __main__
+__main__.__file__ = "app.py"
+import test_app_startup
+
+ctx = multiprocessing.get_context("spawn")
+receiver, sender = ctx.Pipe(duplex=False)
+child = ctx.Process(target=test_app_startup.report_background, args=(sender,))
+child.start()
+print(json.dumps(receiver.recv()))
+child.join()
+"""
+
+
+def report_background(sender):
+    """Runs in the spawned process: which of app's background pieces are running here."""
+    main = sys.modules["__mp_main__"]
+    sender.send({"is_app": hasattr(main, "start_background"),
+                 "scheduler_running": main.scheduler.running,
+                 "threads": sorted(t.name for t in threading.enumerate())})
+
+
+def test_spawning_a_job_does_not_start_a_second_scheduler(tmp_path):
+    env = dict(os.environ, AUTOMATION_STATE_DB=str(tmp_path / "state.db"),
+               PYTHONPATH=os.pathsep.join([ROOT, os.path.join(ROOT, "tests")]))
+    out = subprocess.run([sys.executable, "-c", SPAWN_A_JOB], cwd=ROOT, env=env,
+                         capture_output=True, text=True, timeout=120, check=True).stdout
+    child = json.loads(out.strip().splitlines()[-1])
+    assert child["is_app"]
+    assert not child["scheduler_running"]
+    assert child["threads"] == ["MainThread"]
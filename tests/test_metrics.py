@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+import coordination
+import metrics
+
+
+@pytest.fixture(autouse=True)
+def state_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(coordination, "STATE_DB", str(tmp_path / "state.db"))
+    monkeypatch.setattr(metrics, "_schema_ready", False)
+
+
+def errors(stage):
+    prefix = f'pipeline_stage_errors_total{{stage="{stage}"}} '
+    for line in metrics.render_prometheus().splitlines():
+        if line.startswith(prefix):
+            return float(line[len(prefix):])
+    return 0.0
+
+
+def test_none_counts_as_error_only_when_the_stage_says_so():
+    @metrics.instrument("fails_with_none", none_is_error=True)
+    def fails_with_none():
+        return None
+
+    @metrics.instrument("returns_nothing")
+    def returns_nothing():
+        return None
+
+    fails_with_none()
+    returns_nothing()
+    assert errors("fails_with_none") == 1
+    assert errors("returns_nothing") == 0
+
+
+def test_async_none_and_error_results():
+    @metrics.instrument("voice", none_is_error=True)
+    async def voice(ok):
+        return "ai_dub.mp3" if ok else None
+
+    asyncio.run(voice(True))
+    asyncio.run(voice(False))
+    assert errors("voice") == 1
+
+
+def test_error_strings_dicts_and_exceptions():
+    @metrics.instrument("stage")
+    def stage(result):
+        if result == "raise":
+            raise RuntimeError("boom")
+        return result
+
+    stage("✅ done")
+    stage("❌ Error during video editing: boom")
+    stage({"error": "quota"})
+    with pytest.raises(RuntimeError):
+        stage("raise")
+    assert errors("stage") == 3
@@ -0,0 +1,38 @@
+import pytest
+
+import coordination
+import metrics
+import render_buffer
+from render_buffer import BUFFER_SETTINGS, RenderBuffer
+
+
+@pytest.fixture
+def buffer(tmp_path, monkeypatch):
+    monkeypatch.setattr(coordination, "STATE_DB", str(tmp_path / "state.db"))
+    monkeypatch.setattr(metrics, "_schema_ready", False)
+    monkeypatch.setattr(render_buffer, "_schema_ready", False)
+    buffer = RenderBuffer(root=str(tmp_path / "buffer"))
+    for n in range(2):
+        video = tmp_path / f"video{n}.mp4"
+        video.write_bytes(b"mp4")
+        buffer.push(f"https://example.com/{n}", str(video), None, {"title": f"short {n}"})
+    return buffer
+
+
+def test_item_is_set_aside_after_max_publish_attempts(buffer):
+    first = buffer.claim_oldest(claimed_by="run-1")
+    for _ in range(BUFFER_SETTINGS["max_publish_attempts"] - 1):
+        assert buffer.restore(first["id"]) == "ready"
+        assert buffer.claim_oldest(claimed_by="run-1")["id"] == first["id"]
+
+    assert buffer.restore(first["id"]) == "failed"
+    assert buffer.claim_oldest(claimed_by="run-1")["url"] == "https://example.com/1"
+    assert buffer.stats()["failed"] == 1
+
+
+def test_killed_claims_count_as_attempts(buffer):
+    for _ in range(BUFFER_SETTINGS["max_publish_attempts"]):
+        item = buffer.claim_oldest(claimed_by="run-1")
+        assert item["url"] == "https://example.com/0"
+        buffer.restore_claims("run-1")
+    assert buffer.get(item["id"])["status"] == "failed"
@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+pytest.importorskip("moviepy")
+if not os.path.exists("/proc/self/status"):
+    pytest.skip("RSS sampling needs Linux /proc", allow_module_level=True)
+
+import streaming
+from benchmark import make_synthetic_inputs
+from speed import TONE_SETTINGS
+
+MEMORY_LIMIT_MB = 384
+
+
+@pytest.fixture
+def meters(monkeypatch):
+    """Every StageMeter the streaming path creates, so the test can read their peaks."""
+    created = []
+
+    class RecordingMeter(streaming.StageMeter):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            created.append(self)
+
+    monkeypatch.setattr(streaming, "StageMeter", RecordingMeter)
+    return created
+
+
+# A long source at low resolution: memory must not grow with duration, so it gets
+# the same ceiling as the short full-size clip
+@pytest.mark.parametrize("source", [
+    dict(seconds=20, voice_seconds=24),
+    dict(seconds=240, voice_seconds=260, size="180x320", fps=15),
+], ids=["short-1080p", "long-4min-320p"])
+def test_streaming_render_stays_under_memory_ceiling(tmp_path, meters, source):
+    files = make_synthetic_inputs(str(tmp_path), **source)
+    toned = str(tmp_path / "hindi_dub_tone.mp3")
+    output = str(tmp_path / "output_video.mp4")
+
+    streaming.adjust_audio_tone_streaming(files["voice"], toned, TONE_SETTINGS, MEMORY_LIMIT_MB)
+    streaming.render_streaming(files["video"], toned, files["bg"], output,
+                               memory_limit_mb=MEMORY_LIMIT_MB)
+
+    assert os.path.getsize(output) > 0
+    stages = {meter.stage for meter in meters}
+    assert {"tone: write", "render"} <= stages
+    render = next(meter for meter in meters if meter.stage == "render")
+    assert render.peak_child_mb > 0, "ffmpeg RSS was never sampled"
+    for meter in meters:
+        assert not meter.exceeded, meter.stage
+        assert meter.peak_mb < MEMORY_LIMIT_MB, (
+            f"{meter.stage}: peak {meter.peak_mb:.0f} MB over the {MEMORY_LIMIT_MB} MB ceiling")
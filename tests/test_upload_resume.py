@@ -0,0 +1,70 @@
+import os
+
+import pytest
+
+pytest.importorskip("googleapiclient")
+from googleapiclient.http import MediaFileUpload
+
+import coordination
+import fake_youtube
+import metrics
+import upload_engine
+import yt_client
+
+MB = 1024 * 1024
+
+
+@pytest.fixture
+def fake_api(tmp_path, monkeypatch):
+    monkeypatch.setattr(coordination, "STATE_DB", str(tmp_path / "state.db"))
+    monkeypatch.setattr(metrics, "_schema_ready", False)
+    monkeypatch.setattr(upload_engine, "SESSIONS_FILE", str(tmp_path / "upload_sessions.json"))
+    server, state, base_url = fake_youtube.start_fake_server()
+    monkeypatch.setattr(yt_client, "API_ENDPOINT", base_url)
+    yt_client.reset()
+    yield state
+    server.shutdown()
+    yt_client.reset()
+
+
+def insert_request(video_file):
+    media = MediaFileUpload(video_file, mimetype="video/mp4", chunksize=MB, resumable=True)
+    request = yt_client.get_youtube().videos().insert(
+        part="snippet,status", body={"snippet": {"title": "resume test"}}, media_body=media)
+    return request, media
+
+
+def uploaded_bytes_metric():
+    prefix = "uploaded_bytes_total "
+    for line in metrics.render_prometheus().splitlines():
+        if line.startswith(prefix):
+            return float(line[len(prefix):])
+    return 0.0
+
+
+def test_resume_mid_file_counts_only_the_bytes_sent_after_the_resume(fake_api, tmp_path):
+    video_file = str(tmp_path / "video.mp4")
+    with open(video_file, "wb") as f:
+        f.write(os.urandom(3 * MB))
+    sha256 = upload_engine.content_hash(video_file)
+    key = upload_engine.session_key_for(sha256)
+
+    # First process: one chunk acknowledged, then it dies
+    request, _ = insert_request(video_file)
+    status, response = request.next_chunk()
+    assert response is None and request.resumable_progress == MB
+    upload_engine._save_session(key, request.resumable_uri, request.resumable_progress)
+    with upload_engine.locked_json(upload_engine.SESSIONS_FILE, {}) as sessions:
+        sessions[key]["sha256"] = sha256
+
+    # Restarted process: a fresh request picks the saved session up
+    request, media = insert_request(video_file)
+    response, stats = upload_engine.run_resumable_upload(request, media, session_key=key, sha256=sha256)
+
+    assert response["id"]
+    assert stats["resumed_from"] == MB
+    assert stats["bytes"] == 2 * MB
+    assert uploaded_bytes_metric() == 2 * MB
+    assert fake_api.stats["sessions"] == 1
+    assert fake_api.stats["bytes"] == 3 * MB
+    assert upload_engine.load_session(key) is None
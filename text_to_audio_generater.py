@@ -1,9 +1,13 @@
+import os
 import re
 import asyncio
 import edge_tts
 import json
 from deep_translator import GoogleTranslator
 
+import async_core
+import metrics
+
 # ---------------------------
 # Helper functions
 # ---------------------------
@@ -100,6 +104,16 @@ def save_cleaned_transcript(text, filename="transcript_shorts.txt"):
         return None
 
 
+async def _translate_chunks(chunks, target_language):
+    """Translate chunks concurrently (within the translate limit), keeping their order."""
+    async def translate_chunk(chunk):
+        translator = GoogleTranslator(source='auto', target=target_language)
+        return await async_core.in_executor("translate", translator.translate, chunk)
+
+    return await asyncio.gather(*(translate_chunk(chunk) for chunk in chunks))
+
+
+@metrics.instrument("translate_text", none_is_error=True)
 def translate_text(text, target_language="hi"):
     """
     Translate text using Google Translate (FREE).
@@ -129,12 +143,8 @@ def translate_text(text, target_language="hi"):
             if current_chunk:
                 chunks.append(current_chunk.strip())
             
-            translated_chunks = []
-            for i, chunk in enumerate(chunks):
-                print(f"  Translating chunk {i+1}/{len(chunks)}...")
-                translator = GoogleTranslator(source='auto', target=target_language)
-                translated = translator.translate(chunk)
-                translated_chunks.append(translated)
+            print(f"  Translating {len(chunks)} chunks...")
+            translated_chunks = async_core.run(_translate_chunks(chunks, target_language))
             
             translated_text = " ".join(translated_chunks)
         else:
@@ -149,6 +159,7 @@ def translate_text(text, target_language="hi"):
         return None
 
 
+@metrics.instrument("generate_voice", none_is_error=True)
 async def generate_voice(text, output_file="ai_dub.mp3", voice="hi-IN-SwaraNeural"):
     """
     Generate realistic AI voice using edge_tts.
@@ -169,25 +180,12 @@ async def generate_voice(text, output_file="ai_dub.mp3", voice="hi-IN-SwaraNeura
         return None
 
 
-def create_dubbed_audio(
-    transcript_text, 
-    translate_to="hi",
-    output_audio="ai_dub.mp3", 
-    voice="hi-IN-SwaraNeural",
-    save_transcript=True
-):
+def translate_transcript(transcript_text, translate_to="hi", save_transcript=True, save_dir="."):
     """
-    Complete workflow: Clean transcript, translate, and generate audio.
-    
-    Args:
-        transcript_text: Raw transcript text
-        translate_to: Language code ("hi" for Hindi, "es" for Spanish, etc.)
-        output_audio: Output audio filename
-        voice: TTS voice name
-        save_transcript: Whether to save cleaned transcript
-    
+    Steps 1-3 of create_dubbed_audio: clean, save (into save_dir) and translate the transcript.
+
     Returns:
-        Dictionary with audio file path and transcript info
+        (result dict as in create_dubbed_audio, translated text or None)
     """
     result = {
         'audio_file': None,
@@ -201,7 +199,7 @@ def create_dubbed_audio(
     
     if not cleaned_text:
         print("❌ No text found after cleaning!")
-        return result
+        return result, None
     
     print(f"\n📝 Cleaned text preview:")
     print("="*60)
@@ -212,7 +210,8 @@ def create_dubbed_audio(
     
     # Step 2: Save cleaned transcript
     if save_transcript:
-        result['transcript_file'] = save_cleaned_transcript(cleaned_text)
+        result['transcript_file'] = save_cleaned_transcript(
+            cleaned_text, os.path.join(save_dir, "transcript_shorts.txt"))
     
     # Step 3: Translate
     print(f"\n🌍 Translating to {translate_to}...")
@@ -220,23 +219,61 @@ def create_dubbed_audio(
     
     if not translated_text:
         print("⚠️ Translation failed, cannot proceed")
-        return result
+        return result, None
     
     result['translated'] = True
     
     # Save translated version
     if save_transcript:
         trans_filename = f"transcript_shorts_{translate_to}.txt"
-        save_cleaned_transcript(translated_text, trans_filename)
+        save_cleaned_transcript(translated_text, os.path.join(save_dir, trans_filename))
     
     print(f"\n📝 Translated text preview:")
     print("="*60)
     print(translated_text[:200] + "...")
     print("="*60 + "\n")
     
-    # Step 4: Generate audio
+    return result, translated_text
+
+
+def synthesize_voice(translated_text, output_audio="ai_dub.mp3", voice="hi-IN-SwaraNeural"):
+    """Step 4 of create_dubbed_audio: TTS of the translated text. Returns the audio path or None."""
     print("🎙 Generating voice audio...")
-    result['audio_file'] = asyncio.run(generate_voice(translated_text, output_audio, voice=voice))
+    return async_core.run(generate_voice(translated_text, output_audio, voice=voice))
+
+
+def create_dubbed_audio(
+    transcript_text, 
+    translate_to="hi",
+    output_audio="ai_dub.mp3", 
+    voice="hi-IN-SwaraNeural",
+    save_transcript=True,
+    before_synthesis=None
+):
+    """
+    Complete workflow: Clean transcript, translate, and generate audio.
+    
+    Args:
+        transcript_text: Raw transcript text
+        translate_to: Language code ("hi" for Hindi, "es" for Spanish, etc.)
+        output_audio: Output audio filename
+        voice: TTS voice name
+        save_transcript: Whether to save cleaned transcript
+        before_synthesis: Optional callback(translated_text) run before TTS;
+                          raise from it to stop before paying for synthesis
+    
+    Returns:
+        Dictionary with audio file path and transcript info
+    """
+    result, translated_text = translate_transcript(transcript_text, translate_to, save_transcript)
+    if not translated_text:
+        return result
+    
+    if before_synthesis:
+        before_synthesis(translated_text)
+
+    # Step 4: Generate audio
+    result['audio_file'] = synthesize_voice(translated_text, output_audio, voice=voice)
     
     return result
 
@@ -244,7 +281,7 @@ def create_dubbed_audio(
 # ---------------------------
 # Example Usage
 # ---------------------------
-def dub_audio():
+def dub_audio(before_synthesis=None):
     with open('yt_transcript.txt', 'r', encoding='utf-8') as f:
         transcript = f.read()
     
@@ -256,7 +293,8 @@ def dub_audio():
         transcript,
         translate_to="hi",
         output_audio="hindi_dub.mp3",
-        voice="hi-IN-SwaraNeural"
+        voice="hi-IN-SwaraNeural",
+        before_synthesis=before_synthesis
     )
     
     if result['audio_file']:
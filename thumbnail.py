@@ -0,0 +1,164 @@
+import argparse
+import os
+import subprocess
+import time
+
+import numpy as np
+from moviepy.config import get_setting
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+
+import metrics
+
+# ---------------------------
+# ⚙️ Thumbnail Settings
+# ---------------------------
+THUMBNAIL_SETTINGS = {
+    "enabled": os.environ.get("THUMBNAILS", "1") != "0",
+    "width": 720,                  # candidate / JPEG width; height follows the video's aspect
+    "score_stride": 4,             # metrics are computed on every 4th pixel of each candidate
+    "min_candidates": 6,           # fewer keyframes than this → sample at a fixed rate instead
+    "samples": 24,                 # frames taken by the fixed-rate fallback
+    "max_seconds": 30,             # hard cap on the sampling pass; no thumbnail after that
+    "brightness_range": (0.15, 0.85),  # mean luma outside this counts as a fade / blown-out frame
+    "weights": {"sharpness": 0.5, "colourfulness": 0.3, "brightness": 0.2},
+    "jpeg_quality": 90,
+    "max_bytes": 2 * 1024 * 1024,  # thumbnails.set limit
+}
+
+
+# ---------------------------
+# 🎞️ Sampling
+# ---------------------------
+
+def sample_frames(video_path, settings=None):
+    """
+    One ffmpeg pass over the video → uint8 array (frames, height, width, 3).
+    Only keyframes are decoded (-skip_frame nokey), so the pass costs a seek per
+    keyframe rather than a full decode; x264's scene-cut keyframes also tend to land
+    on clean shots. Videos with too few keyframes are sampled at a fixed rate.
+    """
+    settings = settings or THUMBNAIL_SETTINGS
+    info = ffmpeg_parse_infos(video_path)
+    src_w, src_h = info["video_size"]
+    width = settings["width"]
+    height = int(round(src_h * width / src_w / 2)) * 2
+
+    def run(input_args, filters):
+        cmd = [
+            get_setting("FFMPEG_BINARY"), "-loglevel", "error", *input_args, "-i", video_path,
+            "-an", "-sn", "-vf", ",".join(filters + [f"scale={width}:{height}"]), "-vsync", "vfr",
+            "-f", "rawvideo", "-pix_fmt", "rgb24", "-",
+        ]
+        raw = subprocess.run(cmd, capture_output=True, check=True, timeout=settings["max_seconds"]).stdout
+        return np.frombuffer(raw, dtype=np.uint8).reshape(-1, height, width, 3)
+
+    frames = run(["-skip_frame", "nokey"], [])
+    if len(frames) < settings["min_candidates"] and info.get("duration"):
+        rate = settings["samples"] / info["duration"]
+        frames = run([], [f"fps={rate:.6f}"])
+    return frames
+
+
+# ---------------------------
+# 🧮 Batch scoring
+# ---------------------------
+
+def frame_metrics(frames, stride=None):
+    """
+    Sharpness (variance of the Laplacian of luma), brightness (mean luma, 0-1) and
+    colourfulness (Hasler & Süsstrunk) for every frame at once.
+    """
+    stride = stride or THUMBNAIL_SETTINGS["score_stride"]
+    rgb = frames[:, ::stride, ::stride].astype(np.float32)
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    luma = 0.299 * r + 0.587 * g + 0.114 * b
+
+    laplacian = (luma[:, :-2, 1:-1] + luma[:, 2:, 1:-1] + luma[:, 1:-1, :-2] + luma[:, 1:-1, 2:]
+                 - 4.0 * luma[:, 1:-1, 1:-1])
+    sharpness = laplacian.reshape(len(frames), -1).var(axis=1)
+
+    brightness = luma.reshape(len(frames), -1).mean(axis=1) / 255.0
+
+    rg = (r - g).reshape(len(frames), -1)
+    yb = (0.5 * (r + g) - b).reshape(len(frames), -1)
+    colourfulness = (np.sqrt(rg.std(axis=1) ** 2 + yb.std(axis=1) ** 2)
+                     + 0.3 * np.sqrt(rg.mean(axis=1) ** 2 + yb.mean(axis=1) ** 2))
+    return {"sharpness": sharpness, "brightness": brightness, "colourfulness": colourfulness}
+
+
+def score_frames(frames, settings=None):
+    """Weighted score per frame; fades and blown-out frames are ranked below everything else."""
+    settings = settings or THUMBNAIL_SETTINGS
+    m = frame_metrics(frames, settings["score_stride"])
+    low, high = settings["brightness_range"]
+    centre = (low + high) / 2
+
+    def normalised(values):
+        span = values.max() - values.min()
+        return (values - values.min()) / span if span > 0 else np.ones_like(values)
+
+    weights = settings["weights"]
+    score = (weights["sharpness"] * normalised(m["sharpness"])
+             + weights["colourfulness"] * normalised(m["colourfulness"])
+             + weights["brightness"] * (1.0 - np.abs(m["brightness"] - centre) / centre))
+    usable = (m["brightness"] >= low) & (m["brightness"] <= high)
+    return np.where(usable, score, score - 10.0), m
+
+
+def write_jpeg(frame, path, settings=None):
+    """Save one RGB frame as JPEG, stepping the quality down until it fits max_bytes."""
+    from PIL import Image
+
+    settings = settings or THUMBNAIL_SETTINGS
+    image = Image.fromarray(frame)
+    quality = settings["jpeg_quality"]
+    while True:
+        image.save(path, "JPEG", quality=quality, optimize=True)
+        if os.path.getsize(path) <= settings["max_bytes"] or quality <= 50:
+            return path
+        quality -= 10
+
+
+# ---------------------------
+# 🖼️ Stage
+# ---------------------------
+
+@metrics.instrument("thumbnail")
+def pick_thumbnail(video_path, output_path=None, settings=None):
+    """
+    Write the best-scoring sampled frame of video_path as a JPEG next to it.
+    Returns the JPEG path, or None when disabled or sampling fails (YouTube then
+    picks its own frame).
+    """
+    settings = settings or THUMBNAIL_SETTINGS
+    if not settings["enabled"]:
+        return None
+    output_path = output_path or os.path.splitext(video_path)[0] + "_thumb.jpg"
+    started = time.perf_counter()
+    try:
+        frames = sample_frames(video_path, settings)
+    except (subprocess.SubprocessError, OSError, KeyError, ValueError) as e:
+        print(f"⚠️ Thumbnail sampling failed, leaving it to YouTube: {e}")
+        return None
+    if len(frames) == 0:
+        print("⚠️ No frames sampled, leaving the thumbnail to YouTube")
+        return None
+
+    scores, m = score_frames(frames, settings)
+    best = int(np.argmax(scores))
+    write_jpeg(frames[best], output_path, settings)
+    print(f"🖼️ Thumbnail: frame {best + 1}/{len(frames)} | sharpness {m['sharpness'][best]:.0f} | "
+          f"brightness {m['brightness'][best]:.2f} | colourfulness {m['colourfulness'][best]:.1f} "
+          f"→ {output_path} ({time.perf_counter() - started:.2f}s)")
+    return output_path
+
+
+# ---------------------------
+# CLI
+# ---------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pick the best frame of a video as its thumbnail")
+    parser.add_argument("video", nargs="?", default="output_video.mp4")
+    parser.add_argument("-o", "--output", default=None)
+    args = parser.parse_args()
+    print(pick_thumbnail(args.video, args.output))
@@ -0,0 +1,264 @@
+from googleapiclient.errors import HttpError
+import hashlib
+import httplib2
+import random
+import socket
+import time
+from datetime import datetime, timedelta, timezone
+
+import metrics
+from json_store import locked_json, read_json
+
+# ---------------------------
+# ⚙️ Upload Settings
+# ---------------------------
+UPLOAD_SETTINGS = {
+    "initial_chunk_mb": 5,
+    "min_chunk_mb": 1,
+    "max_chunk_mb": 64,
+    "target_chunk_seconds": 4.0,   # aim for chunks that take about this long on the wire
+    "max_retries": 8,
+    "backoff_base": 1.0,
+    "backoff_cap": 60.0,
+    "session_ttl_hours": 6 * 24,   # Google keeps resumable sessions for about a week
+}
+
+SESSIONS_FILE = "upload_sessions.json"
+
+# Resumable chunks must be multiples of 256 KiB
+CHUNK_ALIGN = 256 * 1024
+RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+RETRYABLE_EXCEPTIONS = (httplib2.HttpLib2Error, ConnectionError, socket.timeout, TimeoutError)
+
+
+def _align(nbytes):
+    low = UPLOAD_SETTINGS["min_chunk_mb"] * 1024 * 1024
+    high = UPLOAD_SETTINGS["max_chunk_mb"] * 1024 * 1024
+    nbytes = min(max(int(nbytes), low), high)
+    return max(CHUNK_ALIGN, nbytes // CHUNK_ALIGN * CHUNK_ALIGN)
+
+
+def initial_chunksize():
+    return _align(UPLOAD_SETTINGS["initial_chunk_mb"] * 1024 * 1024)
+
+
+def is_retryable(error):
+    if isinstance(error, HttpError):
+        return error.resp.status in RETRYABLE_STATUS
+    return isinstance(error, RETRYABLE_EXCEPTIONS)
+
+
+def backoff_delay(attempt):
+    """Full-jitter exponential backoff: uniform(0, min(cap, base * 2^attempt))."""
+    ceiling = min(UPLOAD_SETTINGS["backoff_cap"], UPLOAD_SETTINGS["backoff_base"] * 2 ** attempt)
+    return random.uniform(0, ceiling)
+
+
+# ---------------------------
+# 💾 Persisted sessions
+# ---------------------------
+
+def content_hash(video_file):
+    """sha256 of the file; a resumed session must continue with identical bytes."""
+    digest = hashlib.sha256()
+    with open(video_file, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def session_key_for(sha256, job_key=None):
+    """
+    Identify an upload across restarts. Pipeline uploads use the source URL (job_key),
+    which survives the re-render into a new scratch dir; other uploads use the content
+    hash (sha256), which survives copies and renames.
+    """
+    if job_key:
+        return f"job:{job_key}"
+    return f"sha256:{sha256}"
+
+
+def _save_session(key, uri, offset):
+    with locked_json(SESSIONS_FILE, {}) as sessions:
+        entry = sessions.setdefault(key, {"created": time.time()})
+        entry.update(uri=uri, offset=offset, updated=time.time())
+
+
+def _drop_session(key):
+    with locked_json(SESSIONS_FILE, {}) as sessions:
+        sessions.pop(key, None)
+
+
+def _drop_session_uri(key):
+    """Forget the server-side session but keep the entry's booked slot and content hash."""
+    with locked_json(SESSIONS_FILE, {}) as sessions:
+        entry = sessions.get(key)
+        if entry:
+            entry.pop("uri", None)
+            entry.pop("offset", None)
+
+
+def load_session(key):
+    return read_json(SESSIONS_FILE, {}).get(key)
+
+
+def forget_session(key):
+    """Drop a session that will never be resumed (its upload failed for good, or was killed)."""
+    _drop_session(key)
+
+
+def session_slot(key, book, min_lead_minutes=15):
+    """
+    Publish time for an upload. An interrupted upload's session was opened with a
+    publishAt in its body, so its resume must keep that slot; otherwise book() a new
+    one and remember it with the session before any byte is sent.
+    """
+    saved = load_session(key) or {}
+    if saved.get("publish_at"):
+        scheduled = datetime.fromisoformat(saved["publish_at"])
+        if scheduled > datetime.now(timezone.utc) + timedelta(minutes=min_lead_minutes):
+            print(f"♻️ Keeping publish slot {scheduled.isoformat()} of the interrupted upload")
+            return scheduled
+        # The slot has passed; the saved session's publishAt is useless now
+        _drop_session(key)
+    scheduled = book()
+    with locked_json(SESSIONS_FILE, {}) as sessions:
+        entry = sessions.setdefault(key, {"created": time.time()})
+        entry.update(publish_at=scheduled.isoformat(), updated=time.time())
+    return scheduled
+
+
+def cleanup_expired_sessions():
+    """Forget sessions past their TTL."""
+    ttl = UPLOAD_SETTINGS["session_ttl_hours"] * 3600
+    now = time.time()
+    with locked_json(SESSIONS_FILE, {}) as sessions:
+        for key in list(sessions):
+            if now - sessions[key]["created"] > ttl:
+                sessions.pop(key)
+                print(f"🧹 Dropped expired upload session {key}")
+
+
+def _resume_session(request, key, sha256):
+    """Point a fresh request at a saved session; _query_offset() then asks the server for the offset."""
+    saved = load_session(key)
+    if not saved:
+        return False
+    if saved.get("sha256") != sha256:
+        # New bytes for the same job (e.g. a re-render): only the booked slot carries over
+        with locked_json(SESSIONS_FILE, {}) as sessions:
+            entry = sessions.setdefault(key, {"created": time.time()})
+            had_uri = entry.pop("uri", None) is not None
+            entry.pop("offset", None)
+            entry.update(sha256=sha256, updated=time.time())
+        if had_uri:
+            print("⚠️ File changed since the interrupted upload — starting a new session")
+        return False
+    if not saved.get("uri"):
+        return False
+    request.resumable_uri = saved["uri"]
+    print(f"♻️ Resuming upload session (last acknowledged {saved['offset'] / (1024 * 1024):.1f} MB)")
+    return True
+
+
+def _query_offset(request, media):
+    """
+    Send the 'bytes */size' status query on its own, so the server's offset is known
+    before next_chunk() sends more. Returns (status, body) like next_chunk(); body is
+    set if the server already has the whole file. 404/410 raise HttpError.
+    """
+    headers = {"Content-Range": f"bytes */{media.size()}", "content-length": "0"}
+    resp, content = request.http.request(request.resumable_uri, "PUT", headers=headers)
+    # Sets resumable_progress from the Range header, the same way next_chunk() does
+    return request._process_response(resp, content)
+
+
+def _restart_session(request):
+    request.resumable_uri = None
+    request.resumable_progress = 0
+    request._in_error_state = False
+
+
+def run_resumable_upload(request, media, label="video", session_key=None, sha256=None):
+    """
+    Drive a resumable videos.insert request to completion.
+
+    - Chunk size follows measured throughput so each PUT takes ~target_chunk_seconds.
+    - Only retryable HTTP statuses / transport errors are retried, with jittered
+      exponential backoff, at most max_retries times in a row.
+    - With a session_key, the session URI and acknowledged offset are saved after
+      every chunk, so a restarted process continues from the last confirmed byte
+      (only if sha256, the file's content hash, still matches).
+    Returns (response, stats) where stats has bytes, seconds and mb_per_s.
+    """
+    total = media.size() or 0
+    started = time.perf_counter()
+    last_progress = -1
+    attempt = 0
+    throughput = None
+    response = None
+
+    resuming = False
+    if session_key:
+        cleanup_expired_sessions()
+        resuming = _resume_session(request, session_key, sha256)
+    resumed_from = None
+
+    while response is None:
+        sent_before = request.resumable_progress or 0
+        chunk_started = time.perf_counter()
+        try:
+            if resuming:
+                status, response = _query_offset(request, media)
+            else:
+                status, response = request.next_chunk()
+        except Exception as e:
+            if resuming and isinstance(e, HttpError) and e.resp.status in (404, 410):
+                print("⚠️ Saved upload session expired on the server — starting over.")
+                _drop_session_uri(session_key)
+                _restart_session(request)
+                resuming = False
+                continue
+            if not is_retryable(e) or attempt >= UPLOAD_SETTINGS["max_retries"]:
+                raise
+            delay = backoff_delay(attempt)
+            attempt += 1
+            print(f"⚠️ Retryable upload error ({e}). Retry {attempt}/"
+                  f"{UPLOAD_SETTINGS['max_retries']} in {delay:.1f}s...")
+            time.sleep(delay)
+            continue
+
+        attempt = 0
+        if resuming:
+            resuming = False
+            resumed_from = total if response is not None else request.resumable_progress or 0
+            print(f"⏩ Server confirmed {resumed_from / (1024 * 1024):.1f} MB — continuing from there")
+            continue
+        if session_key and response is None and request.resumable_uri:
+            _save_session(session_key, request.resumable_uri, request.resumable_progress or 0)
+
+        sent = (request.resumable_progress or 0) - sent_before
+        elapsed = time.perf_counter() - chunk_started
+        if sent > 0 and elapsed > 0:
+            rate = sent / elapsed
+            throughput = rate if throughput is None else 0.7 * throughput + 0.3 * rate
+            # MediaFileUpload reads _chunksize on every next_chunk(); there is no public setter
+            media._chunksize = _align(throughput * UPLOAD_SETTINGS["target_chunk_seconds"])
+
+        if status:
+            progress = int(status.progress() * 100)
+            if progress != last_progress:
+                print(f"📤 Upload progress: {progress}% "
+                      f"(chunk {media.chunksize() / (1024 * 1024):.2f} MB)")
+                last_progress = progress
+
+    if session_key:
+        _drop_session(session_key)
+
+    metrics.inc("uploaded_bytes_total", total - (resumed_from or 0))
+    seconds = time.perf_counter() - started
+    total -= resumed_from or 0
+    mb_per_s = total / (1024 * 1024) / seconds if seconds > 0 else 0.0
+    print(f"📶 {label}: {total / (1024 * 1024):.1f} MB in {seconds:.1f}s → {mb_per_s:.2f} MB/s")
+    return response, {"bytes": total, "seconds": round(seconds, 2), "mb_per_s": round(mb_per_s, 2),
+                      "resumed_from": resumed_from}
@@ -1,65 +1,35 @@
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 from googleapiclient.http import MediaFileUpload
-from google.auth.transport.requests import Request
-import pickle
 import os
 import json
-import time
 import traceback
-from datetime import datetime, timedelta, time as dtime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 
-# YouTube API scopes
-SCOPES = ['https://www.googleapis.com/auth/youtube.upload']
+import metrics
+from json_store import locked_json, read_json
+from publish_slots import SLOT_TEMPLATES, book_next_slot, release_slot, to_rfc3339
+from upload_engine import (content_hash, forget_session, initial_chunksize, load_session,
+                           run_resumable_upload, session_key_for, session_slot)
+from upload_quota import QuotaBudget, quota_day
+from yt_client import get_youtube
 
+DEFERRED_FILE = 'deferred_uploads.json'
 
-def authenticate_youtube():
-    """Authenticate and return YouTube API client."""
-    creds = None
-
-    if os.path.exists('token.pickle'):
-        with open('token.pickle', 'rb') as token:
-            creds = pickle.load(token)
-
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file('secrect_code.json', SCOPES)
-            creds = flow.run_local_server(port=0)
-
-        with open('token.pickle', 'wb') as token:
-            pickle.dump(creds, token)
 
-    return build('youtube', 'v3', credentials=creds)
+def authenticate_youtube():
+    """Return the cached YouTube API client (credentials refreshed only near expiry)."""
+    return get_youtube()
 
 
-def get_next_upload_slot(already_scheduled_count=0):
+def get_next_upload_slot(already_scheduled_count=0, channel='default'):
     """
-    Get the next available upload time slot in the future.
-    Alternates between 9:45 AM and 7:30 PM across days.
+    Book the next free upload slot, alternating between 9:45 AM and 7:30 PM
+    (PUBLISH_TIMEZONE). Slots come from the persisted index in publish_slots.json,
+    so already_scheduled_count is no longer needed and is ignored.
     """
-    now = datetime.now()
+    now = datetime.now().astimezone()
     print(f"\n⏰ Current time: {now.strftime('%Y-%m-%d %I:%M %p')}")
-
-    current_day = now.date()
-    slot_index = already_scheduled_count % 2  # 0: morning, 1: evening
-    day_offset = already_scheduled_count // 2
-    target_day = current_day + timedelta(days=day_offset)
-
-    scheduled_time = datetime.combine(target_day, dtime(9, 45)) if slot_index == 0 else datetime.combine(target_day, dtime(19, 30))
-
-    # Ensure scheduled time is in the future
-    while scheduled_time <= now:
-        slot_index = (slot_index + 1) % 2
-        if slot_index == 0:
-            target_day += timedelta(days=1)
-            scheduled_time = datetime.combine(target_day, dtime(9, 45))
-        else:
-            scheduled_time = datetime.combine(target_day, dtime(19, 30))
-
-    print(f"📅 Next upload slot: {scheduled_time.strftime('%Y-%m-%d %I:%M %p')}")
-    return scheduled_time
+    return book_next_slot(channel, template=SLOT_TEMPLATES['twice_daily'])
 
 
 def load_metadata(info_file):
@@ -95,23 +65,34 @@ def prepare_video_details(metadata, use_defaults=False):
     }
 
 
+@metrics.instrument("upload_video")
 def upload_video(video_file="output_video.mp4", info_file="yt_metadata.json",
-                 scheduled_count=0, use_defaults=False):
-    """Upload a video to YouTube with progress tracking and scheduling."""
+                 scheduled_count=0, use_defaults=False, channel='default', interactive=True):
+    """
+    Upload a video to YouTube with progress tracking and scheduling.
+    interactive=False (batch workers) fails instead of asking about missing metadata.
+    """
+    scheduled_time = None
+    session_key = None
     try:
         if not os.path.exists(video_file):
             return {"error": f"Video file '{video_file}' not found."}
 
         metadata = load_metadata(info_file)
         if not metadata and not use_defaults:
+            if not interactive:
+                return {"error": f"Metadata file '{info_file}' missing and defaults not allowed."}
             response = input("\n⚠️ Metadata file not found. Use default values? (y/n): ").lower()
             use_defaults = response == 'y'
             if not use_defaults:
                 return {"error": "Upload cancelled. Please provide metadata file."}
 
         video_details = prepare_video_details(metadata, use_defaults)
-        scheduled_time = get_next_upload_slot(scheduled_count)
-        scheduled_time_iso = scheduled_time.isoformat() + 'Z'  # UTC time
+        sha256 = content_hash(video_file)
+        session_key = session_key_for(sha256)
+        scheduled_time = session_slot(session_key,
+                                      lambda: get_next_upload_slot(scheduled_count, channel=channel))
+        scheduled_time_iso = to_rfc3339(scheduled_time)
 
         print(f"\n{'=' * 60}")
         print("🎬 VIDEO UPLOAD DETAILS")
@@ -141,28 +122,11 @@ def upload_video(video_file="output_video.mp4", info_file="yt_metadata.json",
 
         print("🚀 Uploading video (this may take a while)...")
 
-        # Use smaller chunks to show progress
-        media = MediaFileUpload(video_file, chunksize=5 * 1024 * 1024, resumable=True, mimetype='video/mp4')
+        # Chunk size adapts to measured throughput from here on
+        media = MediaFileUpload(video_file, chunksize=initial_chunksize(), resumable=True, mimetype='video/mp4')
         request = youtube.videos().insert(part='snippet,status', body=body, media_body=media)
-
-        response = None
-        last_progress = -1
-
-        while response is None:
-            try:
-                status, response = request.next_chunk()
-                if status:
-                    progress = int(status.progress() * 100)
-                    if progress != last_progress:
-                        print(f"📤 Upload progress: {progress}%")
-                        last_progress = progress
-                else:
-                    print("⏳ Still uploading... waiting for chunk...")
-                    time.sleep(3)
-            except Exception as e:
-                print(f"⚠️ Temporary error: {e}. Retrying in 5s...")
-                time.sleep(5)
-                continue
+        response, stats = run_resumable_upload(request, media, label=video_details['title'],
+                                                 session_key=session_key, sha256=sha256)
 
         video_id = response.get('id')
         print(f"\n✅ Upload complete!")
@@ -174,43 +138,111 @@ def upload_video(video_file="output_video.mp4", info_file="yt_metadata.json",
             'success': True,
             'video_id': video_id,
             'scheduled_time': scheduled_time.strftime('%Y-%m-%d at %I:%M %p'),
-            'title': video_details['title']
+            'title': video_details['title'],
+            'mb_per_s': stats['mb_per_s']
         }
 
     except Exception as e:
         print("\n❌ An error occurred during upload:")
         traceback.print_exc()
+        if session_key and (load_session(session_key) or {}).get('uri'):
+            # Bytes are on YouTube's side: keep the session and its slot for the retry
+            return {'error': f"Upload failed: {str(e)}", 'resumable': True}
+        if scheduled_time:
+            release_slot(scheduled_time, channel=channel, template=SLOT_TEMPLATES['twice_daily'])
+        if session_key:
+            forget_session(session_key)
         return {'error': f"Upload failed: {str(e)}"}
 
 
-def batch_upload_videos(video_files, info_files=None, use_defaults=False):
-    """Upload multiple videos with automatic scheduling."""
-    results = []
+def _upload_one(i, total, video_file, info_file, use_defaults, budget, upload_fn):
+    """Upload one batch item, or defer it when today's quota budget is spent."""
+    print(f"\n{'#' * 70}")
+    print(f"🎥 Uploading video {i + 1}/{total}: {video_file}")
+    print(f"{'#' * 70}\n")
+
+    # Missing files never reach the API, so they don't cost quota
+    charged = os.path.exists(video_file)
+    if charged and not budget.try_consume():
+        defer_until = quota_day() + timedelta(days=1)
+        _defer_upload(video_file, info_file, use_defaults, budget.channel, defer_until)
+        print(f"⏸️ Quota budget spent for '{budget.channel}' — deferred to {defer_until}")
+        return {'deferred': True, 'video_file': video_file, 'defer_until': defer_until.isoformat()}
+
+    result = upload_fn(video_file, info_file, scheduled_count=i, use_defaults=use_defaults,
+                       channel=budget.channel, interactive=False)
+    if 'error' in result:
+        # No video was created (auth error, missing metadata, non-retryable failure);
+        # a resumable failure already opened its insert and is resumed without a new charge
+        if charged and not result.get('resumable'):
+            budget.refund()
+        print(f"❌ Error: {result['error']}")
+    else:
+        print(f"✅ Uploaded: {result['title']}")
+    return result
+
 
-    for i, video_file in enumerate(video_files):
-        info_file = info_files[i] if info_files and i < len(info_files) else "yt_metadata.json"
+def _defer_upload(video_file, info_file, use_defaults, channel, defer_until):
+    with locked_json(DEFERRED_FILE, []) as deferred:
+        deferred.append({
+            'video_file': video_file,
+            'info_file': info_file,
+            'use_defaults': use_defaults,
+            'channel': channel,
+            'deferred_at': datetime.now().isoformat(timespec='seconds'),
+            'defer_until': defer_until.isoformat(),
+        })
 
-        print(f"\n{'#' * 70}")
-        print(f"🎥 Uploading video {i + 1}/{len(video_files)}: {video_file}")
-        print(f"{'#' * 70}\n")
 
-        result = upload_video(video_file, info_file, scheduled_count=i, use_defaults=use_defaults)
-        results.append(result)
+def batch_upload_videos(video_files, info_files=None, use_defaults=False,
+                        concurrency=1, channel='default', upload_fn=None, interactive=True):
+    """
+    Upload multiple videos with automatic scheduling.
+
+    Args:
+        concurrency: Number of resumable uploads in flight at once
+        channel: Quota bucket to draw from (videos.insert costs QUOTA_SETTINGS['insert_cost'])
+        upload_fn: Upload callable, default upload_video (swap in a fake for testing)
+        interactive: False (scheduled runs) never prompts; items without metadata fail
 
-        if 'error' in result:
-            print(f"❌ Error: {result['error']}")
-        else:
-            print(f"✅ Uploaded: {result['title']}")
+    Items over the channel's daily quota budget are not attempted; they come back as
+    {'deferred': True, ...} and are queued in DEFERRED_FILE for upload_deferred_videos().
+    """
+    upload_fn = upload_fn or upload_video
+    budget = QuotaBudget(channel)
+    total = len(video_files)
+    info_files = [info_files[i] if info_files and i < len(info_files) else "yt_metadata.json"
+                  for i in range(total)]
+
+    # Ask about missing metadata once, here, instead of from the worker threads
+    item_defaults = [use_defaults] * total
+    missing = [i for i in range(total) if not use_defaults and load_metadata(info_files[i]) is None]
+    if missing and interactive:
+        answer = input(f"\n⚠️ {len(missing)} metadata file(s) missing. Use default values for them? (y/n): ")
+        for i in missing:
+            item_defaults[i] = answer.lower() == 'y'
+
+    jobs = [
+        (i, total, video_file, info_files[i], item_defaults[i], budget, upload_fn)
+        for i, video_file in enumerate(video_files)
+    ]
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        results = list(pool.map(lambda job: _upload_one(*job), jobs))
 
     print(f"\n{'=' * 60}")
     print("📊 UPLOAD SUMMARY")
     print(f"{'=' * 60}")
     successful = [r for r in results if 'success' in r]
     failed = [r for r in results if 'error' in r]
+    deferred = [r for r in results if 'deferred' in r]
 
     print(f"Total videos: {len(results)}")
     print(f"Successful: {len(successful)}")
     print(f"Failed: {len(failed)}")
+    if deferred:
+        print(f"Deferred (quota): {len(deferred)}")
+    print(f"Quota left today ({channel}): {budget.remaining()} units")
 
     if successful:
         print(f"\n🗓️ Scheduled uploads:")
@@ -222,6 +254,56 @@ def batch_upload_videos(video_files, info_files=None, use_defaults=False):
     return results
 
 
+def _is_due(item, today, channel=None):
+    return item['defer_until'] <= today and channel in (None, item.get('channel', 'default'))
+
+
+def deferred_due(channel=None):
+    """Deferred items whose quota day has come."""
+    today = quota_day().isoformat()
+    return [d for d in read_json(DEFERRED_FILE, []) if _is_due(d, today, channel)]
+
+
+def upload_deferred_videos(concurrency=1, channel=None, upload_fn=None):
+    """
+    Retry items deferred by an earlier batch once their day has come, each under the
+    channel whose quota deferred it (channel= retries only that channel's items).
+    Never prompts: it runs from the scheduler.
+    """
+    today = quota_day().isoformat()
+    with locked_json(DEFERRED_FILE, []) as deferred:
+        due = [d for d in deferred if _is_due(d, today, channel)]
+        deferred[:] = [d for d in deferred if not _is_due(d, today, channel)]
+
+    if not due:
+        print("ℹ️ No deferred uploads due.")
+        return []
+    groups = {}
+    for d in due:
+        groups.setdefault((d.get('channel', 'default'), d.get('use_defaults', False)), []).append(d)
+    results = []
+    for (item_channel, use_defaults), group in groups.items():
+        results += batch_upload_videos([d['video_file'] for d in group],
+                                       [d['info_file'] for d in group],
+                                       use_defaults=use_defaults, concurrency=concurrency,
+                                       channel=item_channel, upload_fn=upload_fn, interactive=False)
+    return results
+
+
+def run_deferred_uploads():
+    """Job entry point (mode "deferred"): drain the due queue. Returns the run result line."""
+    results = upload_deferred_videos()
+    if not results:
+        return "SKIPPED – no deferred uploads due"
+    uploaded = sum(1 for r in results if 'success' in r)
+    failed = sum(1 for r in results if 'error' in r)
+    again = sum(1 for r in results if 'deferred' in r)
+    summary = f"deferred uploads: {uploaded} uploaded, {failed} failed, {again} deferred again"
+    if failed and not uploaded:
+        return f"Automation FAILED: {summary}"
+    return f"SUCCESS – {summary}"
+
+
 if __name__ == '__main__':
     print("\n☁️ Step 4: Uploading video to YouTube...")
     result = upload_video(
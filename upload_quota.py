@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta, time as dtime
+from zoneinfo import ZoneInfo
+
+from json_store import locked_json, read_json
+
+# ---------------------------
+# ⚙️ Quota Settings
+# ---------------------------
+QUOTA_FILE = "upload_quota.json"
+QUOTA_SETTINGS = {
+    "daily_units": 10000,                     # default YouTube Data API project quota
+    "insert_cost": 1600,                      # videos.insert
+    "reset_timezone": "America/Los_Angeles",  # quota resets at midnight Pacific
+}
+
+
+def quota_day(now=None):
+    """The quota day (Pacific date) a moment belongs to."""
+    tz = ZoneInfo(QUOTA_SETTINGS["reset_timezone"])
+    now = now.astimezone(tz) if now else datetime.now(tz)
+    return now.date()
+
+
+def next_reset(now=None):
+    """Local time of the next quota reset."""
+    tz = ZoneInfo(QUOTA_SETTINGS["reset_timezone"])
+    day = quota_day(now) + timedelta(days=1)
+    return datetime.combine(day, dtime(0, 0), tzinfo=tz).astimezone()
+
+
+class QuotaBudget:
+    """
+    Token bucket of API units per channel per quota day, persisted in QUOTA_FILE so
+    separate runs and processes draw from the same daily budget. The bucket refills
+    completely when the Pacific date changes.
+    """
+
+    def __init__(self, channel="default", daily_units=None, path=QUOTA_FILE):
+        self.channel = channel
+        self.daily_units = daily_units or QUOTA_SETTINGS["daily_units"]
+        self.path = path
+
+    def _bucket(self, data):
+        today = quota_day().isoformat()
+        bucket = data.setdefault(self.channel, {"day": today, "used": 0})
+        if bucket["day"] != today:
+            bucket.update(day=today, used=0)
+        return bucket
+
+    def try_consume(self, cost=None):
+        """Take `cost` units if the bucket still holds them. Returns True on success."""
+        cost = cost or QUOTA_SETTINGS["insert_cost"]
+        with locked_json(self.path, {}) as data:
+            bucket = self._bucket(data)
+            if bucket["used"] + cost > self.daily_units:
+                return False
+            bucket["used"] += cost
+            return True
+
+    def refund(self, cost=None):
+        """Give units back for a call that never reached the API."""
+        cost = cost or QUOTA_SETTINGS["insert_cost"]
+        with locked_json(self.path, {}) as data:
+            bucket = self._bucket(data)
+            bucket["used"] = max(0, bucket["used"] - cost)
+
+    def remaining(self):
+        bucket = read_json(self.path, {}).get(self.channel)
+        if not bucket or bucket["day"] != quota_day().isoformat():
+            return self.daily_units
+        return max(0, self.daily_units - bucket["used"])
@@ -0,0 +1,126 @@
+from google_auth_oauthlib.flow import InstalledAppFlow
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import build
+import google_auth_httplib2
+import httplib2
+import pickle
+import os
+import threading
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit, urlunsplit
+
+SCOPES = ['https://www.googleapis.com/auth/youtube.upload']
+TOKEN_FILE = 'token.pickle'
+CLIENT_SECRETS_FILE = 'secrect_code.json'
+
+# Refresh a little before Google's expiry instead of on every call
+REFRESH_MARGIN = timedelta(minutes=5)
+HTTP_TIMEOUT = 120
+
+# Point every Google API call at another server (e.g. fake_youtube.py) — no token.pickle needed
+API_ENDPOINT = os.environ.get('YOUTUBE_API_ENDPOINT')
+
+# Cached for the life of this process only. Pipeline jobs run in their own spawned
+# process (job_watchdog.py), so each run builds one client and reuses it for all of
+# its API calls; batch_upload_videos reuses it across every upload of the batch.
+# Across runs, only token.pickle carries over.
+_lock = threading.Lock()
+_creds = None
+_creds_generation = 0
+# httplib2.Http is not thread-safe, so each thread keeps its own pooled transport + service
+_local = threading.local()
+
+
+def _needs_refresh(creds):
+    if not creds.token or not creds.expiry:
+        return True
+    return creds.expiry - datetime.utcnow() < REFRESH_MARGIN
+
+
+class _EndpointHttp(httplib2.Http):
+    """httplib2 transport that sends googleapis.com requests to API_ENDPOINT instead."""
+
+    def __init__(self, endpoint, **kwargs):
+        super().__init__(**kwargs)
+        self._endpoint = urlsplit(endpoint)
+
+    def request(self, uri, *args, **kwargs):
+        parts = urlsplit(uri)
+        if parts.netloc.endswith('googleapis.com'):
+            uri = urlunsplit((self._endpoint.scheme, self._endpoint.netloc) + tuple(parts[2:]))
+        return super().request(uri, *args, **kwargs)
+
+
+def _endpoint_credentials():
+    return Credentials(token=None, refresh_token='fake-refresh', client_id='fake', client_secret='fake',
+                       token_uri=f"{API_ENDPOINT.rstrip('/')}/token", scopes=SCOPES)
+
+
+def get_credentials():
+    """
+    Credentials for this process: token.pickle is read once per process, refreshed
+    only near expiry and rewritten only when the token actually changed.
+    """
+    global _creds, _creds_generation
+    with _lock:
+        if API_ENDPOINT:
+            if _creds is None:
+                _creds = _endpoint_credentials()
+                _creds_generation += 1
+            if _needs_refresh(_creds):
+                _creds.refresh(google_auth_httplib2.Request(httplib2.Http(timeout=HTTP_TIMEOUT)))
+            return _creds
+
+        if _creds is None and os.path.exists(TOKEN_FILE):
+            with open(TOKEN_FILE, 'rb') as token:
+                _creds = pickle.load(token)
+            _creds_generation += 1
+
+        if _creds and not _needs_refresh(_creds):
+            return _creds
+
+        if _creds and _creds.refresh_token:
+            print("🔄 Refreshing YouTube token silently...")
+            _creds.refresh(Request())
+        else:
+            print("🌐 First-time authentication — only once.")
+            flow = InstalledAppFlow.from_client_secrets_file(CLIENT_SECRETS_FILE, SCOPES)
+            _creds = flow.run_local_server(port=0)
+            _creds_generation += 1
+
+        with open(TOKEN_FILE, 'wb') as token:
+            pickle.dump(_creds, token)
+        return _creds
+
+
+def get_youtube():
+    """
+    Return a YouTube API client for the calling thread.
+    Built once per thread from the bundled static discovery document and a
+    keep-alive httplib2 transport, then reused by later calls on that thread in
+    the same process (one pipeline job, or one upload batch).
+    """
+    creds = get_credentials()
+    cached = getattr(_local, 'youtube', None)
+    if cached and cached[0] == _creds_generation:
+        return cached[1]
+
+    if API_ENDPOINT:
+        transport = _EndpointHttp(API_ENDPOINT, timeout=HTTP_TIMEOUT)
+    else:
+        transport = httplib2.Http(timeout=HTTP_TIMEOUT)
+    # 308 is "Resume Incomplete" for resumable uploads, not a redirect (as in googleapiclient's build_http)
+    transport.redirect_codes = transport.redirect_codes - {308}
+    http = google_auth_httplib2.AuthorizedHttp(creds, http=transport)
+    youtube = build('youtube', 'v3', http=http, static_discovery=True, cache_discovery=False)
+    _local.youtube = (_creds_generation, youtube)
+    return youtube
+
+
+def reset():
+    """Forget cached credentials and clients (next call re-reads token.pickle)."""
+    global _creds, _creds_generation
+    with _lock:
+        _creds = None
+        _creds_generation += 1
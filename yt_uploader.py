@@ -1,51 +1,39 @@
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 from googleapiclient.http import MediaFileUpload
-from google.auth.transport.requests import Request
-import pickle
 import os
 import json
-import time
 import traceback
-from datetime import datetime, timedelta, time as dtime
+from datetime import datetime
 
-SCOPES = ['https://www.googleapis.com/auth/youtube.upload']
+import metrics
+from publish_slots import SLOT_TEMPLATES, book_next_slot, release_slot, to_rfc3339
+from upload_engine import (content_hash, forget_session, initial_chunksize, load_session,
+                           run_resumable_upload, session_key_for, session_slot)
+from yt_client import get_youtube
 
 
 def authenticate_youtube():
-    """Authenticate once and reuse token automatically (no manual re-verify)."""
-    creds = None
-    token_file = 'token.pickle'
-
-    # Load existing credentials if available
-    if os.path.exists(token_file):
-        with open(token_file, 'rb') as token:
-            creds = pickle.load(token)
-
-    # If no credentials or expired
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            print("🔄 Refreshing YouTube token silently...")
-            creds.refresh(Request())
-        else:
-            print("🌐 First-time authentication — only once.")
-            flow = InstalledAppFlow.from_client_secrets_file('secrect_code.json', SCOPES)
-            creds = flow.run_local_server(port=0)
-        # Save for next runs
-        with open(token_file, 'wb') as token:
-            pickle.dump(creds, token)
-
-    return build('youtube', 'v3', credentials=creds)
-
-
-def get_next_upload_time():
-    """Return next 7:35 AM — today if not passed, else tomorrow."""
-    now = datetime.now()
-    scheduled_time = datetime.combine(now.date(), dtime(7, 35))
-    if now >= scheduled_time:
-        scheduled_time += timedelta(days=1)
-    print(f"📅 Next upload: {scheduled_time.strftime('%Y-%m-%d %I:%M %p')}")
-    return scheduled_time
+    """Return the cached YouTube API client (credentials refreshed only near expiry)."""
+    return get_youtube()
+
+
+def get_next_upload_time(channel='default'):
+    """Book the next free 7:35 AM slot (PUBLISH_TIMEZONE) for this channel."""
+    return book_next_slot(channel, template=SLOT_TEMPLATES['daily'])
+
+
+def abandon_upload(job_key):
+    """
+    Give back the slot booked for job_key's upload and forget its session; used when
+    the watchdog kills the job, so the retry books afresh. Returns the released slot.
+    """
+    key = session_key_for(None, job_key)
+    saved = load_session(key) or {}
+    forget_session(key)
+    if not saved.get('publish_at'):
+        return None
+    scheduled = datetime.fromisoformat(saved['publish_at'])
+    release_slot(scheduled, template=SLOT_TEMPLATES['daily'])
+    return scheduled
 
 
 def load_metadata(file):
@@ -74,15 +62,40 @@ def prepare_video_details(metadata=None):
     }
 
 
-def upload_video(video_file='output_video.mp4', info_file='yt_metadata.json'):
-    """Upload one video, scheduled for next 7:35 AM."""
+def set_thumbnail(youtube, video_id, thumbnail):
+    """thumbnails.set for an uploaded video. A failure keeps YouTube's own pick, not the upload."""
+    try:
+        youtube.thumbnails().set(videoId=video_id,
+                                 media_body=MediaFileUpload(thumbnail, mimetype='image/jpeg')).execute()
+        print(f"🖼️ Thumbnail set: {thumbnail}")
+        return True
+    except Exception as e:
+        print(f"⚠️ Thumbnail not set ({e}); YouTube keeps its own pick")
+        return False
+
+
+@metrics.instrument("upload_video")
+def upload_video(video_file='output_video.mp4', info_file='yt_metadata.json', details=None,
+                 thumbnail=None, job_key=None):
+    """
+    Upload one video, scheduled for the next free 7:35 AM slot.
+    details: title/description/tags already prepared (default: read from info_file).
+    thumbnail: JPEG set as the custom thumbnail after the insert (see thumbnail.py).
+    job_key: stable id of the upload (the source URL in the pipeline); a later call
+             with the same key resumes an interrupted upload and keeps its slot.
+    """
+    scheduled = None
+    session_key = None
     try:
         if not os.path.exists(video_file):
             return {'error': f'File not found: {video_file}'}
 
-        metadata = load_metadata(info_file)
-        details = prepare_video_details(metadata)
-        schedule_time = get_next_upload_time().isoformat() + 'Z'
+        if details is None:
+            details = prepare_video_details(load_metadata(info_file))
+        sha256 = content_hash(video_file)
+        session_key = session_key_for(sha256, job_key)
+        scheduled = session_slot(session_key, get_next_upload_time)
+        schedule_time = to_rfc3339(scheduled)
 
         youtube = authenticate_youtube()
 
@@ -101,25 +114,30 @@ def upload_video(video_file='output_video.mp4', info_file='yt_metadata.json'):
         }
 
         print(f"🚀 Uploading: {details['title']}")
-        media = MediaFileUpload(video_file, chunksize=5 * 1024 * 1024, resumable=True)
+        media = MediaFileUpload(video_file, chunksize=initial_chunksize(), resumable=True)
         request = youtube.videos().insert(part='snippet,status', body=body, media_body=media)
-
-        response = None
-        while response is None:
-            status, response = request.next_chunk()
-            if status:
-                print(f"📤 Progress: {int(status.progress() * 100)}%")
-            else:
-                time.sleep(2)
+        response, stats = run_resumable_upload(request, media, label=details['title'],
+                                                 session_key=session_key, sha256=sha256)
 
         vid = response.get('id')
         print(f"\n✅ Upload done!")
         print(f"🔗 https://www.youtube.com/watch?v={vid}")
-        return {'success': True, 'video_id': vid}
+        result = {'success': True, 'video_id': vid, 'mb_per_s': stats['mb_per_s'],
+                  'scheduled_time': schedule_time}
+        if thumbnail:
+            result['thumbnail'] = set_thumbnail(youtube, vid, thumbnail)
+        return result
 
     except Exception as e:
         print("❌ Upload error:", e)
         traceback.print_exc()
+        if session_key and (load_session(session_key) or {}).get('uri'):
+            # Bytes are on YouTube's side: keep the session and its slot for the retry
+            return {'error': str(e), 'resumable': True}
+        if scheduled:
+            release_slot(scheduled, template=SLOT_TEMPLATES['daily'])
+        if session_key:
+            forget_session(session_key)
         return {'error': str(e)}
 
 